@@ -14,15 +14,27 @@ from enum import Enum
 import os
 import json
 import jwt
+import time
+import logging
 import asyncio
 import httpx
 from contextlib import asynccontextmanager
 
+# Shared tracing and DB instrumentation report through logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
 from supabase import create_client, Client
 from dotenv import load_dotenv
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from prometheus_client import Gauge, Histogram
+
+# Rate limiting, tracing, DB instrumentation and metrics shared by every service
+from summit_common.service import (
+    LATENCY_BUCKETS, charge_org_quota, current_span, db_unit_of_work, instrument_client,
+    metrics_registry, request_cost, setup_service, span_exporter, start_span, trace_span
+)
 
 load_dotenv()
 
@@ -30,7 +42,36 @@ load_dotenv()
 # RATE LIMITING
 # ============================================
 
-limiter = Limiter(key_func=get_remote_address)
+# The per-user limiter and the org budget are shared (summit_common.service);
+# requests spend ROUTE_COSTS[path] units of their org's budget (1 if unlisted).
+ROUTE_COSTS = {
+    "/api/v1/agents/{agent_id}/run": 20,
+}
+
+# ============================================
+# REQUEST BODY LIMIT
+# ============================================
+
+# Keys are route templates; anything unlisted gets MAX_REQUEST_BODY_SIZE.
+MAX_REQUEST_BODY_SIZE = int(os.getenv("MAX_REQUEST_BODY_SIZE", str(1024 * 1024)))
+BODY_SIZE_LIMITS = {
+    "/api/v1/agents/{agent_id}/run": 256 * 1024,
+    "/api/v1/runs/{run_id}/cancel": 1024,
+}
+
+# ============================================
+# METRICS
+# ============================================
+
+# Service metrics, served at /metrics next to the shared HTTP and DB ones
+AGENT_RUNS = Gauge(
+    "summit_agent_runs", "Agent runs in this process by state",
+    ["state"], registry=metrics_registry
+)
+AGENT_RUN_DURATION = Histogram(
+    "summit_agent_run_duration_seconds", "Agent run wall time",
+    ["agent_type", "outcome"], buckets=LATENCY_BUCKETS + (60.0, 120.0, 300.0), registry=metrics_registry
+)
 
 # ============================================
 # APP INITIALIZATION
@@ -41,6 +82,8 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     print("Summit Agent Runtime starting...")
     yield
+    if span_exporter.to_collector:
+        span_exporter.flush()
     print("Summit Agent Runtime shutting down...")
 
 app = FastAPI(
@@ -50,9 +93,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add rate limiter to app state
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Rate limiting, body limits, tracing, DB instrumentation and /metrics
+setup_service(app, "summit_agent_runtime", MAX_REQUEST_BODY_SIZE, BODY_SIZE_LIMITS)
 
 # CORS Configuration - Restricted for security
 ALLOWED_ORIGINS = [
@@ -68,6 +110,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+    expose_headers=["X-Request-ID"],
 )
 
 # Service URLs
@@ -84,7 +127,7 @@ def get_supabase() -> Client:
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         raise HTTPException(status_code=500, detail="Supabase not configured")
-    return create_client(url, key)
+    return instrument_client(create_client(url, key))
 
 # ============================================
 # ENUMS & MODELS
@@ -174,7 +217,8 @@ AGENT_TOOLS = {
         "description": "Analyze a specific document for insights",
         "parameters": {
             "source_id": "Document source ID",
-            "analysis_type": "Type of analysis: comprehensive, risk, summary"
+            "analysis_type": "Type of analysis: comprehensive, risk, summary",
+            "force": "Re-analyze even if a cached analysis of the same text exists"
         }
     },
     "draft_document": {
@@ -224,18 +268,50 @@ AGENT_TOOLS = {
 # TOOL EXECUTION
 # ============================================
 
+async def _on_outbound_request(request: httpx.Request) -> None:
+    span = start_span(f"HTTP {request.method} {request.url.host}{request.url.path}")
+    request.extensions["trace_span"] = span
+    request.headers["traceparent"] = span.traceparent()
+    request.headers["X-Request-ID"] = span.request_id
+
+
+async def _on_outbound_response(response: httpx.Response) -> None:
+    span = response.request.extensions.get("trace_span")
+    if span is not None:
+        span.attributes["http.status_code"] = response.status_code
+        if response.status_code >= 500:
+            span.status = "error"
+        span.end()
+
+
+# Event hooks for internal service calls: each call gets a client span and
+# forwards the trace to the callee
+TRACED_HTTP_HOOKS = {"request": [_on_outbound_request], "response": [_on_outbound_response]}
+
+
 async def execute_tool(
     tool_name: str,
     parameters: Dict[str, Any],
     auth_token: str,
     supabase: Client
+) -> Dict[str, Any]:
+    """Execute an agent tool as a traced span"""
+    with trace_span(f"tool {tool_name}", tool=tool_name):
+        return await _execute_tool(tool_name, parameters, auth_token, supabase)
+
+
+async def _execute_tool(
+    tool_name: str,
+    parameters: Dict[str, Any],
+    auth_token: str,
+    supabase: Client
 ) -> Dict[str, Any]:
     """Execute an agent tool"""
 
     # Configure timeout: 30s connect, 120s for LLM operations (can be slow)
     timeout = httpx.Timeout(30.0, read=120.0)
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
+    async with httpx.AsyncClient(timeout=timeout, event_hooks=TRACED_HTTP_HOOKS) as client:
         headers = {"Authorization": auth_token}
 
         if tool_name == "search_matter":
@@ -256,7 +332,8 @@ async def execute_tool(
                 params={
                     "source_id": parameters["source_id"],
                     "matter_id": parameters.get("matter_id"),
-                    "analysis_type": parameters.get("analysis_type", "comprehensive")
+                    "analysis_type": parameters.get("analysis_type", "comprehensive"),
+                    "force": parameters.get("force", False)
                 },
                 headers=headers
             )
@@ -296,15 +373,20 @@ async def execute_tool(
             return {"sent": len(parameters.get("user_ids", []))}
 
         elif tool_name == "create_event":
-            result = supabase.table("matter_events").insert({
-                "matter_id": parameters["matter_id"],
-                "title": parameters["title"],
-                "event_date": parameters["date"],
-                "event_type": "deadline" if parameters.get("is_deadline") else "event",
-                "is_deadline": parameters.get("is_deadline", False),
-                "is_completed": False
-            }).execute()
-            return {"event_id": result.data[0]["id"] if result.data else None}
+            # Created through Summit API so its deadline index and the
+            # matter's next_deadline stay current
+            response = await client.post(
+                f"{SUMMIT_API_URL}/api/v1/matters/{parameters['matter_id']}/events",
+                json={
+                    "title": parameters["title"],
+                    "event_date": parameters["date"],
+                    "event_type": "deadline" if parameters.get("is_deadline") else "event",
+                    "is_deadline": parameters.get("is_deadline", False)
+                },
+                headers=headers
+            )
+            response.raise_for_status()
+            return {"event_id": response.json().get("id")}
 
         elif tool_name == "llm_complete":
             response = await client.post(
@@ -382,7 +464,11 @@ async def run_agent(
                 try:
                     result = await execute_tool(
                         "analyze_document",
-                        {"source_id": source["id"], "matter_id": matter_id},
+                        {
+                            "source_id": source["id"],
+                            "matter_id": matter_id,
+                            "force": config.get("force_reanalysis", False)
+                        },
                         auth_token,
                         supabase
                     )
@@ -402,19 +488,20 @@ async def run_agent(
                     }).eq("run_id", run_id).eq("task_name", f"Analyze {source['source_name']}").execute()
 
         elif agent_type == "deadline_monitor":
-            # Check upcoming deadlines and send alerts
-            from datetime import timedelta
-
+            # Check upcoming deadlines and send alerts. Summit API serves
+            # these from its per-org deadline index rather than a table scan.
             cutoff_days = config.get("alert_days", 7)
-            cutoff = (datetime.now() + timedelta(days=cutoff_days)).strftime("%Y-%m-%d")
 
-            deadlines = supabase.table("matter_events").select(
-                "*, matters(code, name)"
-            ).eq("is_deadline", True).eq("is_completed", False).lte(
-                "event_date", cutoff
-            ).execute()
+            async with httpx.AsyncClient(timeout=httpx.Timeout(30.0), event_hooks=TRACED_HTTP_HOOKS) as client:
+                response = await client.get(
+                    f"{SUMMIT_API_URL}/api/v1/deadlines",
+                    params={"days": min(cutoff_days, 90)},
+                    headers={"Authorization": auth_token}
+                )
+                response.raise_for_status()
+                deadlines = response.json()
 
-            for deadline in deadlines.data or []:
+            for deadline in deadlines:
                 # Get matter team
                 team = supabase.table("matter_team").select("user_id").eq(
                     "matter_id", deadline["matter_id"]
@@ -434,7 +521,7 @@ async def run_agent(
                         supabase
                     )
 
-            results["deadlines_processed"] = len(deadlines.data or [])
+            results["deadlines_processed"] = len(deadlines)
 
         elif agent_type == "research_assistant":
             # RAG-based research
@@ -554,6 +641,21 @@ Return a JSON object with: {{"compliant": true/false, "issues": [], "recommendat
         }).eq("id", run_id).execute()
         raise
 
+async def run_agent_as_unit(run_id: str, agent: Dict[str, Any], *args):
+    """Run an agent with its database calls attributed to the run, not the request"""
+    AGENT_RUNS.labels("queued").dec()
+    AGENT_RUNS.labels("running").inc()
+    started = time.perf_counter()
+    outcome = "failed"
+    try:
+        with db_unit_of_work(f"agent run {run_id} ({agent['agent_type']})"), \
+                trace_span("agent run", run_id=run_id, agent_type=agent["agent_type"]):
+            await run_agent(run_id, agent, *args)
+        outcome = "completed"
+    finally:
+        AGENT_RUNS.labels("running").dec()
+        AGENT_RUN_DURATION.labels(agent["agent_type"], outcome).observe(time.perf_counter() - started)
+
 # ============================================
 # AUTHENTICATION
 # ============================================
@@ -562,7 +664,7 @@ def get_demo_mode() -> bool:
     """Check if running in demo mode (no JWT secret configured)"""
     return not os.getenv("SUPABASE_JWT_SECRET")
 
-async def get_current_user(
+async def authenticate_user(
     authorization: str = Header(None),
     supabase: Client = Depends(get_supabase)
 ) -> Dict:
@@ -633,6 +735,17 @@ async def get_current_user(
         print(f"Authentication error: {str(e)}")
         raise HTTPException(status_code=401, detail="Authentication failed")
 
+async def get_current_user(
+    request: Request,
+    authorization: str = Header(None),
+    supabase: Client = Depends(get_supabase)
+) -> Dict:
+    """Authenticate the caller and charge the request to their org's quota"""
+    user = await authenticate_user(authorization, supabase)
+    charge_org_quota(user["org_id"], request_cost(request, ROUTE_COSTS))
+    return user
+
+
 # ============================================
 # ENDPOINTS
 # ============================================
@@ -716,8 +829,9 @@ async def start_run(
     run = run_result.data[0]
 
     # Start agent execution in background
+    AGENT_RUNS.labels("queued").inc()
     background_tasks.add_task(
-        run_agent,
+        run_agent_as_unit,
         run["id"],
         {**agent.data, "config": {**agent.data.get("config", {}), **request.config_overrides}},
         run_data["input_data"],
@@ -728,7 +842,8 @@ async def start_run(
     return {
         "run_id": run["id"],
         "status": RunStatus.PENDING.value,
-        "message": "Agent run started"
+        "message": "Agent run started",
+        "trace_id": current_span().trace_id
     }
 
 @app.get("/api/v1/runs/{run_id}")
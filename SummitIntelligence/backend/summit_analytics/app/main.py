@@ -5,7 +5,8 @@ Calculates Summit Gain Index (SGI) and provides analytics.
 Tracks usage, performance, and ROI metrics.
 """
 
-from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
@@ -13,13 +14,29 @@ from datetime import datetime, timedelta, date
 from enum import Enum
 import os
 import jwt
+import json
+import logging
 from contextlib import asynccontextmanager
 
+# Shared tracing and DB instrumentation report through logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
 from supabase import create_client, Client
 from dotenv import load_dotenv
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+
+# Rate limiting, tracing, DB instrumentation and metrics shared by every service
+from summit_common.service import (
+    charge_org_quota, instrument_client, replica_dependencies, request_cost, setup_service,
+    span_exporter
+)
+
+try:
+    import orjson
+except ImportError:  # optional speedup; falls back to stdlib json
+    orjson = None
 
 load_dotenv()
 
@@ -27,7 +44,27 @@ load_dotenv()
 # RATE LIMITING
 # ============================================
 
-limiter = Limiter(key_func=get_remote_address)
+# The per-user limiter and the org budget are shared (summit_common.service);
+# requests spend ROUTE_COSTS[path] units of their org's budget (1 if unlisted).
+ROUTE_COSTS = {
+    "/api/v1/sgi": 5,
+    "/api/v1/sgi/snapshot": 5,
+    "/api/v1/usage": 3,
+    "/api/v1/analytics/matters": 5,
+    "/api/v1/analytics/users": 5,
+    "/api/v1/analytics/trends": 3,
+}
+
+# ============================================
+# REQUEST BODY LIMIT
+# ============================================
+
+# Keys are route templates; anything unlisted gets MAX_REQUEST_BODY_SIZE.
+MAX_REQUEST_BODY_SIZE = int(os.getenv("MAX_REQUEST_BODY_SIZE", str(1024 * 1024)))
+BODY_SIZE_LIMITS = {
+    "/api/v1/events/track": 16 * 1024,
+    "/api/v1/sgi/snapshot": 1024,
+}
 
 # ============================================
 # APP INITIALIZATION
@@ -38,6 +75,8 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     print("Summit Analytics starting...")
     yield
+    if span_exporter.to_collector:
+        span_exporter.flush()
     print("Summit Analytics shutting down...")
 
 app = FastAPI(
@@ -47,9 +86,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add rate limiter to app state
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Rate limiting, body limits, tracing, DB instrumentation and /metrics
+setup_service(app, "summit_analytics", MAX_REQUEST_BODY_SIZE, BODY_SIZE_LIMITS)
 
 # CORS Configuration - Restricted for security
 ALLOWED_ORIGINS = [
@@ -64,7 +102,8 @@ app.add_middleware(
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+    allow_headers=["Authorization", "Content-Type", "X-Request-ID", "X-Read-Consistency"],
+    expose_headers=["X-Request-ID"],
 )
 
 # ============================================
@@ -77,7 +116,7 @@ def get_supabase() -> Client:
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         raise HTTPException(status_code=500, detail="Supabase not configured")
-    return create_client(url, key)
+    return instrument_client(create_client(url, key))
 
 # ============================================
 # MODELS
@@ -252,7 +291,7 @@ def get_demo_mode() -> bool:
     """Check if running in demo mode (no JWT secret configured)"""
     return not os.getenv("SUPABASE_JWT_SECRET")
 
-async def get_current_user(
+async def authenticate_user(
     authorization: str = Header(None),
     supabase: Client = Depends(get_supabase)
 ) -> Dict:
@@ -323,10 +362,44 @@ async def get_current_user(
         print(f"Authentication error: {str(e)}")
         raise HTTPException(status_code=401, detail="Authentication failed")
 
+async def get_current_user(
+    request: Request,
+    authorization: str = Header(None),
+    supabase: Client = Depends(get_supabase)
+) -> Dict:
+    """Authenticate the caller and charge the request to their org's quota"""
+    user = await authenticate_user(authorization, supabase)
+    charge_org_quota(user["org_id"], request_cost(request, ROUTE_COSTS))
+    return user
+
+
+# ============================================
+# READ REPLICAS
+# ============================================
+
+# Read-only routes take get_read_supabase, which may route to a healthy
+# replica; routes that write take get_write_supabase, which pins the org's
+# reads to the primary for a while, across every service (see
+# summit_common.service).
+get_read_supabase, get_write_supabase = replica_dependencies(get_supabase, get_current_user)
+
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
 
+def json_response(data: Any) -> Response:
+    """
+    Serialize rows we built or fetched ourselves straight to JSON.
+
+    Skips FastAPI's per-row jsonable_encoder walk, which dominates the cost
+    of large analytics lists, and uses orjson when installed.
+    """
+    if orjson is not None:
+        body = orjson.dumps(data, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        body = json.dumps(data, separators=(",", ":"), default=jsonable_encoder).encode()
+    return Response(content=body, media_type="application/json")
+
 def get_date_range(time_range: TimeRange) -> tuple[str, str]:
     """Get start and end dates for time range"""
     end = datetime.now()
@@ -361,7 +434,7 @@ async def health_check():
 @app.get("/api/v1/sgi", response_model=SGIMetrics)
 async def get_sgi(
     time_range: TimeRange = Query(TimeRange.MONTH),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get current SGI score and metrics"""
@@ -417,7 +490,7 @@ async def get_sgi(
 @app.get("/api/v1/sgi/history")
 async def get_sgi_history(
     days: int = Query(30, le=365),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get SGI history for trending"""
@@ -428,11 +501,11 @@ async def get_sgi_history(
         "snapshot_date, sgi_score, time_saved_hours, cost_avoided_usd, breakdown"
     ).eq("org_id", org_id).gte("snapshot_date", start_date).order("snapshot_date").execute()
 
-    return result.data or []
+    return json_response(result.data or [])
 
 @app.post("/api/v1/sgi/snapshot")
 async def create_sgi_snapshot(
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_write_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Create a new SGI snapshot (typically called by scheduled job)"""
@@ -459,7 +532,7 @@ async def create_sgi_snapshot(
 @app.get("/api/v1/usage", response_model=UsageMetrics)
 async def get_usage_metrics(
     time_range: TimeRange = Query(TimeRange.MONTH),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get usage metrics"""
@@ -505,11 +578,11 @@ async def get_usage_metrics(
         estimated_cost_usd=round(estimated_cost, 2)
     )
 
-@app.get("/api/v1/analytics/matters")
+@app.get("/api/v1/analytics/matters", response_model=List[MatterAnalytics])
 async def get_matter_analytics(
     time_range: TimeRange = Query(TimeRange.MONTH),
     limit: int = Query(10, ge=1, le=50),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get matter-level analytics"""
@@ -557,27 +630,27 @@ async def get_matter_analytics(
         source_count = source_counts.get(matter["id"], 0)
         time_saved = ai_count * 0.5 + source_count * 1.5
 
-        analytics.append(MatterAnalytics(
-            matter_id=matter["id"],
-            matter_code=matter["code"],
-            matter_name=matter["name"],
-            ai_interactions=ai_count,
-            documents_analyzed=source_count,
-            time_saved_hours=round(time_saved, 1),
-            risk_score=matter.get("risk_score", 0),
-            compliance_state=matter.get("compliance_state", "green")
-        ))
+        analytics.append({
+            "matter_id": matter["id"],
+            "matter_code": matter["code"],
+            "matter_name": matter["name"],
+            "ai_interactions": ai_count,
+            "documents_analyzed": source_count,
+            "time_saved_hours": round(time_saved, 1),
+            "risk_score": float(matter.get("risk_score") or 0),
+            "compliance_state": matter.get("compliance_state", "green")
+        })
 
     # Sort by AI interactions descending
-    analytics.sort(key=lambda x: x.ai_interactions, reverse=True)
+    analytics.sort(key=lambda x: x["ai_interactions"], reverse=True)
 
-    return analytics[:limit]
+    return json_response(analytics[:limit])
 
-@app.get("/api/v1/analytics/users")
+@app.get("/api/v1/analytics/users", response_model=List[UserAnalytics])
 async def get_user_analytics(
     time_range: TimeRange = Query(TimeRange.MONTH),
     limit: int = Query(10, ge=1, le=50),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get user-level analytics"""
@@ -638,25 +711,25 @@ async def get_user_analytics(
 
         time_saved = queries * 0.5 + runs * 2 + docs * 1.5
 
-        analytics.append(UserAnalytics(
-            user_id=user["id"],
-            user_name=user["full_name"],
-            queries=queries,
-            documents_processed=docs,
-            agent_runs=runs,
-            time_saved_hours=round(time_saved, 1)
-        ))
+        analytics.append({
+            "user_id": user["id"],
+            "user_name": user["full_name"],
+            "queries": queries,
+            "documents_processed": docs,
+            "agent_runs": runs,
+            "time_saved_hours": round(time_saved, 1)
+        })
 
     # Sort by queries descending
-    analytics.sort(key=lambda x: x.queries, reverse=True)
+    analytics.sort(key=lambda x: x["queries"], reverse=True)
 
-    return analytics[:limit]
+    return json_response(analytics[:limit])
 
 @app.get("/api/v1/analytics/trends")
 async def get_trends(
     metric: str = Query("queries"),
     time_range: TimeRange = Query(TimeRange.MONTH),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get trend data for specific metrics"""
@@ -675,7 +748,7 @@ async def get_trends(
             date = call["created_at"][:10]
             daily_counts[date] = daily_counts.get(date, 0) + 1
 
-        return [{"date": k, "value": v} for k, v in sorted(daily_counts.items())]
+        return json_response([{"date": k, "value": v} for k, v in sorted(daily_counts.items())])
 
     elif metric == "documents":
         result = supabase.table("matter_sources").select("created_at").gte(
@@ -687,7 +760,7 @@ async def get_trends(
             date = source["created_at"][:10]
             daily_counts[date] = daily_counts.get(date, 0) + 1
 
-        return [{"date": k, "value": v} for k, v in sorted(daily_counts.items())]
+        return json_response([{"date": k, "value": v} for k, v in sorted(daily_counts.items())])
 
     elif metric == "agent_runs":
         result = supabase.table("agent_runs").select("created_at, status").gte(
@@ -699,14 +772,14 @@ async def get_trends(
             date = run["created_at"][:10]
             daily_counts[date] = daily_counts.get(date, 0) + 1
 
-        return [{"date": k, "value": v} for k, v in sorted(daily_counts.items())]
+        return json_response([{"date": k, "value": v} for k, v in sorted(daily_counts.items())])
 
     elif metric == "sgi":
         result = supabase.table("sgi_snapshots").select("snapshot_date, sgi_score").eq(
             "org_id", org_id
         ).gte("snapshot_date", start_date).order("snapshot_date").execute()
 
-        return [{"date": s["snapshot_date"], "value": s["sgi_score"]} for s in result.data or []]
+        return json_response([{"date": s["snapshot_date"], "value": s["sgi_score"]} for s in result.data or []])
 
     else:
         raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
@@ -715,7 +788,7 @@ async def get_trends(
 async def track_event(
     event_type: str,
     event_data: Dict[str, Any] = {},
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_write_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Track an analytics event"""
@@ -5,15 +5,34 @@ FastAPI service for Supabase-integrated data access.
 Handles users, matters, sources, and all core entities.
 """
 
-from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from pydantic_core import PydanticUndefined
+from typing import List, Optional, Dict, Any, Callable, get_args, get_origin
 from datetime import datetime, date
 from enum import Enum
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlencode
 import os
+import re
 import jwt
+import copy
+import json
+import time
+import bisect
+import hashlib
+import asyncio
 import logging
+import threading
+
+try:
+    import orjson
+except ImportError:  # optional speedup; falls back to stdlib json
+    orjson = None
 
 # Configure structured logging
 logging.basicConfig(
@@ -60,13 +79,18 @@ class SourceType(str, Enum):
     EVIDENCE = "evidence"
     RESEARCH = "research"
     OTHER = "other"
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from dotenv import load_dotenv
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+
+# Rate limiting, tracing, DB instrumentation and metrics shared by every service
+from summit_common.service import (
+    CACHE_LOOKUPS, charge_org_quota, instrument_client, limiter, replica_dependencies, request_cost, setup_service,
+    span_exporter
+)
 
 load_dotenv()
 
@@ -74,15 +98,24 @@ load_dotenv()
 # RATE LIMITING
 # ============================================
 
-limiter = Limiter(key_func=get_remote_address)
+# The per-user limiter and the org budget are shared (summit_common.service);
+# requests spend ROUTE_COSTS[path] units of their org's budget (1 if unlisted).
+ROUTE_COSTS = {
+    "/api/v1/users": 2,
+    "/api/v1/matters": 2,
+    "/api/v1/matters/{matter_id}/sources": 2,
+    "/api/v1/matters/{matter_id}/sources/{source_id}/content": 5,
+    "/api/v1/matters/{matter_id}/sources/{source_id}/text": 5,
+    "/api/v1/search": 5,
+    "/api/v1/dashboard": 5,
+    "/api/v1/matters/batch": 5,
+    "/api/v1/sources/batch": 5,
+}
 
 # ============================================
 # CONFIGURATION
 # ============================================
 
-# Request size limits
-MAX_REQUEST_BODY_SIZE = 10 * 1024 * 1024  # 10 MB
-
 
 def normalize_origin(origin: str) -> str:
     """Normalize CORS origin by removing trailing slashes and whitespace."""
@@ -115,6 +148,20 @@ def validate_environment():
         raise RuntimeError(error_msg)
 
 
+# ============================================
+# REQUEST BODY LIMIT
+# ============================================
+
+# Keys are route templates; anything unlisted gets MAX_REQUEST_BODY_SIZE.
+MAX_REQUEST_BODY_SIZE = int(os.getenv("MAX_REQUEST_BODY_SIZE", str(10 * 1024 * 1024)))
+BODY_SIZE_LIMITS = {
+    "/api/v1/search": 16 * 1024,
+    "/api/v1/matters/batch": 64 * 1024,
+    "/api/v1/sources/batch": 64 * 1024,
+    "/api/v1/matters/{matter_id}/events": 64 * 1024,
+    "/api/v1/matters/{matter_id}/events/{event_id}/complete": 1024,
+}
+
 # ============================================
 # APP INITIALIZATION
 # ============================================
@@ -128,7 +175,18 @@ async def lifespan(app: FastAPI):
     validate_environment()
 
     logger.info("Environment validated successfully")
+
+    change_listener = None
+    if os.getenv("DATABASE_URL"):
+        change_listener = asyncio.create_task(listen_for_changes(os.getenv("DATABASE_URL")))
+
     yield
+
+    if change_listener:
+        change_listener.cancel()
+    dashboard_executor.shutdown(wait=False, cancel_futures=True)
+    if span_exporter.to_collector:
+        span_exporter.flush()
     logger.info("Summit API shutting down...")
 
 app = FastAPI(
@@ -138,30 +196,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add rate limiter to app state
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-
-# Request body size limit middleware
-from starlette.responses import JSONResponse
-
-@app.middleware("http")
-async def limit_request_body_size(request: Request, call_next):
-    """Reject requests with bodies larger than MAX_REQUEST_BODY_SIZE."""
-    content_length = request.headers.get("content-length")
-    if content_length:
-        try:
-            if int(content_length) > MAX_REQUEST_BODY_SIZE:
-                return JSONResponse(
-                    status_code=413,
-                    content={"detail": f"Request body too large. Maximum size is {MAX_REQUEST_BODY_SIZE // (1024 * 1024)} MB"}
-                )
-        except ValueError:
-            # Invalid content-length header
-            pass
-    return await call_next(request)
-
+# Rate limiting, body limits, tracing, DB instrumentation and /metrics
+setup_service(app, "summit_api", MAX_REQUEST_BODY_SIZE, BODY_SIZE_LIMITS)
 
 # CORS Configuration - Restricted for security
 ALLOWED_ORIGINS = [
@@ -181,7 +217,10 @@ app.add_middleware(
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+    allow_headers=[
+        "Authorization", "Content-Type", "X-Request-ID", "If-None-Match", "Range", "Last-Event-ID", "X-Read-Consistency"
+    ],
+    expose_headers=["ETag", "Content-Range", "Accept-Ranges", "X-Text-Length", "X-Page-Count", "X-Request-ID"],
 )
 
 # ============================================
@@ -194,7 +233,7 @@ def get_supabase() -> Client:
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         raise HTTPException(status_code=500, detail="Supabase not configured")
-    return create_client(url, key)
+    return instrument_client(create_client(url, key))
 
 # ============================================
 # PYDANTIC MODELS
@@ -266,12 +305,26 @@ class MatterEvent(BaseModel):
     is_deadline: bool = False
     is_completed: bool = False
 
+class MatterEventCreate(BaseModel):
+    event_type: str = "event"
+    title: str = Field(..., min_length=1, max_length=500)
+    event_date: date
+    is_deadline: bool = False
+    description: Optional[str] = None
+
 class SearchQuery(BaseModel):
     query: str
     matter_id: Optional[str] = None
     filters: Dict[str, Any] = {}
     limit: int = 20
 
+class BatchGetRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=200)
+
+class MatterBatch(BaseModel):
+    items: List[MatterSummary]
+    missing: List[str] = []
+
 class SGISnapshot(BaseModel):
     sgi_score: float
     time_saved_hours: float
@@ -289,7 +342,7 @@ def get_demo_mode() -> bool:
     """Check if running in demo mode (no JWT secret configured)"""
     return not os.getenv("SUPABASE_JWT_SECRET")
 
-async def get_current_user(
+async def authenticate_user(
     authorization: str = Header(None),
     supabase: Client = Depends(get_supabase)
 ) -> Dict:
@@ -363,6 +416,26 @@ async def get_current_user(
         logger.error(f"Authentication error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=401, detail="Authentication failed")
 
+async def get_current_user(
+    request: Request,
+    authorization: str = Header(None),
+    supabase: Client = Depends(get_supabase)
+) -> Dict:
+    """Authenticate the caller and charge the request to their org's quota"""
+    user = await authenticate_user(authorization, supabase)
+    charge_org_quota(user["org_id"], request_cost(request, ROUTE_COSTS))
+    return user
+
+
+
+# ============================================
+# READ REPLICAS
+# ============================================
+
+# Read-only routes take get_read_supabase, which may route to a healthy
+# replica; routes that write take get_write_supabase, which pins the org's
+# reads to the primary for a while (see summit_common.service).
+get_read_supabase, get_write_supabase = replica_dependencies(get_supabase, get_current_user)
 
 # ============================================
 # AUDIT LOGGING
@@ -431,6 +504,543 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
+# ============================================
+# MATTER DETAIL LOADER
+# ============================================
+
+# Matter detail is the most-read payload when lawyers open a matter, so it is
+# fetched in a single PostgREST round trip and cached briefly per matter.
+MATTER_DETAIL_TTL_SECONDS = float(os.getenv("MATTER_DETAIL_TTL_SECONDS", "15"))
+MATTER_DETAIL_CACHE_SIZE = int(os.getenv("MATTER_DETAIL_CACHE_SIZE", "1024"))
+
+MATTER_DETAIL_SELECT = "*, matter_team(*, users(full_name, email, role)), matter_parties(*)"
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose key matches predicate. Returns the number dropped."""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+
+matter_detail_cache = TTLCache(MATTER_DETAIL_TTL_SECONDS, MATTER_DETAIL_CACHE_SIZE)
+
+# Flipped off the first time PostgREST reports that it cannot embed the
+# related tables (the relationships are not exposed), after which the loader
+# goes concurrent. Any other error is raised as usual.
+_matter_embedding_supported = True
+RELATIONSHIP_NOT_FOUND = {"PGRST200", "PGRST201"}
+
+
+def invalidate_matter_detail(matter_id: str) -> None:
+    """Drop cached detail for a matter. Call after team or party changes."""
+    matter_detail_cache.invalidate(lambda key: key[1] == matter_id)
+
+
+def _fetch_matter_embedded(supabase: Client, org_id: str, matter_id: str) -> Optional[Dict]:
+    """Fetch a matter with its team and parties embedded in one request."""
+    result = supabase.table("matters").select(MATTER_DETAIL_SELECT).eq(
+        "id", matter_id
+    ).eq("org_id", org_id).limit(1).execute()
+    if not result.data:
+        return None
+
+    matter = result.data[0]
+    matter["team"] = matter.pop("matter_team", None) or []
+    matter["parties"] = matter.pop("matter_parties", None) or []
+    return matter
+
+
+async def _fetch_matter_concurrently(supabase: Client, org_id: str, matter_id: str) -> Optional[Dict]:
+    """Fetch a matter, its team and its parties as three concurrent requests."""
+    matter_result, team_result, parties_result = await asyncio.gather(
+        asyncio.to_thread(
+            lambda: supabase.table("matters").select("*").eq("id", matter_id).eq("org_id", org_id).limit(1).execute()
+        ),
+        asyncio.to_thread(
+            lambda: supabase.table("matter_team").select("*, users(full_name, email, role)").eq("matter_id", matter_id).execute()
+        ),
+        asyncio.to_thread(
+            lambda: supabase.table("matter_parties").select("*").eq("matter_id", matter_id).execute()
+        ),
+    )
+    if not matter_result.data:
+        return None
+
+    matter = matter_result.data[0]
+    matter["team"] = team_result.data or []
+    matter["parties"] = parties_result.data or []
+    return matter
+
+
+def _cached_matter_detail(org_id: str, matter_id: str) -> Optional[Dict]:
+    cached = matter_detail_cache.get((org_id, matter_id))
+    CACHE_LOOKUPS.labels("matter_detail", "miss" if cached is None else "hit").inc()
+    # Callers may edit team and parties; keep the cached lists untouched
+    return copy.deepcopy(cached) if cached is not None else None
+
+
+def _store_matter_detail(org_id: str, matter_id: str, matter: Dict) -> Dict:
+    matter["client_name"] = next(
+        (p["name"] for p in matter["parties"] if p.get("party_type") == "client"), None
+    )
+    matter_detail_cache.set((org_id, matter_id), matter)
+    return copy.deepcopy(matter)
+
+
+def load_embedded_matter_detail(supabase: Client, org_id: str, matter_id: str) -> Optional[Dict]:
+    """Blocking load_matter_detail for callers that know the embedded select works."""
+    matter = _cached_matter_detail(org_id, matter_id)
+    if matter is None:
+        matter = _fetch_matter_embedded(supabase, org_id, matter_id)
+        if matter:
+            matter = _store_matter_detail(org_id, matter_id, matter)
+    return matter
+
+
+async def load_matter_detail(supabase: Client, org_id: str, matter_id: str) -> Optional[Dict]:
+    """
+    Load a matter with its team, parties and client name.
+
+    Served from a short-TTL per-matter cache when possible. Otherwise fetches
+    everything in a single embedded request, falling back to concurrent
+    requests if PostgREST cannot embed the related tables.
+    """
+    global _matter_embedding_supported
+
+    cached = _cached_matter_detail(org_id, matter_id)
+    if cached is not None:
+        return cached
+
+    matter = None
+    if _matter_embedding_supported:
+        try:
+            matter = await asyncio.to_thread(_fetch_matter_embedded, supabase, org_id, matter_id)
+        except APIError as e:
+            if e.code not in RELATIONSHIP_NOT_FOUND:
+                raise
+            logger.warning(f"Embedded matter fetch unavailable, using concurrent fetch: {e}")
+            _matter_embedding_supported = False
+
+    if not _matter_embedding_supported:
+        matter = await _fetch_matter_concurrently(supabase, org_id, matter_id)
+
+    if not matter:
+        return None
+    return _store_matter_detail(org_id, matter_id, matter)
+
+
+# ============================================
+# CONDITIONAL GET & RESPONSE CACHE
+# ============================================
+
+# Serialized responses are cached per org, keyed by resource and ETag, so a
+# repeat poll of unchanged data costs one slim version query and no
+# serialization. Each org gets its own byte budget so one busy tenant cannot
+# evict everyone else's entries.
+RESPONSE_CACHE_MAX_BYTES_PER_ORG = int(os.getenv("RESPONSE_CACHE_MAX_BYTES_PER_ORG", str(8 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ORGS = int(os.getenv("RESPONSE_CACHE_MAX_ORGS", "256"))
+
+
+class OrgResponseCache:
+    """Serialized response bodies partitioned per org, with LRU eviction by bytes."""
+
+    def __init__(self, max_bytes_per_org: int, max_orgs: int):
+        self.max_bytes_per_org = max_bytes_per_org
+        self.max_orgs = max_orgs
+        self._partitions: "OrderedDict[str, OrderedDict[Any, bytes]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, org_id: str, key: Any) -> Optional[bytes]:
+        with self._lock:
+            partition = self._partitions.get(org_id)
+            if partition is None or key not in partition:
+                return None
+            self._partitions.move_to_end(org_id)
+            partition.move_to_end(key)
+            return partition[key]
+
+    def set(self, org_id: str, key: Any, body: bytes) -> None:
+        if len(body) > self.max_bytes_per_org:
+            return
+        with self._lock:
+            partition = self._partitions.setdefault(org_id, OrderedDict())
+            self._partitions.move_to_end(org_id)
+            if key in partition:
+                self._sizes[org_id] -= len(partition.pop(key))
+            partition[key] = body
+            self._sizes[org_id] = self._sizes.get(org_id, 0) + len(body)
+
+            while self._sizes[org_id] > self.max_bytes_per_org:
+                _, evicted = partition.popitem(last=False)
+                self._sizes[org_id] -= len(evicted)
+
+            while len(self._partitions) > self.max_orgs:
+                evicted_org, _ = self._partitions.popitem(last=False)
+                self._sizes.pop(evicted_org, None)
+
+
+response_cache = OrgResponseCache(RESPONSE_CACHE_MAX_BYTES_PER_ORG, RESPONSE_CACHE_MAX_ORGS)
+
+
+def resource_cache_key(request: Request) -> str:
+    """Identify a resource by path and normalized query string."""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def compute_etag(resource_key: str, versions: List[Dict]) -> str:
+    """
+    Build a strong ETag from the version rows behind a response.
+
+    Version rows are normally just (id, updated_at) pairs, so any insert,
+    delete or update of an underlying row changes the tag.
+    """
+    digest = hashlib.sha256(resource_key.encode())
+    if orjson is not None:
+        digest.update(orjson.dumps(versions, default=str, option=orjson.OPT_SORT_KEYS))
+    else:
+        digest.update(json.dumps(versions, sort_keys=True, default=str).encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def encode_json(data: Any) -> bytes:
+    """Compact JSON bytes, via orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(",", ":"), default=jsonable_encoder).encode()
+
+
+@lru_cache(maxsize=None)
+def _row_projection(model: Any) -> tuple:
+    """(field name, default) pairs of a response model; required fields default to PydanticUndefined."""
+    return tuple(
+        (name, PydanticUndefined if field.is_required() else field.get_default(call_default_factory=True))
+        for name, field in model.model_fields.items()
+    )
+
+
+def project_rows(rows: List[Dict], model: Any) -> List[Dict]:
+    """
+    Trim rows to a model's fields and fill defaults, without validating them.
+
+    A row missing a required field falls back to validation, which raises
+    rather than serving the field as null.
+    """
+    fields = _row_projection(model)
+    projected = [{name: row.get(name, default) for name, default in fields} for row in rows]
+    if any(value is PydanticUndefined for row in projected for value in row.values()):
+        adapter = _type_adapter(List[model])
+        return adapter.dump_python(adapter.validate_python(rows))
+    return projected
+
+
+def serialize_response(data: Any, model: Any = None, trusted: bool = False) -> bytes:
+    """
+    Serialize data as the endpoint's response_model would.
+
+    Rows straight from our own PostgREST queries already have the right
+    types, so with trusted=True a List[Model] payload is only projected to
+    the model's fields instead of being validated row by row.
+    """
+    if model is not None and trusted and get_origin(model) in (list, List):
+        return encode_json(project_rows(data, get_args(model)[0]))
+    if model is not None:
+        adapter = _type_adapter(model)
+        return adapter.dump_json(adapter.validate_python(data))
+    return encode_json(data)
+
+
+def json_response(data: Any, model: Any = None, trusted: bool = False) -> Response:
+    """Return data through the fast serialization path, bypassing FastAPI's encoder."""
+    return Response(content=serialize_response(data, model, trusted), media_type="application/json")
+
+
+def probe_versions(query) -> Optional[List[Dict]]:
+    """Run a slim version query, or return None if the table can't answer it."""
+    try:
+        return query.execute().data or []
+    except APIError as e:
+        logger.warning(f"Version probe failed, skipping response cache: {e}")
+        return None
+
+
+def conditional_response(
+    request: Request,
+    org_id: str,
+    versions: Optional[List[Dict]],
+    load: Callable[[], Any],
+    model: Any = None,
+    trusted: bool = False
+) -> Response:
+    """
+    Answer a read with ETag support and the per-org response cache.
+
+    Returns 304 when If-None-Match matches, a cached body when this exact
+    version was served before, and otherwise calls load() and serializes.
+    When versions is None the tag is derived from the loaded payload instead.
+    """
+    resource_key = resource_cache_key(request)
+
+    if versions is None:
+        data = load()
+        etag = compute_etag(resource_key, [data])
+        body = None
+    else:
+        etag = compute_etag(resource_key, versions)
+        data = None
+        body = response_cache.get(org_id, (resource_key, etag))
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        CACHE_LOOKUPS.labels("response", "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    if versions is not None:
+        CACHE_LOOKUPS.labels("response", "miss" if body is None else "hit").inc()
+
+    if body is None:
+        if data is None:
+            data = load()
+        body = serialize_response(data, model, trusted)
+        if versions is not None:
+            response_cache.set(org_id, (resource_key, etag), body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# ============================================
+# CHANGE FEED
+# ============================================
+
+# Row changes are kept per org so clients can follow a server-sent-events
+# feed instead of polling list endpoints. With DATABASE_URL set, changes come
+# from Postgres NOTIFY on CHANGE_FEED_CHANNEL, sent by row triggers with a
+# JSON payload {org_id, table, id, op, matter_id}. Without it, endpoints in
+# this process publish their own writes (local runs and tests), which only
+# covers LOCAL_CHANGE_FEED_TABLES; sources, team, parties and agent runs are
+# written by other services and only arrive through NOTIFY.
+CHANGE_FEED_CHANNEL = os.getenv("CHANGE_FEED_CHANNEL", "summit_changes")
+CHANGE_FEED_BUFFER_SIZE = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", "2000"))
+CHANGE_FEED_COALESCE_SECONDS = float(os.getenv("CHANGE_FEED_COALESCE_SECONDS", "0.5"))
+CHANGE_FEED_KEEPALIVE_SECONDS = float(os.getenv("CHANGE_FEED_KEEPALIVE_SECONDS", "20"))
+CHANGE_FEED_TABLES = ["matters", "matter_sources", "matter_events", "matter_team", "matter_parties", "agent_runs"]
+LOCAL_CHANGE_FEED_TABLES = ["matters", "matter_events"]
+
+
+class ChangeFeed:
+    """
+    Recent changes per org, one entry per row.
+
+    A newer change to a row replaces the older one, so a client catching up
+    sees only the latest state of each row. Cursors are "<epoch>-<seq>";
+    a cursor from another process or older than the retained buffer cannot
+    be resumed and gets a reset instead.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self.epoch = hashlib.sha256(f"{os.getpid()}:{time.time_ns()}".encode()).hexdigest()[:8]
+        self._seq = 0
+        self._logs: Dict[str, "OrderedDict[tuple, Dict]"] = {}
+        self._floors: Dict[str, int] = {}
+        self._waiters: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def cursor(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """Sequence number for a cursor issued by this feed, else None."""
+        epoch, _, seq = (cursor or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, org_id: str, table: str, row_id: str, op: str = "update", matter_id: Optional[str] = None) -> Dict:
+        with self._lock:
+            self._seq += 1
+            change = {
+                "seq": self._seq,
+                "table": table,
+                "op": op,
+                "id": row_id,
+                "matter_id": matter_id,
+                "at": datetime.utcnow().isoformat(),
+            }
+            log = self._logs.setdefault(org_id, OrderedDict())
+            log.pop((table, row_id), None)
+            log[(table, row_id)] = change
+            while len(log) > self.buffer_size:
+                _, evicted = log.popitem(last=False)
+                self._floors[org_id] = evicted["seq"]
+            waiters = list(self._waiters.get(org_id, ()))
+
+        self._wake(waiters)
+        return change
+
+    def since(self, org_id: str, seq: int) -> tuple[List[Dict], bool]:
+        """Changes after seq in order, and whether seq is too old to resume from."""
+        with self._lock:
+            if seq < self._floors.get(org_id, 0):
+                return [], True
+            log = self._logs.get(org_id) or {}
+            return [change for change in log.values() if change["seq"] > seq], False
+
+    def reset_all(self) -> None:
+        """Force every subscriber to resync, e.g. after notifications may have been missed."""
+        with self._lock:
+            for org_id in set(self._logs) | set(self._waiters):
+                self._floors[org_id] = self._seq
+            waiters = [w for org_waiters in self._waiters.values() for w in org_waiters]
+        self._wake(waiters)
+
+    def subscribe(self, org_id: str) -> asyncio.Event:
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.setdefault(org_id, set()).add(waiter)
+        return waiter[1]
+
+    def unsubscribe(self, org_id: str, wakeup: asyncio.Event) -> None:
+        with self._lock:
+            waiters = self._waiters.get(org_id, set())
+            waiters.difference_update({w for w in waiters if w[1] is wakeup})
+            if not waiters:
+                self._waiters.pop(org_id, None)
+
+    @staticmethod
+    def _wake(waiters: List[tuple]) -> None:
+        # Publishers may run in worker threads, so wake each loop threadsafely
+        for loop, wakeup in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(wakeup.set)
+
+
+change_feed = ChangeFeed(CHANGE_FEED_BUFFER_SIZE)
+
+# Set while the NOTIFY listener is connected; the database is then the only
+# source of changes and local publishing would duplicate them.
+_change_listener_connected = False
+
+
+def publish_change(org_id: str, table: str, row_id: str, op: str = "update", matter_id: Optional[str] = None) -> None:
+    """Record a write made by this service on the org's change feed."""
+    if not _change_listener_connected:
+        change_feed.publish(org_id, table, row_id, op, matter_id)
+
+
+def handle_change_notification(connection, pid, channel: str, payload: str) -> None:
+    """asyncpg listener: publish a NOTIFY payload and drop caches it makes stale."""
+    try:
+        change = json.loads(payload)
+        org_id, table, row_id = change["org_id"], change["table"], change["id"]
+    except (ValueError, KeyError, TypeError):
+        logger.warning(f"Ignoring malformed change notification: {payload[:200]}")
+        return
+
+    matter_id = change.get("matter_id")
+    if table == "matters":
+        invalidate_matter_detail(row_id)
+    elif table in ("matter_team", "matter_parties") and matter_id:
+        invalidate_matter_detail(matter_id)
+    elif table == "matter_events":
+        deadline_index.invalidate(org_id)
+
+    change_feed.publish(org_id, table, row_id, change.get("op", "update"), matter_id)
+
+
+async def listen_for_changes(dsn: str) -> None:
+    """Hold a LISTEN connection open, reconnecting (and resetting cursors) on loss."""
+    global _change_listener_connected
+    import asyncpg
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(CHANGE_FEED_CHANNEL, handle_change_notification)
+            _change_listener_connected = True
+            logger.info(f"Listening for changes on {CHANGE_FEED_CHANNEL}")
+            await closed.wait()
+        except asyncio.CancelledError:
+            if connection is not None:
+                await connection.close()
+            raise
+        except Exception as e:
+            logger.warning(f"Change listener unavailable: {e}")
+        finally:
+            _change_listener_connected = False
+
+        # Notifications sent while disconnected are lost
+        change_feed.reset_all()
+        await asyncio.sleep(5)
+
+
+def format_sse(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    """Encode one server-sent event."""
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    return "\n".join(lines) + "\n\n"
+
+
 # ============================================
 # HEALTH CHECK
 # ============================================
@@ -453,14 +1063,22 @@ async def health_check():
 @limiter.limit("60/minute")
 async def get_organisation(
     request: Request,
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get current user's organisation"""
-    result = supabase.table("organisations").select("*").eq("id", current_user["org_id"]).single().execute()
-    if not result.data:
+    org_id = current_user["org_id"]
+    versions = probe_versions(supabase.table("organisations").select("id, updated_at").eq("id", org_id))
+    if versions == []:
         raise HTTPException(status_code=404, detail="Organisation not found")
-    return result.data
+
+    def load() -> Dict:
+        result = supabase.table("organisations").select("*").eq("id", org_id).single().execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Organisation not found")
+        return result.data
+
+    return conditional_response(request, org_id, versions, load, Organisation)
 
 # ============================================
 # USER ENDPOINTS
@@ -485,7 +1103,7 @@ async def list_users(
     )
 
     result = supabase.table("users").select("*").eq("org_id", current_user["org_id"]).execute()
-    return result.data or []
+    return json_response(result.data or [], List[User], trusted=True)
 
 @app.get("/api/v1/users/me", response_model=User)
 async def get_current_user_profile(current_user: Dict = Depends(get_current_user)):
@@ -496,6 +1114,50 @@ async def get_current_user_profile(current_user: Dict = Depends(get_current_user
 # MATTER ENDPOINTS
 # ============================================
 
+def matters_query(
+    supabase: Client,
+    org_id: str,
+    columns: str,
+    status: Optional[MatterStatus] = None,
+    matter_type: Optional[MatterType] = None,
+    limit: int = 50,
+    offset: int = 0
+):
+    """Build the org's matter listing query, newest activity first."""
+    query = supabase.table("matters").select(columns).eq("org_id", org_id)
+    if status:
+        query = query.eq("status", status.value)
+    if matter_type:
+        query = query.eq("matter_type", matter_type.value)
+    return query.order("updated_at", desc=True).range(offset, offset + limit - 1)
+
+
+def fetch_matter_summaries(
+    supabase: Client,
+    org_id: str,
+    status: Optional[MatterStatus] = None,
+    matter_type: Optional[MatterType] = None,
+    limit: int = 50,
+    offset: int = 0
+) -> List[Dict]:
+    """Fetch a page of matters with client names taken from their parties."""
+    result = matters_query(
+        supabase, org_id, "*, matter_parties!inner(name, party_type)",
+        status, matter_type, limit, offset
+    ).execute()
+
+    return [with_client_name(m) for m in result.data or []]
+
+
+def with_client_name(matter: Dict) -> Dict:
+    """Replace an embedded matter_parties list with the client's name."""
+    parties = matter.get("matter_parties") or []
+    client = next((p["name"] for p in parties if p["party_type"] == "client"), None)
+    summary = {**matter, "client_name": client}
+    summary.pop("matter_parties", None)
+    return summary
+
+
 @app.get("/api/v1/matters", response_model=List[MatterSummary])
 @limiter.limit("60/minute")
 async def list_matters(
@@ -504,91 +1166,625 @@ async def list_matters(
     matter_type: Optional[MatterType] = Query(None, description="Filter by matter type"),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """List matters for current organisation"""
-    query = supabase.table("matters").select(
-        "*, matter_parties!inner(name, party_type)"
-    ).eq("org_id", current_user["org_id"])
-
-    if status:
-        query = query.eq("status", status.value)
-    if matter_type:
-        query = query.eq("matter_type", matter_type.value)
-
-    result = query.order("updated_at", desc=True).range(offset, offset + limit - 1).execute()
-
-    # Extract client name from parties
-    matters = []
-    for m in result.data or []:
-        client = next((p["name"] for p in m.get("matter_parties", []) if p["party_type"] == "client"), None)
-        matter = {**m, "client_name": client}
-        del matter["matter_parties"]
-        matters.append(matter)
-
-    return matters
+    org_id = current_user["org_id"]
+
+    # Parties are part of the version so a new client name invalidates the tag
+    versions = probe_versions(matters_query(
+        supabase, org_id, "id, updated_at, matter_parties!inner(name, party_type)",
+        status, matter_type, limit, offset
+    ))
+    return conditional_response(
+        request, org_id, versions,
+        lambda: fetch_matter_summaries(supabase, org_id, status, matter_type, limit, offset),
+        List[MatterSummary], trusted=True
+    )
 
 @app.get("/api/v1/matters/{matter_id}", response_model=MatterDetail)
 async def get_matter(
+    request: Request,
     matter_id: str,
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get matter details"""
-    result = supabase.table("matters").select("*").eq("id", matter_id).eq("org_id", current_user["org_id"]).single().execute()
-    if not result.data:
+    org_id = current_user["org_id"]
+    # Team members and parties are part of the version, as they are of the payload
+    versions = None
+    if _matter_embedding_supported:
+        versions = probe_versions(
+            supabase.table("matters").select(
+                "id, updated_at, matter_team(*, users(full_name, email, role)), matter_parties(*)"
+            ).eq("id", matter_id).eq("org_id", org_id).limit(1)
+        )
+    if versions == []:
         raise HTTPException(status_code=404, detail="Matter not found")
 
-    matter = result.data
-
-    # Get team
-    team_result = supabase.table("matter_team").select("*, users(full_name, email, role)").eq("matter_id", matter_id).execute()
-    matter["team"] = team_result.data or []
-
-    # Get parties
-    parties_result = supabase.table("matter_parties").select("*").eq("matter_id", matter_id).execute()
-    matter["parties"] = parties_result.data or []
+    if versions is None:
+        matter = await load_matter_detail(supabase, org_id, matter_id)
+        if not matter:
+            raise HTTPException(status_code=404, detail="Matter not found")
+        versions = [{"id": matter.get("id"), "updated_at": matter.get("updated_at")}]
+        versions += matter["team"] + matter["parties"]
+        return conditional_response(request, org_id, versions, lambda: matter, MatterDetail)
 
-    # Get client name
-    client = next((p["name"] for p in matter["parties"] if p["party_type"] == "client"), None)
-    matter["client_name"] = client
+    def load() -> Dict:
+        matter = load_embedded_matter_detail(supabase, org_id, matter_id)
+        if not matter:
+            raise HTTPException(status_code=404, detail="Matter not found")
+        return matter
 
-    return matter
+    return conditional_response(request, org_id, versions, load, MatterDetail)
 
 # ============================================
 # MATTER SOURCES ENDPOINTS
 # ============================================
 
+# Blob columns can be megabytes per document, so listings and batch gets leave
+# them out unless fields= asks for them. A single source is still returned
+# whole by default; fields= slims it, and the content endpoint serves blobs
+# alone. On a single source fields= may name any matter_sources column;
+# listings take only SOURCE_DETAIL_FIELDS and batch gets those plus blobs.
+SOURCE_BLOB_FIELDS = ["extracted_text", "analysis"]
+SOURCE_LIST_FIELDS = list(MatterSource.model_fields)
+SOURCE_DETAIL_FIELDS = SOURCE_LIST_FIELDS + ["analysis_type", "analyzed_at", "created_at", "updated_at"]
+COLUMN_NAME = re.compile(r"[a-z_][a-z0-9_]*")
+# Postgres undefined_column, which PostgREST passes through for unknown select columns
+UNDEFINED_COLUMN = "42703"
+
+
+def parse_source_fields(
+    fields: Optional[str],
+    default: List[str],
+    allowed: Optional[List[str]] = None
+) -> List[str]:
+    """Parse a comma-separated fields= projection of plain column names, optionally from an allow-list."""
+    requested = [f.strip() for f in (fields or "").split(",") if f.strip()] or default
+    invalid = [f for f in requested if not COLUMN_NAME.fullmatch(f)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(invalid)}")
+    if allowed is not None:
+        unknown = [f for f in requested if f != "id" and f not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # id is always returned so clients can key rows
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+
+@contextmanager
+def source_projection():
+    """Report a fields= column the table does not have as a 400."""
+    try:
+        yield
+    except APIError as e:
+        if e.code == UNDEFINED_COLUMN:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {e.message}")
+        raise
+
+
+def fetch_org_source(supabase: Client, org_id: str, matter_id: str, source_id: str, columns: str) -> Dict:
+    """Fetch one source, scoped to the org through its matter, or raise 404."""
+    result = supabase.table("matter_sources").select(f"{columns}, matters!inner(org_id)").eq(
+        "id", source_id
+    ).eq("matter_id", matter_id).eq("matters.org_id", org_id).limit(1).execute()
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Source not found")
+    source = result.data[0]
+    source.pop("matters", None)
+    return source
+
+
 @app.get("/api/v1/matters/{matter_id}/sources", response_model=List[MatterSource])
 async def list_matter_sources(
+    request: Request,
     matter_id: str,
     source_type: Optional[SourceType] = Query(None, description="Filter by source type"),
     limit: int = Query(50, ge=1, le=200),
-    supabase: Client = Depends(get_supabase),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
-    """List sources for a matter"""
-    query = supabase.table("matter_sources").select("*").eq("matter_id", matter_id)
-
-    if source_type:
-        query = query.eq("source_type", source_type.value)
-
-    result = query.order("created_at", desc=True).limit(limit).execute()
-    return result.data or []
+    """List sources for a matter (slim projection unless fields= is given)"""
+    columns = parse_source_fields(fields, SOURCE_LIST_FIELDS, SOURCE_DETAIL_FIELDS)
+
+    # Sources carry no org_id, so scope through the owning matter
+    def build_query(select: str):
+        query = supabase.table("matter_sources").select(f"{select}, matters!inner(org_id)").eq(
+            "matter_id", matter_id
+        ).eq("matters.org_id", current_user["org_id"])
+        if source_type:
+            query = query.eq("source_type", source_type.value)
+        return query.order("created_at", desc=True).limit(limit)
+
+    def load() -> List[Dict]:
+        rows = build_query(", ".join(columns)).execute().data or []
+        for row in rows:
+            row.pop("matters", None)
+        return rows
+
+    # Custom projections may omit fields MatterSource requires
+    model = None if fields else List[MatterSource]
+
+    versions = probe_versions(build_query("id, updated_at"))
+    with source_projection():
+        return conditional_response(request, current_user["org_id"], versions, load, model, trusted=model is not None)
 
 @app.get("/api/v1/matters/{matter_id}/sources/{source_id}")
 async def get_source(
     matter_id: str,
     source_id: str,
-    supabase: Client = Depends(get_supabase),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
-    """Get source details with extracted text"""
-    result = supabase.table("matter_sources").select("*").eq("id", source_id).eq("matter_id", matter_id).single().execute()
-    if not result.data:
+    """Get source details with extracted text (fields= returns only the named columns)"""
+    select = ", ".join(parse_source_fields(fields, [])) if fields else "*"
+    with source_projection():
+        return fetch_org_source(supabase, current_user["org_id"], matter_id, source_id, select)
+
+@app.get("/api/v1/matters/{matter_id}/sources/{source_id}/content")
+async def get_source_content(
+    matter_id: str,
+    source_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated blob columns: extracted_text, analysis"),
+    supabase: Client = Depends(get_read_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Get the large text columns of a source"""
+    columns = parse_source_fields(fields, SOURCE_BLOB_FIELDS)
+    if any(f not in SOURCE_BLOB_FIELDS for f in columns[1:]):
+        raise HTTPException(status_code=400, detail=f"Content fields must be among: {', '.join(SOURCE_BLOB_FIELDS)}")
+
+    return fetch_org_source(supabase, current_user["org_id"], matter_id, source_id, ", ".join(columns))
+
+# ============================================
+# BATCH GET ENDPOINTS
+# ============================================
+
+# Ids are fetched with in.() filters; chunking keeps each request URL well
+# under PostgREST/proxy limits while still turning N lookups into a few.
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "50"))
+
+
+async def fetch_rows_by_ids(build_query: Callable[[], Any], ids: List[str]) -> Dict[str, Dict]:
+    """Fetch rows for ids in concurrent chunked in.() queries, keyed by id."""
+    unique_ids = list(dict.fromkeys(ids))
+    chunks = [unique_ids[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(unique_ids), BATCH_CHUNK_SIZE)]
+    results = await asyncio.gather(*(
+        asyncio.to_thread(lambda chunk=chunk: build_query().in_("id", chunk).execute())
+        for chunk in chunks
+    ))
+    return {row["id"]: row for result in results for row in result.data or []}
+
+
+def order_batch(ids: List[str], rows: Dict[str, Dict]) -> Dict[str, List]:
+    """Arrange rows in request order (first occurrence wins) and list missing ids."""
+    unique_ids = list(dict.fromkeys(ids))
+    return {
+        "items": [rows[i] for i in unique_ids if i in rows],
+        "missing": [i for i in unique_ids if i not in rows],
+    }
+
+
+@app.post("/api/v1/matters/batch", response_model=MatterBatch)
+@limiter.limit("60/minute")
+async def batch_get_matters(
+    request: Request,
+    batch: BatchGetRequest,
+    supabase: Client = Depends(get_read_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Get matter summaries for up to 200 ids; ids outside the org are reported missing"""
+    rows = await fetch_rows_by_ids(
+        lambda: supabase.table("matters").select(
+            "*, matter_parties(name, party_type)"
+        ).eq("org_id", current_user["org_id"]),
+        batch.ids
+    )
+    return order_batch(batch.ids, {i: with_client_name(m) for i, m in rows.items()})
+
+@app.post("/api/v1/sources/batch")
+@limiter.limit("60/minute")
+async def batch_get_sources(
+    request: Request,
+    batch: BatchGetRequest,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    supabase: Client = Depends(get_read_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Get sources across matters for up to 200 ids (blob columns only via fields=)"""
+    columns = parse_source_fields(fields, SOURCE_DETAIL_FIELDS, SOURCE_DETAIL_FIELDS + SOURCE_BLOB_FIELDS)
+
+    # Sources carry no org_id, so scope through the owning matter
+    with source_projection():
+        rows = await fetch_rows_by_ids(
+            lambda: supabase.table("matter_sources").select(
+                ", ".join(columns) + ", matters!inner(org_id)"
+            ).eq("matters.org_id", current_user["org_id"]),
+            batch.ids
+        )
+    for row in rows.values():
+        row.pop("matters", None)
+    return order_batch(batch.ids, rows)
+
+# ============================================
+# SOURCE TEXT RETRIEVAL
+# ============================================
+
+# Extracted text is streamed in fixed-size pieces rather than wrapped in one
+# JSON document. Pages are delimited by form feeds, as written by extraction.
+#
+# Slicing happens in the database through the source_text_slice RPC
+# (p_source_id, p_matter_id, p_org_id, p_unit, p_start, p_count), which
+# returns one row for a source in the org, else none:
+#   chars, bytes, pages  totals for the whole text
+#   content              for unit "char", characters [p_start, p_start + p_count)
+#                        via substr(); for "byte", that UTF-8 byte span as bytea
+#   start, end           for unit "page", the character span of p_count pages
+#                        from 1-based page p_start (null when out of range)
+# The response is then read TEXT_SLICE_SIZE units per call, so the text is
+# never held whole in this process. Without the RPC the whole column is
+# fetched and sliced here.
+TEXT_STREAM_CHUNK_SIZE = 64 * 1024
+TEXT_SLICE_SIZE = int(os.getenv("TEXT_SLICE_SIZE", str(256 * 1024)))
+PAGE_SEPARATOR = "\f"
+
+_text_slice_supported = True
+
+
+def parse_byte_range(range_header: str, total: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into inclusive (start, end) offsets.
+
+    Returns None for headers we ignore (other units, multiple ranges), which
+    means serving the full body. Raises 416 for unsatisfiable ranges.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the final N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, total - length), total - 1
+        else:
+            start = int(first)
+            end = min(int(last), total - 1) if last else total - 1
+    except ValueError:
+        return None
+
+    if start >= total or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{total}"}
+        )
+    return start, end
+
+
+def page_bounds(text: str, page: int, pages: int) -> Optional[tuple[int, int]]:
+    """Find the character span of `pages` pages starting at 1-based `page`."""
+    start = 0
+    for _ in range(page - 1):
+        separator = text.find(PAGE_SEPARATOR, start)
+        if separator == -1:
+            return None
+        start = separator + 1
+
+    end = start
+    for _ in range(pages):
+        separator = text.find(PAGE_SEPARATOR, end)
+        if separator == -1:
+            return start, len(text)
+        end = separator + 1
+    return start, end - 1
+
+
+class SourceText:
+    """Reads slices of one source's extracted text, in the database when the RPC exists."""
+
+    def __init__(self, supabase: Client, org_id: str, matter_id: str, source_id: str):
+        self.supabase = supabase
+        self.params = {"p_source_id": source_id, "p_matter_id": matter_id, "p_org_id": org_id}
+        self.text: Optional[str] = None
+        self.info: Dict[str, Any] = {}
+
+    def _rpc(self, unit: str, start: int, count: int) -> Optional[Dict]:
+        result = self.supabase.rpc("source_text_slice", {
+            **self.params, "p_unit": unit, "p_start": start, "p_count": count
+        }).execute()
+        rows = result.data if isinstance(result.data, list) else [result.data] if result.data else []
+        return rows[0] if rows else None
+
+    def open(self) -> bool:
+        """Load the totals (or, without the RPC, the text); False if the source is not in the org."""
+        global _text_slice_supported
+        if _text_slice_supported:
+            try:
+                row = self._rpc("char", 0, 0)
+            except APIError as e:
+                logger.warning(f"source_text_slice unavailable, slicing text in process: {e}")
+                _text_slice_supported = False
+            else:
+                if row is None:
+                    return False
+                self.info = {key: int(row[key]) for key in ("chars", "bytes", "pages")}
+                return True
+
+        result = self.supabase.table("matter_sources").select("extracted_text, matters!inner(org_id)").eq(
+            "id", self.params["p_source_id"]
+        ).eq("matter_id", self.params["p_matter_id"]).eq("matters.org_id", self.params["p_org_id"]).limit(1).execute()
+        if not result.data:
+            return False
+        self.text = result.data[0].get("extracted_text") or ""
+        self.info = {
+            "chars": len(self.text),
+            "bytes": len(self.text.encode("utf-8")),
+            "pages": self.text.count(PAGE_SEPARATOR) + 1
+        }
+        return True
+
+    def page_span(self, page: int, pages: int) -> Optional[tuple[int, int]]:
+        if self.text is not None:
+            return page_bounds(self.text, page, pages)
+        row = self._rpc("page", page, pages)
+        if not row or row.get("start") is None:
+            return None
+        return int(row["start"]), int(row["end"])
+
+    def iter_chars(self, start: int, end: int):
+        """Yield characters [start, end) as UTF-8, one slice per read."""
+        if self.text is not None:
+            for position in range(start, end, TEXT_STREAM_CHUNK_SIZE):
+                yield self.text[position:min(position + TEXT_STREAM_CHUNK_SIZE, end)].encode("utf-8")
+            return
+        for position in range(start, end, TEXT_SLICE_SIZE):
+            row = self._rpc("char", position, min(TEXT_SLICE_SIZE, end - position))
+            yield ((row or {}).get("content") or "").encode("utf-8")
+
+    def iter_bytes(self, start: int, end: int):
+        """Yield UTF-8 bytes [start, end), one slice per read."""
+        if self.text is not None:
+            data = self.text.encode("utf-8")
+            view = memoryview(data)
+            for position in range(start, end, TEXT_STREAM_CHUNK_SIZE):
+                yield bytes(view[position:min(position + TEXT_STREAM_CHUNK_SIZE, end)])
+            return
+        for position in range(start, end, TEXT_SLICE_SIZE):
+            row = self._rpc("byte", position, min(TEXT_SLICE_SIZE, end - position))
+            # PostgREST renders bytea as "\x" followed by hex
+            yield bytes.fromhex(((row or {}).get("content") or "\\x")[2:])
+
+
+@app.get("/api/v1/matters/{matter_id}/sources/{source_id}/text")
+async def get_source_text(
+    request: Request,
+    matter_id: str,
+    source_id: str,
+    offset: int = Query(0, ge=0, description="First character to return"),
+    length: Optional[int] = Query(None, ge=1, description="Number of characters to return"),
+    page: Optional[int] = Query(None, ge=1, description="First page to return (1-based)"),
+    pages: int = Query(1, ge=1, le=500, description="Number of pages to return"),
+    supabase: Client = Depends(get_read_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Stream a source's extracted text as text/plain.
+
+    A "Range: bytes=" header takes precedence and yields 206 with
+    Content-Range. Otherwise page/pages slices by page, and offset/length
+    by character.
+    """
+    text = SourceText(supabase, current_user["org_id"], matter_id, source_id)
+    if not await asyncio.to_thread(text.open):
         raise HTTPException(status_code=404, detail="Source not found")
-    return result.data
+
+    chars, total_bytes = text.info["chars"], text.info["bytes"]
+    headers = {"Accept-Ranges": "bytes", "X-Text-Length": str(chars)}
+    media_type = "text/plain; charset=utf-8"
+
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = parse_byte_range(range_header, total_bytes)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{total_bytes}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(text.iter_bytes(start, end + 1), status_code=206, media_type=media_type, headers=headers)
+        return StreamingResponse(text.iter_bytes(0, total_bytes), media_type=media_type, headers=headers)
+
+    if page is not None:
+        headers["X-Page-Count"] = str(text.info["pages"])
+        bounds = await asyncio.to_thread(text.page_span, page, pages)
+        if bounds is None:
+            raise HTTPException(status_code=416, detail="Page out of range")
+        start, end = bounds
+    else:
+        start = min(offset, chars)
+        end = chars if length is None else min(start + length, chars)
+
+    return StreamingResponse(text.iter_chars(start, end), media_type=media_type, headers=headers)
+
+# ============================================
+# DEADLINE INDEX
+# ============================================
+
+# Open deadlines are kept per org in date order so "next N days" is a bisect
+# and a slice instead of a scan of matter_events. The index is per process:
+# writes made through this worker update it in place, and the NOTIFY
+# listener invalidates it for writes made anywhere else. Without a listener
+# (no DATABASE_URL) other workers' writes only show up on reload, so the
+# shorter TTL applies.
+DEADLINE_INDEX_TTL_SECONDS = float(os.getenv("DEADLINE_INDEX_TTL_SECONDS", "300"))
+DEADLINE_INDEX_UNLISTENED_TTL_SECONDS = float(os.getenv("DEADLINE_INDEX_UNLISTENED_TTL_SECONDS", "30"))
+DEADLINE_INDEX_PAGE_SIZE = 1000
+
+
+class OrgDeadlineIndex:
+    """Open deadlines for one org, sorted by (event_date, id) overall and per matter."""
+
+    def __init__(self, events: List[Dict]):
+        self.loaded_at = time.monotonic()
+        self._keys: List[tuple[str, str]] = []
+        self._events: Dict[str, Dict] = {}
+        self._by_matter: Dict[str, List[tuple[str, str]]] = {}
+        for event in events:
+            self.upsert(event)
+
+    @staticmethod
+    def _key(event: Dict) -> tuple[str, str]:
+        return str(event["event_date"]), str(event["id"])
+
+    def upsert(self, event: Dict) -> None:
+        """Insert or replace an event; completed or non-deadline events are dropped."""
+        self.remove(event["id"])
+        if not event.get("is_deadline") or event.get("is_completed"):
+            return
+
+        key = self._key(event)
+        self._events[key[1]] = event
+        bisect.insort(self._keys, key)
+        bisect.insort(self._by_matter.setdefault(event["matter_id"], []), key)
+
+    def remove(self, event_id: str) -> None:
+        event = self._events.pop(str(event_id), None)
+        if event is None:
+            return
+
+        key = self._key(event)
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        matter_keys = self._by_matter[event["matter_id"]]
+        del matter_keys[bisect.bisect_left(matter_keys, key)]
+        if not matter_keys:
+            del self._by_matter[event["matter_id"]]
+
+    def upcoming(self, cutoff: str) -> List[Dict]:
+        """Open deadlines dated on or before cutoff (overdue ones included), earliest first."""
+        end = bisect.bisect_right(self._keys, (cutoff, "\uffff"))
+        return [self._events[event_id] for _, event_id in self._keys[:end]]
+
+    def next_for_matter(self, matter_id: str) -> Optional[str]:
+        """Earliest open deadline date for a matter."""
+        matter_keys = self._by_matter.get(matter_id)
+        return matter_keys[0][0] if matter_keys else None
+
+
+class DeadlineIndex:
+    """
+    Lazily loaded OrgDeadlineIndex per org, reloaded after the TTL (the
+    shorter one while no change listener is connected).
+
+    Loads run outside the lock so one org's slow query does not block the
+    others. Each change or invalidation bumps the org's generation, and a
+    load that started before it is served but not cached, so it cannot
+    overwrite the newer state.
+    """
+
+    def __init__(self, ttl_seconds: float, unlistened_ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.unlistened_ttl_seconds = unlistened_ttl_seconds
+        self._orgs: Dict[str, OrgDeadlineIndex] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def _ttl(self) -> float:
+        return self.ttl_seconds if _change_listener_connected else self.unlistened_ttl_seconds
+
+    def _load(self, supabase: Client, org_id: str, page_size: int = DEADLINE_INDEX_PAGE_SIZE) -> OrgDeadlineIndex:
+        # PostgREST caps unpaged responses, so page in a stable order
+        events = []
+        offset = 0
+        while True:
+            result = supabase.table("matter_events").select(
+                "*, matters!inner(code, name, org_id)"
+            ).eq("matters.org_id", org_id).eq("is_deadline", True).eq("is_completed", False).order(
+                "event_date"
+            ).order("id").range(offset, offset + page_size - 1).execute()
+            for event in result.data or []:
+                matter = event.get("matters") or {}
+                events.append({**event, "matters": {"code": matter.get("code"), "name": matter.get("name")}})
+            if len(result.data or []) < page_size:
+                break
+            offset += page_size
+        return OrgDeadlineIndex(events)
+
+    def _bump(self, org_id: str) -> None:
+        self._generations[org_id] = self._generations.get(org_id, 0) + 1
+
+    def get(self, supabase: Client, org_id: str) -> OrgDeadlineIndex:
+        with self._lock:
+            index = self._orgs.get(org_id)
+            if index is not None and time.monotonic() - index.loaded_at <= self._ttl():
+                CACHE_LOOKUPS.labels("deadline_index", "hit").inc()
+                return index
+            generation = self._generations.get(org_id, 0)
+
+        CACHE_LOOKUPS.labels("deadline_index", "miss").inc()
+        index = self._load(supabase, org_id)
+        with self._lock:
+            if self._generations.get(org_id, 0) == generation:
+                self._orgs[org_id] = index
+        return index
+
+    def upcoming(self, supabase: Client, org_id: str, cutoff: str) -> List[Dict]:
+        index = self.get(supabase, org_id)
+        with self._lock:
+            return index.upcoming(cutoff)
+
+    def apply(
+        self,
+        supabase: Client,
+        org_id: str,
+        matter_id: str,
+        change: Callable[[OrgDeadlineIndex], None]
+    ) -> Optional[str]:
+        """
+        Apply an incremental change that is already written to the database;
+        returns the matter's next open deadline afterwards. Changes are
+        idempotent, so applying one to an index loaded after the write is safe.
+        """
+        index = self.get(supabase, org_id)
+        with self._lock:
+            index = self._orgs.get(org_id, index)
+            change(index)
+            self._bump(org_id)
+            return index.next_for_matter(matter_id)
+
+    def invalidate(self, org_id: str) -> None:
+        with self._lock:
+            self._orgs.pop(org_id, None)
+            self._bump(org_id)
+
+
+deadline_index = DeadlineIndex(DEADLINE_INDEX_TTL_SECONDS, DEADLINE_INDEX_UNLISTENED_TTL_SECONDS)
+
+
+def record_deadline_change(
+    supabase: Client,
+    org_id: str,
+    matter: Dict,
+    change: Callable[[OrgDeadlineIndex], None]
+) -> None:
+    """
+    Apply an incremental change to the org's deadline index and, if the
+    matter's earliest open deadline differs from its stored next_deadline,
+    write it to matters.next_deadline.
+    """
+    matter_id = matter["id"]
+    current = deadline_index.apply(supabase, org_id, matter_id, change)
+    if current != (str(matter["next_deadline"]) if matter.get("next_deadline") else None):
+        supabase.table("matters").update({"next_deadline": current}).eq("id", matter_id).execute()
+        invalidate_matter_detail(matter_id)
+        publish_change(org_id, "matters", matter_id, "update", matter_id)
+
 
 # ============================================
 # MATTER EVENTS ENDPOINTS
@@ -608,7 +1804,17 @@ async def list_matter_events(
         query = query.eq("is_completed", False)
 
     result = query.order("event_date", desc=False).execute()
-    return result.data or []
+    return json_response(result.data or [], List[MatterEvent], trusted=True)
+
+def deadline_cutoff(days: int) -> str:
+    """ISO date `days` days from today."""
+    from datetime import timedelta
+
+    return (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
+
+def fetch_upcoming_deadlines(supabase: Client, org_id: str, days: int) -> List[Dict]:
+    """Fetch the org's open deadlines falling within the next `days` days."""
+    return deadline_index.upcoming(supabase, org_id, deadline_cutoff(days))
 
 @app.get("/api/v1/deadlines")
 async def list_upcoming_deadlines(
@@ -616,16 +1822,70 @@ async def list_upcoming_deadlines(
     supabase: Client = Depends(get_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
-    """List upcoming deadlines across all matters"""
-    from datetime import timedelta
+    """List upcoming deadlines across the organisation's matters"""
+    return json_response(fetch_upcoming_deadlines(supabase, current_user["org_id"], days))
 
-    cutoff = (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
+def get_org_matter(supabase: Client, org_id: str, matter_id: str, columns: str = "id") -> Dict:
+    """Fetch a matter scoped to the org, or raise 404."""
+    result = supabase.table("matters").select(columns).eq("id", matter_id).eq("org_id", org_id).limit(1).execute()
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Matter not found")
+    return result.data[0]
+
+@app.post("/api/v1/matters/{matter_id}/events", response_model=MatterEvent)
+async def create_matter_event(
+    matter_id: str,
+    event: MatterEventCreate,
+    supabase: Client = Depends(get_write_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Create an event or deadline, keeping the deadline index and next_deadline current"""
+    org_id = current_user["org_id"]
+    matter = get_org_matter(supabase, org_id, matter_id, "id, code, name, next_deadline")
+
+    result = supabase.table("matter_events").insert({
+        "matter_id": matter_id,
+        "event_type": event.event_type,
+        "title": event.title,
+        "event_date": event.event_date.isoformat(),
+        "is_deadline": event.is_deadline,
+        "is_completed": False,
+        "description": event.description,
+    }).execute()
+    created = result.data[0]
+    publish_change(org_id, "matter_events", created["id"], "insert", matter_id)
+
+    if created.get("is_deadline"):
+        record_deadline_change(
+            supabase, org_id, matter,
+            lambda index: index.upsert({**created, "matters": {"code": matter["code"], "name": matter["name"]}})
+        )
 
-    result = supabase.table("matter_events").select(
-        "*, matters(code, name)"
-    ).eq("is_deadline", True).eq("is_completed", False).lte("event_date", cutoff).order("event_date").execute()
+    return created
 
-    return result.data or []
+@app.post("/api/v1/matters/{matter_id}/events/{event_id}/complete", response_model=MatterEvent)
+async def complete_matter_event(
+    matter_id: str,
+    event_id: str,
+    supabase: Client = Depends(get_write_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Mark an event completed, keeping the deadline index and next_deadline current"""
+    org_id = current_user["org_id"]
+    matter = get_org_matter(supabase, org_id, matter_id, "id, next_deadline")
+
+    result = supabase.table("matter_events").update({
+        "is_completed": True
+    }).eq("id", event_id).eq("matter_id", matter_id).execute()
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Event not found")
+    completed = result.data[0]
+    publish_change(org_id, "matter_events", event_id, "update", matter_id)
+
+    if completed.get("is_deadline"):
+        record_deadline_change(supabase, org_id, matter, lambda index: index.remove(event_id))
+
+    return completed
 
 # ============================================
 # SEARCH ENDPOINT
@@ -647,7 +1907,7 @@ def sanitize_search_query(query_str: str, max_length: int = 200) -> str:
 async def search(
     request: Request,
     query: SearchQuery,
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Search across matters and sources"""
@@ -707,13 +1967,9 @@ async def search(
 # ANALYTICS ENDPOINTS
 # ============================================
 
-@app.get("/api/v1/analytics/sgi", response_model=SGISnapshot)
-async def get_sgi_snapshot(
-    supabase: Client = Depends(get_supabase),
-    current_user: Dict = Depends(get_current_user)
-):
-    """Get latest SGI snapshot"""
-    result = supabase.table("sgi_snapshots").select("*").eq("org_id", current_user["org_id"]).order("snapshot_date", desc=True).limit(1).execute()
+def fetch_sgi_snapshot(supabase: Client, org_id: str) -> Dict:
+    """Fetch the org's latest SGI snapshot, or neutral defaults if none exist."""
+    result = supabase.table("sgi_snapshots").select("*").eq("org_id", org_id).order("snapshot_date", desc=True).limit(1).execute()
 
     if not result.data:
         # Return default values if no data
@@ -725,14 +1981,22 @@ async def get_sgi_snapshot(
             throughput_gain=0,
             compliance_score=100,
             breakdown={}
-        )
+        ).model_dump()
 
     return result.data[0]
 
+@app.get("/api/v1/analytics/sgi", response_model=SGISnapshot)
+async def get_sgi_snapshot(
+    supabase: Client = Depends(get_read_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Get latest SGI snapshot"""
+    return fetch_sgi_snapshot(supabase, current_user["org_id"])
+
 @app.get("/api/v1/analytics/sgi/history")
 async def get_sgi_history(
     days: int = Query(30, le=90),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get SGI history for trending"""
@@ -748,25 +2012,32 @@ async def get_sgi_history(
 # AGENT ENDPOINTS
 # ============================================
 
+def agents_query(supabase: Client, org_id: str, columns: str, status: Optional[AgentStatus] = None):
+    """Build the org's agent listing query, ordered by name."""
+    query = supabase.table("agent_definitions").select(columns).eq("org_id", org_id)
+    if status:
+        query = query.eq("status", status.value)
+    return query.order("name")
+
 @app.get("/api/v1/agents")
 async def list_agents(
+    request: Request,
     status: Optional[AgentStatus] = Query(None, description="Filter by agent status"),
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """List available agents"""
-    query = supabase.table("agent_definitions").select("*").eq("org_id", current_user["org_id"])
-
-    if status:
-        query = query.eq("status", status.value)
-
-    result = query.order("name").execute()
-    return result.data or []
+    org_id = current_user["org_id"]
+    versions = probe_versions(agents_query(supabase, org_id, "id, updated_at", status))
+    return conditional_response(
+        request, org_id, versions,
+        lambda: agents_query(supabase, org_id, "*", status).execute().data or []
+    )
 
 @app.get("/api/v1/agents/{agent_id}")
 async def get_agent(
     agent_id: str,
-    supabase: Client = Depends(get_supabase),
+    supabase: Client = Depends(get_read_supabase),
     current_user: Dict = Depends(get_current_user)
 ):
     """Get agent details"""
@@ -786,6 +2057,178 @@ async def list_agent_runs(
     result = supabase.table("agent_runs").select("*").eq("agent_id", agent_id).order("created_at", desc=True).limit(limit).execute()
     return result.data or []
 
+# ============================================
+# DASHBOARD ENDPOINT
+# ============================================
+
+# Sections that miss this deadline are reported as timed out rather than
+# holding up the rest of the dashboard. A thread can't be cancelled, so a
+# timed-out section still runs its query to completion; sections get their
+# own small pool so those stragglers can't starve the default to_thread
+# executor the rest of the API uses.
+DASHBOARD_SECTION_TIMEOUT_SECONDS = float(os.getenv("DASHBOARD_SECTION_TIMEOUT_SECONDS", "5"))
+DASHBOARD_MAX_WORKERS = int(os.getenv("DASHBOARD_MAX_WORKERS", "10"))
+
+dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_MAX_WORKERS, thread_name_prefix="dashboard")
+
+
+async def run_dashboard_section(
+    name: str,
+    loader: Callable[[], Any],
+    timeout: float
+) -> tuple[str, Any, float, Optional[str]]:
+    """Run one blocking section loader on the dashboard pool under a timeout."""
+    started = time.perf_counter()
+    data, error = None, None
+    try:
+        future = asyncio.get_running_loop().run_in_executor(dashboard_executor, loader)
+        data = await asyncio.wait_for(future, timeout=timeout)
+    except asyncio.TimeoutError:
+        error = "timeout"
+        logger.warning(f"Dashboard section '{name}' timed out after {timeout}s")
+    except Exception as e:
+        error = "failed"
+        logger.error(f"Dashboard section '{name}' failed: {e}", exc_info=True)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    return name, data, elapsed_ms, error
+
+
+@app.get("/api/v1/dashboard")
+@limiter.limit("60/minute")
+async def get_dashboard(
+    request: Request,
+    matters_limit: int = Query(20, ge=1, le=100),
+    deadline_days: int = Query(30, ge=1, le=90),
+    supabase: Client = Depends(get_supabase),
+    read_supabase: Client = Depends(get_read_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Get everything the dashboard needs in one request.
+
+    Authenticates once and loads organisation, matters, deadlines, SGI and
+    agents concurrently. Deadlines come from the primary-backed deadline
+    index; the other sections read through the replica pool. Sections that
+    fail or time out come back as null and are listed under "errors".
+    """
+    org_id = current_user["org_id"]
+
+    def load_organisation():
+        result = read_supabase.table("organisations").select("*").eq("id", org_id).limit(1).execute()
+        return Organisation(**result.data[0]) if result.data else None
+
+    loaders = {
+        "organisation": load_organisation,
+        "matters": lambda: project_rows(fetch_matter_summaries(read_supabase, org_id, limit=matters_limit), MatterSummary),
+        "deadlines": lambda: fetch_upcoming_deadlines(supabase, org_id, deadline_days),
+        "sgi": lambda: SGISnapshot(**fetch_sgi_snapshot(read_supabase, org_id)),
+        "agents": lambda: agents_query(read_supabase, org_id, "*").execute().data or [],
+    }
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_dashboard_section(name, loader, DASHBOARD_SECTION_TIMEOUT_SECONDS)
+        for name, loader in loaders.items()
+    ))
+
+    dashboard: Dict[str, Any] = {}
+    timings_ms: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for name, data, elapsed_ms, error in results:
+        dashboard[name] = data
+        timings_ms[name] = elapsed_ms
+        if error:
+            errors[name] = error
+    timings_ms["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+    return json_response({
+        **dashboard,
+        "timings_ms": timings_ms,
+        "errors": errors,
+        "partial": bool(errors),
+    })
+
+# ============================================
+# CHANGE FEED ENDPOINT
+# ============================================
+
+@app.get("/api/v1/changes")
+async def stream_changes(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="Resume after this cursor (Last-Event-ID takes precedence)"),
+    tables: Optional[str] = Query(None, description="Comma-separated tables to follow"),
+    matter_id: Optional[str] = Query(None, description="Only changes for this matter"),
+    last_event_id: Optional[str] = Header(None),
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Server-sent events stream of the org's row changes.
+
+    Each `changes` event carries the latest change per row since the previous
+    event, with its cursor as the event id. A `reset` event means the cursor
+    could not be resumed and lists should be refetched.
+    """
+    org_id = current_user["org_id"]
+    available = set(CHANGE_FEED_TABLES if _change_listener_connected else LOCAL_CHANGE_FEED_TABLES)
+    followed = available
+    if tables:
+        followed = {t.strip() for t in tables.split(",") if t.strip()}
+        unknown = followed - set(CHANGE_FEED_TABLES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(sorted(unknown))}")
+        unpublished = followed - available
+        if unpublished:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Changes to {', '.join(sorted(unpublished))} need the database change listener"
+            )
+
+    resume_from = last_event_id or cursor
+    start = change_feed.parse_cursor(resume_from) if resume_from else change_feed.seq
+
+    async def events():
+        seq = start
+        wakeup = change_feed.subscribe(org_id)
+        try:
+            if seq is None:
+                seq = change_feed.seq
+                yield format_sse("reset", {"reason": "unknown cursor"}, change_feed.cursor(seq))
+            else:
+                yield format_sse("ready", {}, change_feed.cursor(seq))
+
+            while not await request.is_disconnected():
+                wakeup.clear()
+                changes, expired = change_feed.since(org_id, seq)
+                if expired:
+                    seq = change_feed.seq
+                    yield format_sse("reset", {"reason": "cursor expired"}, change_feed.cursor(seq))
+                    continue
+
+                if changes:
+                    seq = changes[-1]["seq"]
+                    changes = [
+                        c for c in changes
+                        if c["table"] in followed and (not matter_id or matter_id in (c["matter_id"], c["id"]))
+                    ]
+                    if changes:
+                        yield format_sse("changes", {"changes": changes}, change_feed.cursor(seq))
+                    # Let bursts accumulate so repeated updates to a row collapse
+                    await asyncio.sleep(CHANGE_FEED_COALESCE_SECONDS)
+                    continue
+
+                try:
+                    await asyncio.wait_for(wakeup.wait(), CHANGE_FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            change_feed.unsubscribe(org_id, wakeup)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============================================
 # RUN SERVER
 # ============================================
@@ -0,0 +1,83 @@
+"""
+Change feed: cursor resume, per-row coalescing and resets.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+ORG_ID = "org-1"
+
+
+def test_cursor_resumes_after_its_change():
+    feed = main.ChangeFeed(buffer_size=10)
+    first = feed.publish(ORG_ID, "matters", "matter-1")
+    second = feed.publish(ORG_ID, "matter_events", "event-1", "insert", "matter-1")
+
+    seq = feed.parse_cursor(feed.cursor(first["seq"]))
+    changes, expired = feed.since(ORG_ID, seq)
+
+    assert not expired
+    assert [c["seq"] for c in changes] == [second["seq"]]
+    assert feed.since("org-2", 0) == ([], False)
+
+
+def test_repeated_changes_to_a_row_coalesce_to_the_latest():
+    feed = main.ChangeFeed(buffer_size=10)
+    feed.publish(ORG_ID, "matters", "matter-1")
+    feed.publish(ORG_ID, "matters", "matter-2")
+    latest = feed.publish(ORG_ID, "matters", "matter-1", "delete")
+
+    changes, _ = feed.since(ORG_ID, 0)
+
+    assert [(c["id"], c["op"]) for c in changes] == [("matter-2", "update"), ("matter-1", "delete")]
+    assert changes[-1]["seq"] == latest["seq"]
+
+
+def test_cursor_from_another_feed_cannot_be_resumed():
+    feed = main.ChangeFeed(buffer_size=10)
+    other = main.ChangeFeed(buffer_size=10)
+    other.epoch = "other"
+
+    assert feed.parse_cursor(other.cursor(1)) is None
+    assert feed.parse_cursor("garbage") is None
+
+
+def test_cursor_older_than_the_buffer_expires():
+    feed = main.ChangeFeed(buffer_size=2)
+    for n in range(4):
+        feed.publish(ORG_ID, "matters", f"matter-{n}")
+
+    assert feed.since(ORG_ID, 1) == ([], True)
+    assert not feed.since(ORG_ID, feed.seq - 2)[1]
+
+
+def test_reset_all_expires_existing_cursors():
+    feed = main.ChangeFeed(buffer_size=10)
+    change = feed.publish(ORG_ID, "matters", "matter-1")
+
+    feed.reset_all()
+
+    assert feed.since(ORG_ID, change["seq"] - 1) == ([], True)
+    assert feed.since(ORG_ID, feed.seq) == ([], False)
+
+
+def test_notify_only_tables_cannot_be_followed_without_the_listener(monkeypatch):
+    monkeypatch.setattr(main, "_change_listener_connected", False)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(main.stream_changes(
+            None, cursor=None, tables="agent_runs", matter_id=None,
+            last_event_id=None, current_user={"id": "user-1", "org_id": ORG_ID}
+        ))
+
+    assert exc.value.status_code == 400
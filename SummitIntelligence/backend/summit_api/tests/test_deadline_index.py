@@ -0,0 +1,144 @@
+"""
+Deadline index and matters.next_deadline on a cold index.
+
+The first deadline write for an org in a worker loads the index after the
+event row is already written, so the load includes the change. These tests
+check that next_deadline still moves on create and on complete.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import date
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+ORG_ID = "org-1"
+USER = {"id": "user-1", "org_id": ORG_ID}
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    """The few PostgREST builder calls the deadline endpoints make."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db, self.table = db, table
+        self.op, self.payload, self.filters, self.embed_matter = "select", None, [], False
+        self.bounds = None
+
+    def select(self, columns: str = "*", **kwargs):
+        self.embed_matter = "matters!inner" in columns
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append((column, value))
+        return self
+
+    def limit(self, count: int):
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        return self
+
+    def range(self, start: int, end: int):
+        self.bounds = (start, end)
+        return self
+
+    def _row(self, row):
+        if self.embed_matter:
+            return {**row, "matters": next(m for m in self.db.tables["matters"] if m["id"] == row["matter_id"])}
+        return row
+
+    def _matches(self, row) -> bool:
+        for column, value in self.filters:
+            table, _, field = column.rpartition(".")
+            if (row[table] if table else row).get(field) != value:
+                return False
+        return True
+
+    def execute(self) -> Result:
+        rows = self.db.tables[self.table]
+        if self.op == "insert":
+            row = {"id": str(uuid.uuid4()), **self.payload}
+            rows.append(row)
+            return Result([dict(row)])
+        matched = [row for row in rows if self._matches(self._row(row))]
+        if self.op == "update":
+            for row in matched:
+                row.update(self.payload)
+        if self.bounds:
+            matched = matched[self.bounds[0]:self.bounds[1] + 1]
+        return Result([dict(self._row(row)) for row in matched])
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {
+            "matters": [{"id": "matter-1", "org_id": ORG_ID, "code": "M-1", "name": "Matter", "next_deadline": None}],
+            "matter_events": [],
+        }
+
+    def table(self, name: str) -> Query:
+        return Query(self, name)
+
+
+def create_deadline(supabase: FakeSupabase, event_date: date) -> dict:
+    event = main.MatterEventCreate(title="Filing", event_date=event_date, is_deadline=True)
+    return asyncio.run(main.create_matter_event("matter-1", event, supabase=supabase, current_user=USER))
+
+
+def next_deadline(supabase: FakeSupabase):
+    return supabase.tables["matters"][0]["next_deadline"]
+
+
+def test_create_on_cold_index_sets_next_deadline():
+    supabase = FakeSupabase()
+    main.deadline_index.invalidate(ORG_ID)
+
+    create_deadline(supabase, date(2030, 3, 1))
+
+    assert next_deadline(supabase) == "2030-03-01"
+
+
+def test_complete_on_cold_index_moves_next_deadline():
+    supabase = FakeSupabase()
+    main.deadline_index.invalidate(ORG_ID)
+    first = create_deadline(supabase, date(2030, 3, 1))
+    create_deadline(supabase, date(2030, 4, 1))
+    main.deadline_index.invalidate(ORG_ID)
+
+    asyncio.run(main.complete_matter_event("matter-1", first["id"], supabase=supabase, current_user=USER))
+
+    assert next_deadline(supabase) == "2030-04-01"
+    upcoming = main.deadline_index.upcoming(supabase, ORG_ID, "2030-12-31")
+    assert [event["event_date"] for event in upcoming] == ["2030-04-01"]
+
+
+def test_load_pages_past_the_page_size():
+    supabase = FakeSupabase()
+    for day in range(1, 6):
+        supabase.tables["matter_events"].append({
+            "id": f"event-{day}", "matter_id": "matter-1", "event_date": f"2030-05-0{day}",
+            "is_deadline": True, "is_completed": False,
+        })
+
+    index = main.DeadlineIndex(300, 30)._load(supabase, ORG_ID, page_size=2)
+
+    assert len(index.upcoming("2030-12-31")) == 5
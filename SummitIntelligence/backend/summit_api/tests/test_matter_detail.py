@@ -0,0 +1,94 @@
+"""
+Matter detail loader: embedded fetch fallback and cache isolation.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from postgrest.exceptions import APIError
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+ORG_ID = "org-1"
+MATTER = {"id": "matter-1", "org_id": ORG_ID, "name": "Matter"}
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db, self.table, self.embedded = db, table, False
+
+    def select(self, columns: str = "*", **kwargs):
+        self.embedded = "matter_team(" in columns
+        return self
+
+    def eq(self, column: str, value):
+        return self
+
+    def limit(self, count: int):
+        return self
+
+    def execute(self) -> Result:
+        if self.embedded and self.db.embed_error:
+            raise APIError({"message": "embed failed", "code": self.db.embed_error})
+        if self.table == "matters":
+            row = dict(MATTER)
+            if self.embedded:
+                row["matter_team"] = [{"user_id": "user-1"}]
+                row["matter_parties"] = [{"name": "Client Co", "party_type": "client"}]
+            return Result([row])
+        if self.table == "matter_team":
+            return Result([{"user_id": "user-1"}])
+        return Result([{"name": "Client Co", "party_type": "client"}])
+
+
+class FakeSupabase:
+    def __init__(self, embed_error=None):
+        self.embed_error = embed_error
+
+    def table(self, name: str) -> Query:
+        return Query(self, name)
+
+
+@pytest.fixture(autouse=True)
+def fresh_loader(monkeypatch):
+    monkeypatch.setattr(main, "_matter_embedding_supported", True)
+    main.invalidate_matter_detail(MATTER["id"])
+    yield
+    main.invalidate_matter_detail(MATTER["id"])
+
+
+def load(supabase):
+    return asyncio.run(main.load_matter_detail(supabase, ORG_ID, MATTER["id"]))
+
+
+def test_transient_error_is_raised_and_keeps_embedding():
+    with pytest.raises(APIError):
+        load(FakeSupabase(embed_error="500"))
+
+    assert main._matter_embedding_supported is True
+
+
+def test_missing_relationship_falls_back_to_concurrent_fetch():
+    matter = load(FakeSupabase(embed_error="PGRST200"))
+
+    assert main._matter_embedding_supported is False
+    assert matter["client_name"] == "Client Co"
+    assert matter["team"] == [{"user_id": "user-1"}]
+
+
+def test_callers_cannot_edit_the_cached_detail():
+    supabase = FakeSupabase()
+    load(supabase)["team"].append({"user_id": "intruder"})
+
+    assert load(supabase)["team"] == [{"user_id": "user-1"}]
@@ -0,0 +1,75 @@
+"""
+Read replica routing: read-your-writes pin, strong reads and ejection.
+"""
+
+import os
+import sys
+
+import pytest
+from starlette.requests import Request
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+from summit_common import service  # noqa: E402
+
+REPLICA = "http://replica"
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class ReplicaClient:
+    def __init__(self, url: str, reachable: bool = True):
+        self.url, self.reachable = url, reachable
+
+    def rpc(self, name: str):
+        return self
+
+    def execute(self) -> Result:
+        if not self.reachable:
+            raise ConnectionError("replica down")
+        return Result(0.1)
+
+
+def make_request(headers=()) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": list(headers)})
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = service.ReplicaPool([REPLICA], max_lag_seconds=2, check_interval=0, eject_seconds=30)
+    pool._clients[REPLICA] = ReplicaClient(REPLICA)
+    monkeypatch.setattr(service, "replica_pool", pool)
+    return pool
+
+
+def read_client(org_id: str, headers=()):
+    return main.get_read_supabase(make_request(headers), "primary", {"id": "user-1", "org_id": org_id})
+
+
+def test_reads_go_to_a_healthy_replica(pool):
+    assert read_client("org-reader").url == REPLICA
+
+
+def test_strong_reads_stay_on_the_primary(pool):
+    assert read_client("org-reader", [(b"x-read-consistency", b"strong")]) == "primary"
+
+
+def test_a_write_pins_the_orgs_reads_to_the_primary(pool):
+    main.get_write_supabase("primary", {"id": "user-1", "org_id": "org-writer"})
+
+    assert service.org_wrote_recently("org-writer")
+    assert read_client("org-writer") == "primary"
+    assert read_client("org-reader").url == REPLICA
+
+
+def test_unreachable_replica_is_ejected(pool):
+    pool._clients[REPLICA] = ReplicaClient(REPLICA, reachable=False)
+
+    assert read_client("org-reader") == "primary"
+    assert pool._ejected_until[REPLICA] > 0
@@ -0,0 +1,36 @@
+"""
+Trusted serialization: projection of rows onto response models.
+"""
+
+import json
+import os
+import sys
+from typing import List
+
+import pytest
+from pydantic import ValidationError
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+ROW = {"id": "source-1", "matter_id": "matter-1", "source_type": "document", "source_name": "Lease"}
+
+
+def test_projection_drops_extra_columns_and_fills_defaults():
+    rows = [{**ROW, "document_date": None, "author": None, "page_count": 3, "summary": None, "storage_path": "x"}]
+
+    body = main.serialize_response(rows, List[main.MatterSource], trusted=True)
+
+    source = json.loads(body)[0]
+    assert "storage_path" not in source
+    assert source["privilege_class"] == "standard" and source["tags"] == []
+
+
+def test_missing_required_field_is_not_served_as_null():
+    rows = [{key: value for key, value in ROW.items() if key != "source_name"}]
+
+    with pytest.raises(ValidationError):
+        main.serialize_response(rows, List[main.MatterSource], trusted=True)
@@ -0,0 +1,93 @@
+"""
+Source listings: org scoping and the fields= allow-list.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+USER = {"id": "user-1", "org_id": "org-1"}
+ROW = {"id": "source-1", "updated_at": "2024-01-01", "source_name": "Lease", "matters": {"org_id": "org-1"}}
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    def __init__(self, db: "FakeSupabase"):
+        self.db = db
+
+    def select(self, columns: str = "*", **kwargs):
+        self.db.selects.append(columns)
+        return self
+
+    def eq(self, column: str, value):
+        self.db.filters.append((column, value))
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, count: int):
+        return self
+
+    def execute(self) -> Result:
+        return Result([dict(ROW)])
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.selects, self.filters = [], []
+
+    def table(self, name: str) -> Query:
+        return Query(self)
+
+
+def make_request(query: str = "") -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": "/api/v1/matters/matter-1/sources",
+        "query_string": query.encode(), "headers": [],
+    })
+
+
+def list_sources(supabase, fields=None):
+    query = f"fields={fields}" if fields else ""
+    return asyncio.run(main.list_matter_sources(
+        make_request(query), "matter-1", source_type=None, limit=50,
+        fields=fields, supabase=supabase, current_user=USER
+    ))
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache(monkeypatch):
+    monkeypatch.setattr(main, "response_cache", main.OrgResponseCache(1 << 20, 4))
+
+
+def test_listing_is_scoped_to_the_callers_org():
+    supabase = FakeSupabase()
+    response = list_sources(supabase, fields="id,source_name")
+
+    assert ("matters.org_id", "org-1") in supabase.filters
+    assert all("matters!inner(org_id)" in s for s in supabase.selects)
+    assert json.loads(response.body) == [{"id": "source-1", "updated_at": "2024-01-01", "source_name": "Lease"}]
+
+
+@pytest.mark.parametrize("fields", ["extracted_text", "source_name,storage_path"])
+def test_listing_rejects_fields_outside_the_allow_list(fields):
+    with pytest.raises(HTTPException) as exc:
+        list_sources(FakeSupabase(), fields=fields)
+
+    assert exc.value.status_code == 400
@@ -0,0 +1,799 @@
+"""
+Summit Common - Shared Service Plumbing
+
+Rate limiting, request body limits, tracing, database call instrumentation,
+read replica routing and Prometheus metrics used by every Summit backend
+service. Each service
+keeps its own route costs, body limits and service-specific metrics, and
+wires the rest up with setup_service().
+"""
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from typing import List, Optional, Dict, Any, Callable
+from datetime import datetime
+import os
+import re
+import jwt
+import json
+import math
+import time
+import secrets
+import random
+import httpx
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from dotenv import load_dotenv
+from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi.util import get_remote_address
+from slowapi.errors import RateLimitExceeded
+from limits import parse as parse_limit
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, ProcessCollector, generate_latest, CONTENT_TYPE_LATEST
+)
+from prometheus_client.core import CounterMetricFamily
+
+logger = logging.getLogger("summit_common")
+
+load_dotenv()
+
+# ============================================
+# RATE LIMITING
+# ============================================
+
+# Counters live in shared storage so limits hold across uvicorn workers and
+# hosts. Set RATE_LIMIT_STORAGE_URI (or REDIS_URL) in production; memory://
+# only counts within one process and is meant for local runs and tests.
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI") or os.getenv("REDIS_URL") or "memory://"
+
+# Cost-weighted sliding-window budget shared by everyone in an org, so one
+# heavy tenant cannot starve the others. Requests spend the service's
+# route_costs[path] units (1 if unlisted).
+ORG_RATE_LIMIT = parse_limit(os.getenv("ORG_RATE_LIMIT", "1200/minute"))
+
+
+def rate_limit_key(request: Request) -> str:
+    """Key per-route limits by the authenticated user, falling back to client IP."""
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization.startswith("Bearer ") else None
+    jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
+
+    if token and jwt_secret:
+        try:
+            payload = jwt.decode(token, jwt_secret, algorithms=["HS256"], audience="authenticated")
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except jwt.InvalidTokenError:
+            pass
+    elif token == "demo_token":
+        return "user:demo"
+
+    return f"ip:{get_remote_address(request)}"
+
+
+limiter = Limiter(key_func=rate_limit_key, storage_uri=RATE_LIMIT_STORAGE_URI, strategy="moving-window")
+
+
+def request_cost(request: Request, route_costs: Dict[str, int]) -> int:
+    """Quota units a request spends, looked up by its route template."""
+    route = request.scope.get("route")
+    return route_costs.get(getattr(route, "path", None), 1)
+
+
+def charge_org_quota(org_id: str, cost: int) -> None:
+    """Spend `cost` units of the org's shared budget, raising 429 once it is exhausted."""
+    if not limiter.enabled or cost <= 0:
+        return
+    if not limiter.limiter.hit(ORG_RATE_LIMIT, "org", org_id, cost=cost):
+        reset_at = limiter.limiter.get_window_stats(ORG_RATE_LIMIT, "org", org_id).reset_time
+        raise HTTPException(
+            status_code=429,
+            detail="Organisation rate limit exceeded",
+            headers={"Retry-After": str(max(1, int(reset_at - time.time())))}
+        )
+
+# ============================================
+# REQUEST BODY LIMIT
+# ============================================
+
+# Bodies are counted as they stream in, so chunked uploads without a
+# Content-Length are cut off too, before FastAPI buffers them. Keys of
+# route_limits are route templates; anything unlisted gets default_limit.
+
+
+def format_size(size: int) -> str:
+    return f"{size // (1024 * 1024)} MB" if size >= 1024 * 1024 else f"{size // 1024} KB"
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware answering 413 once a request body passes its route's limit."""
+
+    def __init__(self, app, default_limit: int, route_limits: Dict[str, int]):
+        self.app = app
+        self.default_limit = default_limit
+        self.route_limits = [
+            (re.compile("^" + re.sub(r"\{[^/]+\}", "[^/]+", path) + "$"), limit)
+            for path, limit in route_limits.items()
+        ]
+
+    def limit_for(self, path: str) -> int:
+        for pattern, limit in self.route_limits:
+            if pattern.match(path):
+                return limit
+        return self.default_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limit_for(scope["path"])
+        detail = f"Request body too large. Maximum size is {format_size(limit)}"
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Surfaces through FastAPI's exception handling as a 413
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# ============================================
+# TRACING
+# ============================================
+
+# Each request gets an X-Request-ID (the caller's, when it sends one) and a
+# W3C traceparent. Both are forwarded on internal HTTP calls, so one trace
+# covers agent runtime -> summit_api / orchestrator -> OpenAI. TRACE_EXPORT
+# chooses where finished spans go: "log" writes one JSON line per span, an
+# http(s) URL receives JSON batches, and anything else turns export off.
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "2"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "request_id", "sampled",
+        "attributes", "status", "start_time", "duration_ms", "_started"
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        request_id: str,
+        sampled: bool,
+        attributes: Dict[str, Any]
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.request_id = request_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_time = time.time()
+        self.duration_ms: Optional[float] = None
+        self._started = time.perf_counter()
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"[:500]
+        if self.sampled:
+            span_exporter.export(self)
+
+    def to_dict(self, service: str) -> Dict[str, Any]:
+        return {
+            "service": service,
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "start": datetime.utcfromtimestamp(self.start_time).isoformat() + "Z",
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Ships finished spans to the log, or batches them to a collector URL."""
+
+    def __init__(self, target: str):
+        self.target = target
+        self.service = "summit"
+        self.to_collector = target.startswith(("http://", "https://"))
+        self.dropped = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    def export(self, span: Span) -> None:
+        if self.target == "log":
+            logger.info(json.dumps(span.to_dict(self.service), default=str))
+        elif self.to_collector:
+            with self._lock:
+                if len(self._buffer) >= TRACE_BUFFER_SIZE:
+                    self.dropped += 1
+                    return
+                self._buffer.append(span.to_dict(self.service))
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_forever, daemon=True)
+                    self._flusher.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            httpx.post(self.target, content=json.dumps(batch, default=str), headers={"Content-Type": "application/json"}, timeout=5.0)
+        except httpx.HTTPError as e:
+            logger.warning(f"Trace export to {self.target} failed: {e}")
+
+    def _flush_forever(self) -> None:
+        while True:
+            time.sleep(TRACE_FLUSH_SECONDS)
+            self.flush()
+
+
+span_exporter = SpanExporter(TRACE_EXPORT)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """The span of the request or block being run, if any."""
+    return _current_span.get()
+
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes) -> Span:
+    """Start a span under `parent` (default: the current span), or a new trace without one."""
+    parent = parent or _current_span.get()
+    if parent is None:
+        trace_id = secrets.token_hex(16)
+        return Span(name, trace_id, None, trace_id, random.random() < TRACE_SAMPLE_RATE, attributes)
+    return Span(name, parent.trace_id, parent.span_id, parent.request_id, parent.sampled, attributes)
+
+
+@contextmanager
+def trace_span(name: str, **attributes):
+    """Run a block as the current span; exceptions mark it failed."""
+    span = start_span(name, **attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.end(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+class TraceMiddleware:
+    """ASGI middleware opening a server span per request and echoing X-Request-ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+            elif name == b"traceparent":
+                traceparent = value.decode("latin-1")
+        if request_id and not _REQUEST_ID_RE.match(request_id):
+            request_id = None
+
+        parent = _TRACEPARENT_RE.match(traceparent or "")
+        if parent:
+            trace_id, parent_id, sampled = parent[1], parent[2], parent[3] == "01"
+        else:
+            trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < TRACE_SAMPLE_RATE
+        span = Span(
+            f"{scope['method']} {scope['path']}", trace_id, parent_id, request_id or trace_id, sampled,
+            {"http.method": scope["method"], "http.path": scope["path"]}
+        )
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                span.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    span.status = "error"
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = span.request_id
+            await send(message)
+            # End with the response body, before any background tasks run
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                span.end()
+
+        token = _current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            span.end(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+# ============================================
+# DATABASE CALL INSTRUMENTATION
+# ============================================
+
+# Every PostgREST call made through get_supabase() is counted, timed and
+# fingerprinted against the current unit of work (an HTTP request, or an
+# agent run). A query shape repeated more than N_PLUS_ONE_THRESHOLD times
+# in one unit is logged as a likely N+1 loop. With DEBUG=true the totals are
+# also returned as X-DB-* response headers.
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+DEBUG = os.getenv("DEBUG") == "true"
+
+# Filter values and pagination numbers are dropped so shapes group together
+_FINGERPRINT_VERBATIM_PARAMS = {"select", "order", "on_conflict", "columns"}
+
+
+class QueryStats:
+    """Database calls made during one unit of work, grouped by query shape."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total_ms = 0.0
+        self.errors = 0
+        self.shapes: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, fingerprint: str, elapsed_ms: float, failed: bool) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.errors += failed
+            shape = self.shapes.setdefault(fingerprint, [0, 0.0])
+            shape[0] += 1
+            shape[1] += elapsed_ms
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """(fingerprint, count, ms) for shapes run more than threshold times, worst first."""
+        with self._lock:
+            hot = [(fp, int(n), ms) for fp, (n, ms) in self.shapes.items() if n > threshold]
+        return sorted(hot, key=lambda shape: shape[1], reverse=True)
+
+    def report(self) -> None:
+        for fingerprint, count, elapsed_ms in self.repeated(N_PLUS_ONE_THRESHOLD):
+            logger.warning(
+                f"Possible N+1 in {self.name}: {count}x {fingerprint} ({elapsed_ms:.1f} ms total)"
+            )
+
+
+_current_db_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_db_stats", default=None)
+
+# Process-wide totals per query shape: [calls, total ms, errors]
+db_query_totals: Dict[str, List[float]] = {}
+_db_totals_lock = threading.Lock()
+
+
+@contextmanager
+def db_unit_of_work(name: str):
+    """Attribute database calls made inside the block (and its threads) to one unit."""
+    stats = QueryStats(name)
+    token = _current_db_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_db_stats.reset(token)
+        stats.report()
+
+
+def query_fingerprint(request: httpx.Request) -> str:
+    """Method, table/RPC and filter shape of a PostgREST request, without values."""
+    path = request.url.path.split("/rest/v1", 1)[-1]
+    params = []
+    for key, value in request.url.params.multi_items():
+        if key in _FINGERPRINT_VERBATIM_PARAMS:
+            params.append(f"{key}={value}")
+        elif key in ("limit", "offset"):
+            params.append(key)
+        else:
+            params.append(f"{key}={value.split('.', 1)[0]}")
+    return f"{request.method} {path}" + (f"?{'&'.join(sorted(params))}" if params else "")
+
+
+def _on_db_request(request: httpx.Request) -> None:
+    request.extensions["db_started_at"] = time.perf_counter()
+    if _current_span.get() is not None:
+        path = request.url.path.split("/rest/v1", 1)[-1]
+        request.extensions["db_span"] = start_span(f"db {request.method} {path}")
+
+
+def _on_db_response(response: httpx.Response) -> None:
+    started_at = response.request.extensions.get("db_started_at")
+    if started_at is None:
+        return
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    fingerprint = query_fingerprint(response.request)
+    failed = response.status_code >= 400
+    DB_LATENCY.labels(response.request.url.path.split("/rest/v1", 1)[-1]).observe(elapsed_ms / 1000)
+
+    with _db_totals_lock:
+        totals = db_query_totals.setdefault(fingerprint, [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += elapsed_ms
+        totals[2] += failed
+
+    stats = _current_db_stats.get()
+    if stats is not None:
+        stats.record(fingerprint, elapsed_ms, failed)
+
+    span = response.request.extensions.get("db_span")
+    if span is not None:
+        span.attributes["db.query"] = fingerprint
+        span.attributes["http.status_code"] = response.status_code
+        if failed:
+            span.status = "error"
+        span.end()
+
+
+def instrument_client(client: Client) -> Client:
+    """Attach timing hooks to a Supabase client's PostgREST session."""
+    hooks = client.postgrest.session.event_hooks
+    if _on_db_request not in hooks["request"]:
+        hooks["request"].append(_on_db_request)
+        hooks["response"].append(_on_db_response)
+    return client
+
+
+class DBStatsMiddleware:
+    """ASGI middleware making each HTTP request a unit of work for DB instrumentation."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with db_unit_of_work(f"{scope['method']} {scope['path']}") as stats:
+            async def send_with_stats(message):
+                if DEBUG and message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Queries"] = str(stats.count)
+                    headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+                    repeated = stats.repeated(1)
+                    headers["X-DB-Max-Repeats"] = str(repeated[0][1] if repeated else min(stats.count, 1))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                # Report against the route template rather than the raw path
+                route = scope.get("route")
+                if route is not None:
+                    stats.name = f"{scope['method']} {route.path}"
+
+# ============================================
+# READ REPLICAS
+# ============================================
+
+# Read-only endpoints can be served from SUPABASE_READ_REPLICA_URLS (the
+# replicas' API URLs, same service key) so heavy reads stay off the primary.
+# A replica is skipped while its lag, reported by the optional
+# replication_lag_seconds() RPC, exceeds REPLICA_MAX_LAG_SECONDS, and is
+# ejected for a while if it cannot be reached. Orgs that wrote recently read
+# from the primary so they see their own writes; callers can also ask for
+# that explicitly with "X-Read-Consistency: strong". Writes are recorded in
+# the rate limiter's shared storage so every worker, host and service
+# honours the pin.
+SUPABASE_READ_REPLICA_URLS = [u.strip() for u in os.getenv("SUPABASE_READ_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", "5"))
+REPLICA_EJECT_SECONDS = float(os.getenv("REPLICA_EJECT_SECONDS", "30"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+
+class ReplicaPool:
+    """Round-robin over read replicas that are reachable and within the lag budget."""
+
+    def __init__(self, urls: List[str], max_lag_seconds: float, check_interval: float, eject_seconds: float):
+        self.urls = urls
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.eject_seconds = eject_seconds
+        self._checked_at: Dict[str, float] = {}
+        self._lag: Dict[str, Optional[float]] = {}
+        self._ejected_until: Dict[str, float] = {}
+        self._clients: Dict[str, Client] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def client(self, url: str, key: str) -> Client:
+        """The shared client for a replica, created on first use."""
+        with self._lock:
+            client = self._clients.get(url)
+            if client is None:
+                client = self._clients[url] = instrument_client(create_client(url, key))
+            return client
+
+    def _check(self, url: str, key: str) -> None:
+        """Refresh a replica's lag, ejecting it if the probe cannot reach it."""
+        try:
+            result = self.client(url, key).rpc("replication_lag_seconds").execute()
+            lag = float(result.data) if result.data is not None else 0.0
+        except APIError:
+            # No lag function deployed: rely on ejection and read-your-writes only
+            lag = None
+        except Exception as e:
+            logger.warning(f"Read replica {url} unreachable, ejecting for {self.eject_seconds:.0f}s: {e}")
+            self.eject(url)
+            return
+        with self._lock:
+            self._lag[url] = lag
+            self._checked_at[url] = time.monotonic()
+
+    def _usable(self, url: str, now: float) -> bool:
+        if self._ejected_until.get(url, 0) > now:
+            return False
+        lag = self._lag.get(url)
+        return lag is None or lag <= self.max_lag_seconds
+
+    def choose(self, key: str) -> Optional[str]:
+        """A usable replica URL, or None to read from the primary."""
+        now = time.monotonic()
+        for url in self.urls:
+            if self._ejected_until.get(url, 0) <= now and now - self._checked_at.get(url, float("-inf")) > self.check_interval:
+                self._check(url, key)
+
+        with self._lock:
+            for _ in range(len(self.urls)):
+                url = self.urls[self._next % len(self.urls)]
+                self._next += 1
+                if self._usable(url, now):
+                    return url
+        return None
+
+    def eject(self, url: str) -> None:
+        with self._lock:
+            self._ejected_until[url] = time.monotonic() + self.eject_seconds
+            self._checked_at.pop(url, None)
+
+
+replica_pool = ReplicaPool(
+    SUPABASE_READ_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL_SECONDS, REPLICA_EJECT_SECONDS
+)
+
+
+def _write_marker_keys(org_id: str) -> tuple[str, str]:
+    """Storage keys for the current and previous READ_YOUR_WRITES_SECONDS windows."""
+    window = int(time.time() // READ_YOUR_WRITES_SECONDS)
+    return f"read_your_writes/{org_id}/{window}", f"read_your_writes/{org_id}/{window - 1}"
+
+
+def mark_org_write(org_id: str) -> None:
+    """Pin the org's reads to the primary for READ_YOUR_WRITES_SECONDS (up to twice that)."""
+    try:
+        limiter.limiter.storage.incr(_write_marker_keys(org_id)[0], math.ceil(2 * READ_YOUR_WRITES_SECONDS))
+    except Exception as e:
+        logger.warning(f"Could not record write marker for org {org_id}: {e}")
+
+
+def org_wrote_recently(org_id: str) -> bool:
+    try:
+        return any(limiter.limiter.storage.get(key) > 0 for key in _write_marker_keys(org_id))
+    except Exception as e:
+        # Without the marker we cannot rule out a recent write, so stay on the primary
+        logger.warning(f"Could not read write marker for org {org_id}: {e}")
+        return True
+
+
+def replica_dependencies(
+    get_supabase: Callable[..., Client],
+    get_current_user: Callable[..., Dict]
+) -> tuple[Callable[..., Client], Callable[..., Client]]:
+    """
+    FastAPI dependencies (get_read_supabase, get_write_supabase) built on a
+    service's own primary client and auth dependencies.
+    """
+
+    def get_read_supabase(
+        request: Request,
+        supabase: Client = Depends(get_supabase),
+        current_user: Dict = Depends(get_current_user)
+    ) -> Client:
+        """Supabase client for read-only queries: a healthy replica when possible, else the primary."""
+        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        strong = request.headers.get("x-read-consistency", "").lower() == "strong"
+
+        if replica_pool.urls and key and not strong and not org_wrote_recently(current_user["org_id"]):
+            url = replica_pool.choose(key)
+            if url:
+                return replica_pool.client(url, key)
+        return supabase
+
+    def get_write_supabase(
+        supabase: Client = Depends(get_supabase),
+        current_user: Dict = Depends(get_current_user)
+    ) -> Client:
+        """Supabase client for routes that write; pins the org's reads to the primary."""
+        mark_org_write(current_user["org_id"])
+        return supabase
+
+    return get_read_supabase, get_write_supabase
+
+# ============================================
+# METRICS
+# ============================================
+
+# Prometheus metrics served at /metrics from metrics_registry, which services
+# also register their own metrics in. Routes are labelled by template and
+# unmatched paths share one label, so cardinality stays bounded. Counters are
+# per process, so scrape each worker (or run one worker per container). Set
+# METRICS_TOKEN to require "Authorization: Bearer <token>" on scrapes.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+metrics_registry = CollectorRegistry()
+ProcessCollector(registry=metrics_registry)
+
+HTTP_REQUESTS = Counter(
+    "summit_http_requests_total", "HTTP requests served",
+    ["method", "route", "status"], registry=metrics_registry
+)
+HTTP_LATENCY = Histogram(
+    "summit_http_request_duration_seconds", "HTTP request latency",
+    ["method", "route"], buckets=LATENCY_BUCKETS, registry=metrics_registry
+)
+HTTP_IN_FLIGHT = Gauge(
+    "summit_http_requests_in_flight", "HTTP requests currently being served",
+    registry=metrics_registry
+)
+DB_LATENCY = Histogram(
+    "summit_db_call_duration_seconds", "PostgREST call latency by table or RPC",
+    ["table"], buckets=LATENCY_BUCKETS, registry=metrics_registry
+)
+CACHE_LOOKUPS = Counter(
+    "summit_cache_lookups_total", "In-process cache lookups by outcome",
+    ["cache", "result"], registry=metrics_registry
+)
+
+
+class DBShapeCollector:
+    """Exports the per-query-shape totals gathered by the DB instrumentation."""
+
+    def collect(self):
+        calls = CounterMetricFamily("summit_db_shape_calls", "PostgREST calls by query shape", labels=["shape"])
+        seconds = CounterMetricFamily("summit_db_shape_seconds", "PostgREST time by query shape", labels=["shape"])
+        errors = CounterMetricFamily("summit_db_shape_errors", "Failed PostgREST calls by query shape", labels=["shape"])
+        with _db_totals_lock:
+            totals = [(shape, list(values)) for shape, values in db_query_totals.items()]
+        for shape, (count, total_ms, failed) in totals:
+            calls.add_metric([shape], count)
+            seconds.add_metric([shape], total_ms / 1000)
+            errors.add_metric([shape], failed)
+        yield calls
+        yield seconds
+        yield errors
+
+
+metrics_registry.register(DBShapeCollector())
+
+
+# Labelled children by (method, route, status); labels() takes a lock per call
+_http_metric_children: Dict[tuple, tuple] = {}
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and in-flight requests per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            recorded = True
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; label by its
+            # template so path parameters do not explode cardinality
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "<unmatched>", status)
+            children = _http_metric_children.get(key)
+            if children is None:
+                children = _http_metric_children[key] = (
+                    HTTP_LATENCY.labels(key[0], key[1]), HTTP_REQUESTS.labels(key[0], key[1], str(status))
+                )
+            children[0].observe(elapsed)
+            children[1].inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            # Stop the clock once the body is out, before any background tasks run
+            if message["type"] == "http.response.body" and not message.get("more_body") and not recorded:
+                record()
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if not recorded:
+                record()
+
+
+# ============================================
+# SERVICE SETUP
+# ============================================
+
+async def metrics(authorization: str = Header(None)):
+    """Prometheus scrape endpoint"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(content=generate_latest(metrics_registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def setup_service(app: FastAPI, name: str, max_body_size: int, body_size_limits: Dict[str, int]) -> None:
+    """Attach the rate limiter, the shared middleware and /metrics to a service's app."""
+    span_exporter.service = name
+
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    app.add_middleware(BodySizeLimitMiddleware, default_limit=max_body_size, route_limits=body_size_limits)
+    app.add_middleware(DBStatsMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(TraceMiddleware)
+
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
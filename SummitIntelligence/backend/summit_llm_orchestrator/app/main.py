@@ -10,15 +10,31 @@ from fastapi import FastAPI, Depends, HTTPException, Header, BackgroundTasks, Re
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, AsyncGenerator
-from datetime import datetime
+from typing import List, Optional, Dict, Any, AsyncGenerator, Awaitable, Callable
+from datetime import datetime, timedelta
 from enum import Enum
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email import policy as email_policy
+from email.parser import BytesParser
 import os
 import json
+import fcntl
+import hashlib
+import re
 import jwt
+import time
+import secrets
+import socket
+import tempfile
+import multiprocessing
+import zipfile
+import threading
 import asyncio
+import numpy as np
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 # Configure structured logging
 logging.basicConfig(
@@ -27,13 +43,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger("summit_llm")
 
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, BadRequestError
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from dotenv import load_dotenv
 import tiktoken
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from prometheus_client import Counter, Gauge, Histogram
+
+# Rate limiting, tracing, DB instrumentation and metrics shared by every service
+from summit_common.service import (
+    CACHE_LOOKUPS, LATENCY_BUCKETS, charge_org_quota, instrument_client, limiter, metrics_registry,
+    request_cost, setup_service, span_exporter, start_span, trace_span
+)
+
+try:
+    import magic
+except ImportError:  # optional; file types are then sniffed from known signatures
+    magic = None
 
 load_dotenv()
 
@@ -41,7 +67,71 @@ load_dotenv()
 # RATE LIMITING
 # ============================================
 
-limiter = Limiter(key_func=get_remote_address)
+# The per-user limiter and the org budget are shared (summit_common.service);
+# requests spend ROUTE_COSTS[path] units of their org's budget (1 if unlisted).
+ROUTE_COSTS = {
+    "/api/v1/complete": 10,
+    "/api/v1/embed": 2,
+    "/api/v1/rag": 10,
+    "/api/v1/analyze": 20,
+    "/api/v1/index/rebuild": 50,
+    "/api/v1/ingest": 20,
+}
+
+# ============================================
+# REQUEST BODY LIMIT
+# ============================================
+
+# Keys are route templates; anything unlisted gets MAX_REQUEST_BODY_SIZE.
+MAX_REQUEST_BODY_SIZE = int(os.getenv("MAX_REQUEST_BODY_SIZE", str(4 * 1024 * 1024)))
+BODY_SIZE_LIMITS = {
+    "/api/v1/complete": 2 * 1024 * 1024,
+    "/api/v1/rag": 64 * 1024,
+    "/api/v1/embed": 8 * 1024 * 1024,
+    "/api/v1/analyze": 1024,
+}
+
+# ============================================
+# METRICS
+# ============================================
+
+# Service metrics, served at /metrics next to the shared HTTP and DB ones
+LLM_LATENCY = Histogram(
+    "summit_llm_call_duration_seconds", "Upstream LLM call latency",
+    ["model", "task_type"], buckets=LATENCY_BUCKETS, registry=metrics_registry
+)
+LLM_TOKENS = Counter(
+    "summit_llm_tokens_total", "LLM tokens by direction",
+    ["model", "direction"], registry=metrics_registry
+)
+RETRIEVAL_LATENCY = Histogram(
+    "summit_retrieval_stage_seconds", "Context retrieval time per stage",
+    ["stage"], buckets=LATENCY_BUCKETS, registry=metrics_registry
+)
+INGEST_CHUNKS = Counter(
+    "summit_ingest_chunks_total", "Chunks handled by ingestion jobs",
+    ["result"], registry=metrics_registry
+)
+INGEST_SOURCES = Counter(
+    "summit_ingest_sources_total", "Sources finished by ingestion jobs",
+    ["result"], registry=metrics_registry
+)
+EXTRACTED_PAGES = Counter(
+    "summit_extracted_pages_total", "Pages of text extracted from stored source files",
+    ["mime_type"], registry=metrics_registry
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "summit_ingest_queue_depth", "Chunks waiting in an ingestion queue",
+    ["queue"], registry=metrics_registry
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "summit_embedding_batch_size", "Texts per upstream embedding call from the batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048), registry=metrics_registry
+)
+LLM_ERRORS = Counter(
+    "summit_llm_call_errors_total", "Failed upstream LLM calls",
+    ["model", "task_type"], registry=metrics_registry
+)
 
 # ============================================
 # APP INITIALIZATION
@@ -51,7 +141,17 @@ limiter = Limiter(key_func=get_remote_address)
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     print("Summit LLM Orchestrator starting...")
+    try:
+        ingestion_sweep = asyncio.create_task(ingestion_pipeline.sweep(get_supabase(), get_openai()))
+    except HTTPException:
+        ingestion_sweep = None
     yield
+    if ingestion_sweep is not None:
+        ingestion_sweep.cancel()
+    if span_exporter.to_collector:
+        span_exporter.flush()
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(wait=False, cancel_futures=True)
     print("Summit LLM Orchestrator shutting down...")
 
 app = FastAPI(
@@ -61,9 +161,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add rate limiter to app state
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Rate limiting, body limits, tracing, DB instrumentation and /metrics
+setup_service(app, "summit_llm_orchestrator", MAX_REQUEST_BODY_SIZE, BODY_SIZE_LIMITS)
 
 # CORS Configuration - Restricted for security
 ALLOWED_ORIGINS = [
@@ -79,6 +178,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+    expose_headers=["X-Request-ID"],
 )
 
 # ============================================
@@ -91,7 +191,7 @@ def get_supabase() -> Client:
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         raise HTTPException(status_code=500, detail="Supabase not configured")
-    return create_client(url, key)
+    return instrument_client(create_client(url, key))
 
 def get_openai() -> AsyncOpenAI:
     """Get OpenAI client"""
@@ -127,6 +227,15 @@ class TaskType(str, Enum):
     CLASSIFICATION = "classification"
     QA = "qa"
 
+class AnalysisMode(str, Enum):
+    AUTO = "auto"
+    SINGLE = "single"
+    MAP_REDUCE = "map_reduce"
+
+class RetrievalMode(str, Enum):
+    VECTOR = "vector"
+    HYBRID = "hybrid"
+
 class CompletionRequest(BaseModel):
     """Request for LLM completion"""
     task_type: TaskType
@@ -138,11 +247,13 @@ class CompletionRequest(BaseModel):
     max_tokens: int = Field(default=2048, ge=1, le=8192)
     stream: bool = False
     metadata: Dict[str, Any] = {}
+    cache: bool = True
 
 class EmbeddingRequest(BaseModel):
     """Request for embeddings"""
     texts: List[str]
     model: LLMModel = LLMModel.EMBEDDING_3_SMALL
+    dimensions: Optional[int] = Field(default=None, ge=1, le=3072)
 
 class RAGRequest(BaseModel):
     """Request for RAG-enhanced completion"""
@@ -153,6 +264,26 @@ class RAGRequest(BaseModel):
     similarity_threshold: float = Field(default=0.7, ge=0, le=1)
     include_sources: bool = True
     stream: bool = False
+    # Answers are only cached at or below COMPLETION_CACHE_MAX_TEMPERATURE
+    temperature: float = Field(default=0.7, ge=0, le=2)
+    cache: bool = True
+    # None uses DEFAULT_RETRIEVAL_MODE; mmr diversifies the selected chunks
+    retrieval_mode: Optional[RetrievalMode] = None
+    mmr: bool = False
+
+class CacheInvalidateRequest(BaseModel):
+    """Drop cached completions for the caller's org, or one of its matters"""
+    matter_id: Optional[str] = None
+
+class IngestRequest(BaseModel):
+    """Chunk and embed a matter's sources (all of them unless source_ids is given)"""
+    matter_id: str
+    source_ids: Optional[List[str]] = Field(default=None, max_length=10000)
+    force: bool = False
+
+class IndexRebuildRequest(BaseModel):
+    """Rebuild one matter's local vector index"""
+    matter_id: str
 
 class ContextChunk(BaseModel):
     """Retrieved context chunk"""
@@ -216,6 +347,143 @@ Cite specific sources when answering.
 Acknowledge when information is uncertain or unavailable."""
 }
 
+# Context windows per model, in tokens
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+
+# Retrieved context and pasted documents are packed into these budgets, and
+# never past what the model's window leaves after the prompt and reply
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+DOCUMENT_TOKEN_BUDGET = int(os.getenv("DOCUMENT_TOKEN_BUDGET", "24000"))
+PROMPT_TOKEN_MARGIN = 256
+# Chunks sharing at least this many characters at a boundary are merged
+MIN_CHUNK_OVERLAP = 40
+# A chunk is only truncated into the leftover budget if this much remains
+MIN_TRUNCATED_CHUNK_TOKENS = 100
+# Per-chunk header overhead ("[Source n: name]" and separators)
+CHUNK_HEADER_TOKENS = 12
+
+
+def available_tokens(model: str, max_tokens: int, *texts: str) -> int:
+    """Tokens left in the model's window after the given prompt text and the reply."""
+    window = MODEL_CONTEXT_WINDOWS.get(model, 8192)
+    used = sum(count_tokens(text, model) for text in texts)
+    return window - max_tokens - used - PROMPT_TOKEN_MARGIN
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4") -> tuple[str, int]:
+    """Cut text to at most max_tokens; returns the text and how many tokens were cut."""
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception:
+        # Same rough 4 characters per token as count_tokens
+        cut = max(0, len(text) - max_tokens * 4)
+        return (text[:max_tokens * 4], cut // 4) if cut else (text, 0)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text, 0
+    return encoding.decode(tokens[:max(max_tokens, 0)]), len(tokens) - max_tokens
+
+
+def _boundary_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    if len(right) < MIN_CHUNK_OVERLAP:
+        return 0
+    probe = right[:MIN_CHUNK_OVERLAP]
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+def _merge_chunk(piece: ContextChunk, chunk: ContextChunk) -> Optional[ContextChunk]:
+    """Merge a chunk into a piece of the same source if they repeat, overlap or are adjacent."""
+    first = piece.metadata.get("chunk_index")
+    last = piece.metadata.get("last_chunk_index", first)
+    index = chunk.metadata.get("chunk_index")
+
+    if chunk.content in piece.content:
+        content = piece.content
+    elif piece.content in chunk.content:
+        content = chunk.content
+    elif (overlap := _boundary_overlap(piece.content, chunk.content)):
+        content = piece.content + chunk.content[overlap:]
+    elif (overlap := _boundary_overlap(chunk.content, piece.content)):
+        content = chunk.content + piece.content[overlap:]
+    elif first is not None and index == last + 1:
+        content = piece.content + "\n" + chunk.content
+    elif first is not None and index == first - 1:
+        content = chunk.content + "\n" + piece.content
+    else:
+        return None
+
+    metadata = piece.metadata
+    if first is not None and index is not None:
+        metadata = {**metadata, "chunk_index": min(first, index), "last_chunk_index": max(last, index)}
+    return piece.model_copy(update={
+        "content": content,
+        "similarity": max(piece.similarity, chunk.similarity),
+        "metadata": metadata
+    })
+
+
+def pack_context(
+    chunks: List[ContextChunk],
+    budget: int,
+    model: str = "gpt-4"
+) -> tuple[List[ContextChunk], Dict[str, int]]:
+    """
+    Fit retrieved chunks into a token budget.
+
+    Chunks from the same source that repeat, overlap or sit next to each
+    other are merged into one piece. Pieces are then taken by similarity
+    until the budget runs out, truncating the first one that does not fit
+    when enough room remains. Returns the packed pieces and counts of what
+    was retrieved, merged, packed, dropped and truncated.
+    """
+    pieces: List[ContextChunk] = []
+    merged = 0
+    for chunk in sorted(chunks, key=lambda c: c.similarity, reverse=True):
+        for i, piece in enumerate(pieces):
+            if piece.source_id == chunk.source_id:
+                combined = _merge_chunk(piece, chunk)
+                if combined is not None:
+                    pieces[i] = combined
+                    merged += 1
+                    break
+        else:
+            pieces.append(chunk)
+
+    packed: List[ContextChunk] = []
+    used = truncated = 0
+    for piece in sorted(pieces, key=lambda p: p.similarity, reverse=True):
+        remaining = budget - used - CHUNK_HEADER_TOKENS
+        tokens = count_tokens(piece.content, model)
+        if tokens <= remaining:
+            packed.append(piece)
+            used += tokens + CHUNK_HEADER_TOKENS
+        elif remaining >= MIN_TRUNCATED_CHUNK_TOKENS:
+            content, _ = truncate_to_tokens(piece.content, remaining, model)
+            packed.append(piece.model_copy(update={"content": content + " [...]"}))
+            used += remaining + CHUNK_HEADER_TOKENS
+            truncated += 1
+
+    return packed, {
+        "retrieved": len(chunks),
+        "merged": merged,
+        "packed": len(packed),
+        "dropped": len(pieces) - len(packed),
+        "truncated": truncated,
+        "tokens": used
+    }
+
 def assemble_prompt(
     request: CompletionRequest,
     context_chunks: Optional[List[ContextChunk]] = None
@@ -239,37 +507,821 @@ def assemble_prompt(
 
     return system_prompt, user_prompt
 
+# ============================================
+# EMBEDDING CACHE
+# ============================================
+
+# Embeddings are content-addressed by (model, dimensions, sha256(text)), so
+# repeated queries and re-indexed but unchanged chunks skip the API. An
+# in-memory LRU sits in front of one append-only store per model and
+# dimension under EMBEDDING_CACHE_DIR: a float32 matrix read through a memory
+# map (<name>.f32) plus a digest per row (<name>.idx). Appends take an
+# exclusive file lock, so uvicorn workers can share the directory; each
+# worker picks up the others' rows when a lookup misses. Leave
+# EMBEDDING_CACHE_DIR empty to keep the cache in memory only.
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(tempfile.gettempdir(), "summit_embeddings"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "20000"))
+EMBEDDING_CACHE_MAX_DISK_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_DISK_ROWS", "2000000"))
+
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+_DIGEST_SIZE = 32
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped float32 embedding rows keyed by text digest."""
+
+    def __init__(self, directory: str, name: str, dimensions: int):
+        self.dimensions = dimensions
+        self.row_bytes = dimensions * 4
+        self.data_path = os.path.join(directory, f"{name}.f32")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self._rows: Dict[bytes, int] = {}
+        self._index_offset = 0
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        open(self.data_path, "ab").close()
+        open(self.index_path, "ab").close()
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Pick up rows appended since the last read, by this or another process."""
+        if os.path.getsize(self.index_path) <= self._index_offset:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            tail = f.read()
+        usable = len(tail) - len(tail) % _DIGEST_SIZE
+        first_row = self._index_offset // _DIGEST_SIZE
+        for i in range(0, usable, _DIGEST_SIZE):
+            self._rows.setdefault(tail[i:i + _DIGEST_SIZE], first_row + i // _DIGEST_SIZE)
+        self._index_offset += usable
+
+    def _mapped(self, row: int) -> Optional[np.memmap]:
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            rows = os.path.getsize(self.data_path) // self.row_bytes
+            if row >= rows:
+                return None
+            self._matrix = np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(rows, self.dimensions))
+        return self._matrix
+
+    def get_many(self, digests: List[bytes]) -> Dict[bytes, np.ndarray]:
+        with self._lock:
+            if any(digest not in self._rows for digest in digests):
+                self._refresh()
+            found = {}
+            for digest in digests:
+                row = self._rows.get(digest)
+                matrix = self._mapped(row) if row is not None else None
+                if matrix is not None:
+                    found[digest] = np.array(matrix[row])
+            return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]) -> None:
+        with self._lock, open(self.index_path, "ab") as index, open(self.data_path, "ab") as data:
+            fcntl.flock(index, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                new = [(d, v) for d, v in items.items() if d not in self._rows]
+                rows = min(
+                    os.path.getsize(self.data_path) // self.row_bytes,
+                    os.path.getsize(self.index_path) // _DIGEST_SIZE
+                )
+                if not new or rows + len(new) > EMBEDDING_CACHE_MAX_DISK_ROWS:
+                    return
+                # Drop anything a crashed writer left past the last complete
+                # row, then write data before the index entries that expose it
+                data.truncate(rows * self.row_bytes)
+                index.truncate(rows * _DIGEST_SIZE)
+                data.write(np.stack([v for _, v in new]).astype(np.float32).tobytes())
+                data.flush()
+                index.write(b"".join(d for d, _ in new))
+                index.flush()
+            finally:
+                fcntl.flock(index, fcntl.LOCK_UN)
+            self._refresh()
+
+
+class EmbeddingCache:
+    """LRU of recent embeddings in front of the per-model disk stores."""
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._stores: Dict[tuple, EmbeddingStore] = {}
+        self._lock = threading.Lock()
+
+    def _store(self, model: str, dimensions: int) -> Optional[EmbeddingStore]:
+        if not self.directory:
+            return None
+        key = (model, dimensions)
+        with self._lock:
+            if key not in self._stores:
+                self._stores[key] = EmbeddingStore(self.directory, f"{model}-{dimensions}", dimensions)
+            return self._stores[key]
+
+    def get_many(self, model: str, dimensions: int, digests: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock:
+            for digest in digests:
+                vector = self._entries.get((model, dimensions, digest))
+                if vector is not None:
+                    self._entries.move_to_end((model, dimensions, digest))
+                    found[digest] = vector
+        missing = [d for d in digests if d not in found]
+        store = self._store(model, dimensions) if missing else None
+        if store is not None:
+            from_disk = store.get_many(missing)
+            self._remember(model, dimensions, from_disk)
+            found.update(from_disk)
+        return found
+
+    def put_many(self, model: str, dimensions: int, items: Dict[bytes, np.ndarray]) -> None:
+        self._remember(model, dimensions, items)
+        store = self._store(model, dimensions)
+        if store is not None:
+            store.put_many(items)
+
+    def _remember(self, model: str, dimensions: int, items: Dict[bytes, np.ndarray]) -> None:
+        with self._lock:
+            for digest, vector in items.items():
+                self._entries[(model, dimensions, digest)] = vector
+                self._entries.move_to_end((model, dimensions, digest))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MEMORY_ENTRIES)
+
+
+async def request_embeddings(
+    openai_client: AsyncOpenAI,
+    texts: List[str],
+    model: str,
+    dimensions: Optional[int] = None
+) -> List[List[float]]:
+    """Call the embeddings API for texts, in order"""
+    params = {"dimensions": dimensions} if dimensions else {}
+    with llm_call_metrics(model, "embedding"):
+        response = await openai_client.embeddings.create(input=texts, model=model, **params)
+    record_llm_tokens(model, response.usage.prompt_tokens)
+    return [item.embedding for item in response.data]
+
+
+async def embed_texts(
+    openai_client: AsyncOpenAI,
+    texts: List[str],
+    model: str = LLMModel.EMBEDDING_3_SMALL.value,
+    dimensions: Optional[int] = None
+) -> List[List[float]]:
+    """Embeddings for texts, in order, sending only uncached texts upstream"""
+    if not texts:
+        return []
+    size = dimensions or EMBEDDING_DIMENSIONS.get(model)
+    if size is None:
+        return await request_embeddings(openai_client, texts, model, dimensions)
+    digests = [hashlib.sha256(text.encode()).digest() for text in texts]
+    unique = list(dict.fromkeys(digests))
+
+    found = await asyncio.to_thread(embedding_cache.get_many, model, size, unique)
+    CACHE_LOOKUPS.labels("embedding", "hit").inc(len(found))
+
+    missing = [d for d in unique if d not in found]
+    if missing:
+        CACHE_LOOKUPS.labels("embedding", "miss").inc(len(missing))
+        first_text = {}
+        for digest, text in zip(digests, texts):
+            first_text.setdefault(digest, text)
+        embeddings = await embedding_batcher.embed(openai_client, [first_text[d] for d in missing], model, dimensions)
+        fresh = {d: np.asarray(e, dtype=np.float32) for d, e in zip(missing, embeddings)}
+        if len(embeddings[0]) == size:
+            await asyncio.to_thread(embedding_cache.put_many, model, size, fresh)
+        found.update(fresh)
+
+    return [found[digest].tolist() for digest in digests]
+
+# ============================================
+# EMBEDDING BATCHING
+# ============================================
+
+# Embedding misses from concurrent requests (agent fan-out, parallel RAG
+# queries) are coalesced into one upstream call per model. A batch goes out
+# EMBEDDING_BATCH_WAIT_MS after its first text arrives, or sooner once it
+# reaches EMBEDDING_BATCH_MAX_ITEMS inputs or EMBEDDING_BATCH_MAX_TOKENS
+# tokens (the provider caps both per request). A wait of 0 disables batching.
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "2048"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "250000"))
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into shared upstream calls."""
+
+    def __init__(self, max_wait_ms: float, max_items: int, max_tokens: int):
+        self.max_wait = max_wait_ms / 1000
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        # Keyed by (model, dimensions): pending texts with their futures, plus
+        # the batch token total, the client to send with and the flush timer
+        self._pending: Dict[tuple, List[tuple[str, asyncio.Future]]] = {}
+        self._tokens: Dict[tuple, int] = {}
+        self._clients: Dict[tuple, AsyncOpenAI] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+
+    async def embed(
+        self,
+        openai_client: AsyncOpenAI,
+        texts: List[str],
+        model: str,
+        dimensions: Optional[int] = None
+    ) -> List[List[float]]:
+        if self.max_wait <= 0:
+            return await request_embeddings(openai_client, texts, model, dimensions)
+
+        loop = asyncio.get_running_loop()
+        key = (model, dimensions)
+        futures = []
+        for text in texts:
+            tokens = count_tokens(text, model)
+            pending = self._pending.get(key)
+            if pending and (len(pending) >= self.max_items or self._tokens[key] + tokens > self.max_tokens):
+                self._flush(key)
+                pending = None
+            if not pending:
+                pending = self._pending[key] = []
+                self._tokens[key] = 0
+                self._clients[key] = openai_client
+                self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+            future = loop.create_future()
+            pending.append((text, future))
+            self._tokens[key] += tokens
+            futures.append(future)
+
+        pending = self._pending.get(key)
+        if pending and (len(pending) >= self.max_items or self._tokens[key] >= self.max_tokens):
+            self._flush(key)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self, key: tuple) -> None:
+        batch = self._pending.pop(key, None)
+        self._tokens.pop(key, None)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if batch:
+            asyncio.ensure_future(self._send(self._clients.pop(key), key, batch))
+
+    async def _send(self, openai_client: AsyncOpenAI, key: tuple, batch: List[tuple[str, asyncio.Future]]) -> None:
+        model, dimensions = key
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        try:
+            embeddings = await request_embeddings(openai_client, texts, model, dimensions)
+        except BadRequestError as e:
+            if len(texts) == 1:
+                by_text = {texts[0]: e}
+            else:
+                # One bad input rejects the whole batch; retry one by one so only its callers fail
+                results = await asyncio.gather(
+                    *[request_embeddings(openai_client, [text], model, dimensions) for text in texts],
+                    return_exceptions=True
+                )
+                by_text = {text: r if isinstance(r, Exception) else r[0] for text, r in zip(texts, results)}
+        except Exception as e:
+            by_text = dict.fromkeys(texts, e)
+        else:
+            by_text = dict(zip(texts, embeddings))
+
+        for text, future in batch:
+            if not future.done():
+                result = by_text[text]
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+embedding_batcher = EmbeddingBatcher(EMBEDDING_BATCH_WAIT_MS, EMBEDDING_BATCH_MAX_ITEMS, EMBEDDING_BATCH_MAX_TOKENS)
+
+# ============================================
+# LOCAL VECTOR INDEX
+# ============================================
+
+# RETRIEVAL_BACKEND=local serves vector search from an IVF index kept next to
+# the orchestrator instead of the match_vectors RPC. Each matter has its own
+# directory under VECTOR_INDEX_DIR:
+#   vectors.f32     unit-normalised float32 rows, read through a memory map
+#   rows.jsonl      chunk id, source and chunk_index per row, held in memory
+#   content.jsonl   chunk text per row, read only for search hits
+#   content.i64     byte offset of each row's text in content.jsonl
+#   lists.i32       IVF list (nearest centroid) per row
+#   centroids.f32   IVF centroids, once the matter has IVF_MIN_ROWS rows
+#   state.json      generation, row count, committed file sizes, tombstones
+#                   and training size; written last with os.replace, so it
+#                   commits each update
+# Matters below IVF_MIN_ROWS are searched exhaustively. New rows are appended
+# and assigned to their nearest centroid, and other processes read just the
+# new tail. The index is retrained and compacted into a new generation, by
+# streaming the old files, once it has grown by IVF_RETRAIN_GROWTH or half
+# its rows are tombstoned. Writers take an flock and readers catch up when
+# state.json changes, so uvicorn workers can share the directory. Matters
+# with no local index fall back to the RPC.
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "rpc")
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(tempfile.gettempdir(), "summit_vector_index"))
+VECTOR_INDEX_OPEN_MATTERS = int(os.getenv("VECTOR_INDEX_OPEN_MATTERS", "64"))
+IVF_MIN_ROWS = int(os.getenv("IVF_MIN_ROWS", "4096"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+IVF_RETRAIN_GROWTH = float(os.getenv("IVF_RETRAIN_GROWTH", "2.0"))
+IVF_TRAIN_SAMPLE = int(os.getenv("IVF_TRAIN_SAMPLE", "65536"))
+CHUNK_TABLE = os.getenv("CHUNK_TABLE", "source_chunk")
+
+_INDEX_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def train_ivf(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids over a sample of unit vectors."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), max(IVF_TRAIN_SAMPLE, nlist * 8))
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_ivf(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1)
+        # Empty lists keep their previous centroid
+        filled = norms > 0
+        centroids[filled] = sums[filled] / norms[filled, None]
+    return centroids
+
+
+def assign_ivf(vectors: np.ndarray, centroids: np.ndarray, batch: int = 65536) -> np.ndarray:
+    """Nearest centroid for each row, in batches to bound memory."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch):
+        out[start:start + batch] = np.argmax(np.asarray(vectors[start:start + batch]) @ centroids.T, axis=1)
+    return out
+
+
+class MatterVectorIndex:
+    """IVF index over one matter's chunk embeddings, persisted as memory-mapped files."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded_stamp: Any = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.generation: Optional[int] = None
+        self.dims = 0
+        self.trained_rows = 0
+        self.rows: List[Dict[str, Any]] = []
+        self.rows_bytes = 0
+        self.content_bytes = 0
+        self.by_source: Dict[str, List[int]] = {}
+        self.content_offsets = np.zeros(0, dtype=np.int64)
+        self._content_file = None
+        self.vectors: Optional[np.memmap] = None
+        self.alive = np.zeros(0, dtype=bool)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self, locked: bool = False, force: bool = False) -> None:
+        """Catch up with the latest commit by any process; within a generation only new rows are read."""
+        try:
+            stamp = self._stamp()
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._loaded_stamp and not force:
+            return
+        if stamp is None:
+            self._reset()
+            self._loaded_stamp = None
+            return
+        if locked:
+            self._read()
+            return
+        # A shared lock keeps a writer from swapping files mid-read
+        with open(self._path(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                self._read()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stamp(self) -> tuple[int, int]:
+        # Every commit replaces state.json, so its inode changes even within one mtime tick
+        stat = os.stat(self._path("state.json"))
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _read(self) -> None:
+        self._loaded_stamp = self._stamp()
+        with open(self._path("state.json")) as f:
+            state = json.load(f)
+        if state["generation"] != self.generation or state["rows"] < len(self.rows):
+            # Rewritten since the last load: reopen everything
+            self._reset()
+            self.generation = state["generation"]
+            self._content_file = open(self._path("content.jsonl"), "rb")
+
+        start, count = len(self.rows), state["rows"]
+        self.dims = state["dims"]
+        self.trained_rows = state["trained_rows"]
+        if count > start:
+            with open(self._path("rows.jsonl"), "rb") as f:
+                f.seek(self.rows_bytes)
+                for i in range(start, count):
+                    row = json.loads(f.readline())
+                    self.rows.append(row)
+                    self.by_source.setdefault(row.get("source_id"), []).append(i)
+            self.content_offsets = np.concatenate([
+                self.content_offsets,
+                np.fromfile(self._path("content.i64"), dtype=np.int64, count=count - start, offset=start * 8)
+            ])
+            new_assignments = np.fromfile(self._path("lists.i32"), dtype=np.int32, count=count - start, offset=start * 4)
+            self.assignments = np.concatenate([self.assignments, new_assignments])
+            self.vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(count, self.dims))
+        self.rows_bytes = state["rows_bytes"]
+        self.content_bytes = state["content_bytes"]
+
+        self.alive = np.ones(count, dtype=bool)
+        self.alive[state["deleted"]] = False
+        if state["nlist"] and self.centroids is None:
+            self.centroids = np.fromfile(self._path("centroids.f32"), dtype=np.float32).reshape(state["nlist"], self.dims)
+            start = 0
+        if self.centroids is not None and count > start:
+            tail = self.assignments[start:]
+            order = np.argsort(tail, kind="stable").astype(np.int64)
+            bounds = np.searchsorted(tail[order], np.arange(len(self.centroids) + 1))
+            added = [start + order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+            self.lists = added if not self.lists else [
+                np.concatenate([old, new]) if len(new) else old for old, new in zip(self.lists, added)
+            ]
+
+    def _content(self, i: int, offsets: np.ndarray, content_bytes: int, content_file) -> str:
+        start = int(offsets[i])
+        end = int(offsets[i + 1]) if i + 1 < len(offsets) else content_bytes
+        return json.loads(os.pread(content_file.fileno(), end - start, start))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return int(self.alive.sum())
+
+    def search(self, query: np.ndarray, top_k: int, threshold: float, nprobe: int = IVF_NPROBE) -> List[tuple[Dict[str, Any], float]]:
+        with self._lock:
+            self._load()
+            rows, vectors, alive, centroids, lists = self.rows, self.vectors, self.alive, self.centroids, self.lists
+            offsets, content_bytes, content_file = self.content_offsets, self.content_bytes, self._content_file
+        if vectors is None:
+            return []
+
+        query = normalize_rows(query[None, :])[0]
+        if centroids is None:
+            candidates = np.flatnonzero(alive)
+            scores = np.asarray(vectors[candidates] @ query) if len(candidates) < len(alive) else np.asarray(vectors @ query)
+        else:
+            probes = np.argpartition(-(centroids @ query), min(nprobe, len(centroids) - 1))[:nprobe]
+            candidates = np.sort(np.concatenate([lists[p] for p in probes]))
+            candidates = candidates[alive[candidates]]
+            scores = np.asarray(vectors[candidates] @ query)
+
+        keep = scores >= threshold
+        candidates, scores = candidates[keep], scores[keep]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            candidates, scores = candidates[best], scores[best]
+        order = np.argsort(-scores)
+        # Content is only read for the hits, from the file generation the snapshot belongs to
+        return [
+            ({**rows[candidates[i]], "content": self._content(candidates[i], offsets, content_bytes, content_file)},
+             float(scores[i]))
+            for i in order
+        ]
+
+    def add(self, rows: List[Dict[str, Any]], vectors: np.ndarray, replace_sources: Optional[List[str]] = None) -> None:
+        """Append rows, first tombstoning existing rows of replace_sources."""
+        vectors = normalize_rows(vectors)
+        with self._writing():
+            if self.dims and len(vectors) and vectors.shape[1] != self.dims:
+                raise ValueError(f"Embedding has {vectors.shape[1]} dimensions, index has {self.dims}")
+            dims = self.dims or (vectors.shape[1] if len(vectors) else 0)
+
+            alive = self.alive.copy()
+            for source_id in replace_sources or []:
+                alive[self.by_source.get(source_id, [])] = False
+
+            count = len(self.rows)
+            live = int(alive.sum()) + len(rows)
+            retrain = live >= IVF_MIN_ROWS and (
+                not self.trained_rows or live >= self.trained_rows * IVF_RETRAIN_GROWTH
+            )
+            compact = live < (count + len(rows)) / 2
+            if retrain or compact:
+                self._rewrite(np.flatnonzero(alive), rows, vectors, dims)
+            else:
+                self._append(count, rows, vectors, alive, dims)
+
+    def replace(self, rows: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        """Swap the whole index for these rows."""
+        vectors = normalize_rows(vectors)
+        with self._writing():
+            self._rewrite(np.zeros(0, dtype=np.int64), rows, vectors, vectors.shape[1] if len(vectors) else self.dims)
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive access across threads and processes, with the latest state loaded."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self._path(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load(locked=True, force=True)
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _encode_rows(rows: List[Dict[str, Any]], content_start: int) -> tuple[bytes, bytes, np.ndarray]:
+        """(row metadata lines, content lines, content offsets) for new rows."""
+        metadata = b"".join(
+            json.dumps({key: value for key, value in row.items() if key != "content"}).encode() + b"\n"
+            for row in rows
+        )
+        contents = [json.dumps(row.get("content", "")).encode() + b"\n" for row in rows]
+        offsets = content_start + np.concatenate([[0], np.cumsum([len(c) for c in contents])[:-1]]).astype(np.int64)
+        return metadata, b"".join(contents), offsets[:len(rows)]
+
+    def _append(self, count: int, rows: List[Dict[str, Any]], vectors: np.ndarray, alive: np.ndarray, dims: int) -> None:
+        # Drop anything an interrupted writer left past the committed rows
+        for name, size in (
+            ("vectors.f32", count * dims * 4), ("lists.i32", count * 4), ("content.i64", count * 8),
+            ("rows.jsonl", self.rows_bytes), ("content.jsonl", self.content_bytes)
+        ):
+            with open(self._path(name), "ab") as f:
+                f.truncate(size)
+
+        metadata, contents, offsets = self._encode_rows(rows, self.content_bytes)
+        assignments = assign_ivf(vectors, self.centroids) if self.centroids is not None else np.zeros(len(vectors), dtype=np.int32)
+        with open(self._path("rows.jsonl"), "ab") as f:
+            f.write(metadata)
+        with open(self._path("content.jsonl"), "ab") as f:
+            f.write(contents)
+        with open(self._path("content.i64"), "ab") as f:
+            offsets.tofile(f)
+        with open(self._path("vectors.f32"), "ab") as f:
+            vectors.tofile(f)
+        with open(self._path("lists.i32"), "ab") as f:
+            assignments.tofile(f)
+        self._commit(
+            self.generation or 1, count + len(rows), dims, np.flatnonzero(~alive).tolist(), self.trained_rows,
+            len(self.centroids) if self.centroids is not None else 0,
+            self.rows_bytes + len(metadata), self.content_bytes + len(contents)
+        )
+
+    def _rewrite(self, keep: np.ndarray, rows: List[Dict[str, Any]], vectors: np.ndarray, dims: int, batch: int = 65536) -> None:
+        """Write the kept existing rows plus new ones as a new generation, streaming the old files."""
+        # New files go in beside the old ones and are swapped in before the commit
+        rows_bytes = content_bytes = 0
+        with open(self._path("vectors.f32.tmp"), "wb") as vector_file, \
+                open(self._path("rows.jsonl.tmp"), "wb") as row_file, \
+                open(self._path("content.jsonl.tmp"), "wb") as content_file, \
+                open(self._path("content.i64.tmp"), "wb") as offset_file:
+            for start in range(0, len(keep), batch):
+                kept = keep[start:start + batch]
+                np.asarray(self.vectors[kept]).tofile(vector_file)
+                old_rows = [
+                    {**self.rows[i], "content": self._content(i, self.content_offsets, self.content_bytes, self._content_file)}
+                    for i in kept
+                ]
+                metadata, contents, offsets = self._encode_rows(old_rows, content_bytes)
+                row_file.write(metadata)
+                content_file.write(contents)
+                offsets.tofile(offset_file)
+                rows_bytes, content_bytes = rows_bytes + len(metadata), content_bytes + len(contents)
+            vectors.astype(np.float32, copy=False).tofile(vector_file)
+            metadata, contents, offsets = self._encode_rows(rows, content_bytes)
+            row_file.write(metadata)
+            content_file.write(contents)
+            offsets.tofile(offset_file)
+            rows_bytes, content_bytes = rows_bytes + len(metadata), content_bytes + len(contents)
+
+        count = len(keep) + len(rows)
+        all_vectors = np.memmap(self._path("vectors.f32.tmp"), dtype=np.float32, mode="r", shape=(count, dims)) \
+            if count else np.zeros((0, dims), dtype=np.float32)
+        centroids = None
+        train = count >= IVF_MIN_ROWS
+        if train:
+            nlist = int(min(65536, max(16, 4 * np.sqrt(count))))
+            centroids = train_ivf(all_vectors, nlist)
+            assignments = assign_ivf(all_vectors, centroids)
+        else:
+            assignments = np.zeros(count, dtype=np.int32)
+        del all_vectors
+
+        with open(self._path("lists.i32.tmp"), "wb") as f:
+            assignments.tofile(f)
+        if centroids is not None:
+            with open(self._path("centroids.f32.tmp"), "wb") as f:
+                centroids.tofile(f)
+            os.replace(self._path("centroids.f32.tmp"), self._path("centroids.f32"))
+        for name in ("vectors.f32", "lists.i32", "rows.jsonl", "content.jsonl", "content.i64"):
+            os.replace(self._path(f"{name}.tmp"), self._path(name))
+        self._commit(
+            (self.generation or 0) + 1, count, dims, [], count if train else 0,
+            len(centroids) if centroids is not None else 0, rows_bytes, content_bytes
+        )
+
+    def _commit(
+        self,
+        generation: int,
+        count: int,
+        dims: int,
+        deleted: List[int],
+        trained_rows: int,
+        nlist: int,
+        rows_bytes: int,
+        content_bytes: int
+    ) -> None:
+        with open(self._path("state.json.tmp"), "w") as f:
+            json.dump({
+                "generation": generation, "rows": count, "dims": dims, "deleted": deleted,
+                "trained_rows": trained_rows, "nlist": nlist, "rows_bytes": rows_bytes, "content_bytes": content_bytes
+            }, f)
+        os.replace(self._path("state.json.tmp"), self._path("state.json"))
+
+
+class VectorIndex:
+    """Per-matter local indexes, keeping the most recently used ones open."""
+
+    def __init__(self, directory: str, max_open: int):
+        self.directory = directory
+        self.max_open = max_open
+        self._open: "OrderedDict[str, MatterVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matter(self, matter_id: str) -> MatterVectorIndex:
+        if not _INDEX_NAME_RE.match(matter_id):
+            raise ValueError(f"Invalid matter id for the vector index: {matter_id!r}")
+        with self._lock:
+            index = self._open.get(matter_id)
+            if index is None:
+                index = self._open[matter_id] = MatterVectorIndex(os.path.join(self.directory, matter_id))
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+            self._open.move_to_end(matter_id)
+            return index
+
+    def has_matter(self, matter_id: str) -> bool:
+        return bool(_INDEX_NAME_RE.match(matter_id)) and os.path.exists(
+            os.path.join(self.directory, matter_id, "state.json")
+        )
+
+    def search(
+        self,
+        matter_id: str,
+        query_embedding: List[float],
+        top_k: int,
+        threshold: float
+    ) -> Optional[List[ContextChunk]]:
+        """Top chunks for a matter, or None when it has no local index yet."""
+        if not self.has_matter(matter_id):
+            return None
+        hits = self.matter(matter_id).search(np.asarray(query_embedding, dtype=np.float32), top_k, threshold)
+        return [
+            ContextChunk(
+                source_id=row["source_id"],
+                source_name=row.get("source_name") or "",
+                content=row["content"],
+                similarity=score,
+                metadata={
+                    **row.get("metadata", {}),
+                    **{key: row[key] for key in ("chunk_id", "chunk_index") if row.get(key) is not None}
+                }
+            )
+            for row, score in hits
+        ]
+
+    def add_chunks(
+        self,
+        matter_id: str,
+        chunks: List[Dict[str, Any]],
+        replace_sources: Optional[List[str]] = None,
+        rebuild: bool = False
+    ) -> None:
+        """Index chunk rows carrying an "embedding".
+
+        replace_sources drops those sources' existing rows first; rebuild
+        drops every existing row.
+        """
+        rows = [{key: value for key, value in chunk.items() if key != "embedding"} for chunk in chunks]
+        vectors = np.asarray([parse_embedding(chunk["embedding"]) for chunk in chunks], dtype=np.float32)
+        if not chunks:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        if rebuild:
+            self.matter(matter_id).replace(rows, vectors)
+        else:
+            self.matter(matter_id).add(rows, vectors, replace_sources)
+
+
+vector_index = VectorIndex(VECTOR_INDEX_DIR, VECTOR_INDEX_OPEN_MATTERS)
+
+
+def parse_embedding(value: Any) -> List[float]:
+    """pgvector columns arrive from PostgREST as "[0.1,0.2,...]" strings"""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def load_matter_chunks(
+    supabase: Client,
+    matter_id: str,
+    source_id: Optional[str] = None,
+    page_size: int = 1000
+) -> List[Dict[str, Any]]:
+    """A matter's chunk rows from CHUNK_TABLE (optionally one source's), in index-ready form."""
+    chunks = []
+    offset = 0
+    while True:
+        query = supabase.table(CHUNK_TABLE).select(
+            "id, source_id, source_name, chunk_index, content, embedding"
+        ).eq("matter_id", matter_id)
+        if source_id:
+            query = query.eq("source_id", source_id)
+        result = query.order("id").range(offset, offset + page_size - 1).execute()
+        for row in result.data or []:
+            if row.get("embedding") is None:
+                continue
+            chunks.append({
+                "chunk_id": row["id"],
+                "source_id": row["source_id"],
+                "source_name": row.get("source_name") or "",
+                "chunk_index": row.get("chunk_index"),
+                "content": row["content"],
+                "embedding": row["embedding"],
+            })
+        if len(result.data or []) < page_size:
+            return chunks
+        offset += page_size
+
 # ============================================
 # VECTOR SEARCH
 # ============================================
 
+async def embed_query(openai_client: AsyncOpenAI, query: str) -> List[float]:
+    """Embed a single query with the retrieval embedding model"""
+    embeddings = await embed_texts(openai_client, [query], LLMModel.EMBEDDING_3_SMALL.value)
+    return embeddings[0]
+
+
 async def retrieve_context(
     supabase: Client,
     openai_client: AsyncOpenAI,
     query: str,
     matter_id: str,
     top_k: int = 5,
-    threshold: float = 0.7
+    threshold: float = 0.7,
+    query_embedding: Optional[List[float]] = None
 ) -> List[ContextChunk]:
     """Retrieve relevant context chunks via vector search"""
 
-    # Generate query embedding
-    embedding_response = await openai_client.embeddings.create(
-        input=query,
-        model=LLMModel.EMBEDDING_3_SMALL.value
-    )
-    query_embedding = embedding_response.data[0].embedding
+    # Generate query embedding unless the caller already has one
+    if query_embedding is None:
+        query_embedding = await embed_query(openai_client, query)
+
+    if RETRIEVAL_BACKEND == "local":
+        with trace_span("vector search", backend="local", matter_id=matter_id, top_k=top_k, threshold=threshold) as span:
+            local = await asyncio.to_thread(vector_index.search, matter_id, query_embedding, top_k, threshold)
+            if local is not None:
+                span.attributes["matches"] = len(local)
+                return local
 
     # Vector search via Supabase RPC
-    result = supabase.rpc(
-        "match_vectors",
-        {
-            "query_embedding": query_embedding,
-            "match_threshold": threshold,
-            "match_count": top_k,
-            "p_matter_id": matter_id
-        }
-    ).execute()
+    with trace_span("vector search", matter_id=matter_id, top_k=top_k, threshold=threshold) as span:
+        result = await asyncio.to_thread(supabase.rpc(
+            "match_vectors",
+            {
+                "query_embedding": query_embedding,
+                "match_threshold": threshold,
+                "match_count": top_k,
+                "p_matter_id": matter_id
+            }
+        ).execute)
+        span.attributes["matches"] = len(result.data or [])
 
     chunks = []
     for row in result.data or []:
@@ -278,15 +1330,239 @@ async def retrieve_context(
             source_name=row["source_name"],
             content=row["content"],
             similarity=row["similarity"],
-            metadata=row.get("metadata", {})
+            metadata={**(row.get("metadata") or {}), **({"chunk_index": row["chunk_index"]} if "chunk_index" in row else {})}
         ))
 
     return chunks
 
+# ============================================
+# HYBRID RETRIEVAL
+# ============================================
+
+# Hybrid mode runs a full-text query over CHUNK_TABLE alongside the vector
+# search and fuses the two rankings with reciprocal rank fusion, so exact
+# terms (case numbers, clause references, party names) surface even when
+# their embeddings are not close to the query. The full-text stage asks
+# Postgres for chunks matching every term first, widens to any term if that
+# comes up short, then ranks candidates with BM25 computed over the
+# candidate set. Fused chunks carry a 0-1 relevance in `similarity`; the
+# vector cosine, where there is one, moves to metadata. MMR, when requested,
+# trades relevance against word overlap with chunks already picked.
+#
+# The full-text stage needs source_id/source_name on CHUNK_TABLE and a GIN
+# index on to_tsvector(LEXICAL_SEARCH_CONFIG, content) (see
+# supabase/migrations). If it fails, hybrid requests return the vector
+# results alone and say so in their retrieval stats.
+DEFAULT_RETRIEVAL_MODE = RetrievalMode(os.getenv("DEFAULT_RETRIEVAL_MODE", "vector"))
+LEXICAL_SEARCH_CONFIG = os.getenv("LEXICAL_SEARCH_CONFIG", "english")
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4"))
+RRF_K = 60
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def query_terms(text: str) -> List[str]:
+    return _TERM_RE.findall(text.lower())
+
+
+def bm25_scores(terms: List[str], documents: List[str]) -> List[float]:
+    """BM25 of each document for the query terms, with statistics from these documents."""
+    tokenized = [query_terms(document) for document in documents]
+    if not tokenized:
+        return []
+    average_length = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1
+    unique_terms = set(terms)
+    frequencies: List[Dict[str, int]] = []
+    document_frequency: Dict[str, int] = {}
+    for tokens in tokenized:
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            if token in unique_terms:
+                counts[token] = counts.get(token, 0) + 1
+        for term in counts:
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+        frequencies.append(counts)
+    idf = {
+        term: np.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+        for term, df in document_frequency.items()
+    }
+
+    scores = []
+    for tokens, counts in zip(tokenized, frequencies):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / average_length)
+        scores.append(float(sum(
+            idf[term] * count * (BM25_K1 + 1) / (count + norm) for term, count in counts.items()
+        )))
+    return scores
+
+
+def lexical_search(supabase: Client, query: str, matter_id: str, limit: int) -> List[ContextChunk]:
+    """Full-text candidates for the query from CHUNK_TABLE, best BM25 first."""
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    def fetch(search: str, search_type: Optional[str]) -> List[Dict[str, Any]]:
+        options = {"config": LEXICAL_SEARCH_CONFIG, **({"type": search_type} if search_type else {})}
+        return supabase.table(CHUNK_TABLE).select("id, source_id, source_name, chunk_index, content").eq(
+            "matter_id", matter_id
+        ).text_search("content", search, options).limit(limit).execute().data or []
+
+    # Every term first; any term if that is too narrow
+    rows = fetch(query, "web_search")
+    if len(rows) < limit and len(set(terms)) > 1:
+        seen = {row["id"] for row in rows}
+        rows += [row for row in fetch(" | ".join(dict.fromkeys(terms)), None) if row["id"] not in seen]
+
+    scores = bm25_scores(terms, [row["content"] for row in rows])
+    ranked = sorted(zip(rows, scores), key=lambda pair: pair[1], reverse=True)[:limit]
+    return [
+        ContextChunk(
+            source_id=row["source_id"],
+            source_name=row.get("source_name") or "",
+            content=row["content"],
+            similarity=0.0,
+            metadata={
+                "chunk_id": row["id"],
+                "bm25": round(score, 4),
+                **({"chunk_index": row["chunk_index"]} if row.get("chunk_index") is not None else {})
+            }
+        )
+        for row, score in ranked
+    ]
+
+
+def reciprocal_rank_fusion(vector_hits: List[ContextChunk], lexical_hits: List[ContextChunk]) -> List[ContextChunk]:
+    """Fuse both rankings; similarity becomes the fused score scaled so 1.0 is first in both."""
+    fused: Dict[tuple, Dict[str, Any]] = {}
+    for stage, hits in (("vector", vector_hits), ("lexical", lexical_hits)):
+        for rank, chunk in enumerate(hits, start=1):
+            entry = fused.setdefault((chunk.source_id, chunk.content), {"chunk": chunk, "score": 0.0, "ranks": {}})
+            entry["score"] += 1 / (RRF_K + rank)
+            entry["ranks"][f"{stage}_rank"] = rank
+
+    best = 2 / (RRF_K + 1)
+    chunks = []
+    for entry in sorted(fused.values(), key=lambda e: e["score"], reverse=True):
+        chunk = entry["chunk"]
+        metadata = {**chunk.metadata, **entry["ranks"]}
+        if "vector_rank" in entry["ranks"]:
+            metadata["vector_similarity"] = vector_hits[entry["ranks"]["vector_rank"] - 1].similarity
+        chunks.append(chunk.model_copy(update={"similarity": round(entry["score"] / best, 4), "metadata": metadata}))
+    return chunks
+
+
+def mmr_select(chunks: List[ContextChunk], top_k: int) -> List[ContextChunk]:
+    """Maximal marginal relevance over similarity, with word-set Jaccard as redundancy."""
+    words = [set(query_terms(chunk.content)) for chunk in chunks]
+    remaining = list(range(len(chunks)))
+    selected: List[int] = []
+    while remaining and len(selected) < top_k:
+        def marginal(i: int) -> float:
+            redundancy = max(
+                (len(words[i] & words[j]) / (len(words[i] | words[j]) or 1) for j in selected),
+                default=0.0
+            )
+            return MMR_LAMBDA * chunks[i].similarity - (1 - MMR_LAMBDA) * redundancy
+        best = max(remaining, key=marginal)
+        selected.append(best)
+        remaining.remove(best)
+    return [chunks[i] for i in selected]
+
+
+@contextmanager
+def retrieval_stage(stats: Dict[str, Any], stage: str):
+    """Time one retrieval stage into stats["timings_ms"] and the stage histogram."""
+    start = time.perf_counter()
+    try:
+        with trace_span(f"retrieval {stage}"):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        RETRIEVAL_LATENCY.labels(stage).observe(elapsed)
+        stats["timings_ms"][stage] = round(elapsed * 1000, 2)
+
+
+async def search_context(
+    supabase: Client,
+    openai_client: AsyncOpenAI,
+    query: str,
+    matter_id: str,
+    top_k: int,
+    threshold: float,
+    mode: RetrievalMode,
+    mmr: bool = False,
+    query_embedding: Optional[List[float]] = None
+) -> tuple[List[ContextChunk], Dict[str, Any]]:
+    """Retrieve context in the given mode; returns (chunks, stats with per-stage timings)."""
+    stats: Dict[str, Any] = {"mode": mode.value, "mmr": mmr, "timings_ms": {}}
+    pool = top_k * HYBRID_CANDIDATE_FACTOR if mode == RetrievalMode.HYBRID or mmr else top_k
+
+    async def vector_stage() -> List[ContextChunk]:
+        with retrieval_stage(stats, "vector"):
+            return await retrieve_context(
+                supabase, openai_client, query, matter_id, pool, threshold, query_embedding=query_embedding
+            )
+
+    async def lexical_stage() -> Optional[List[ContextChunk]]:
+        """Full-text hits, or None if the stage failed (e.g. the chunk table lacks its columns)."""
+        with retrieval_stage(stats, "lexical"):
+            try:
+                return await asyncio.to_thread(lexical_search, supabase, query, matter_id, pool)
+            except Exception as e:
+                logger.warning(f"Lexical retrieval failed, using vector results only: {e}")
+                stats["lexical_error"] = getattr(e, "code", None) or type(e).__name__
+                return None
+
+    with retrieval_stage(stats, "total"):
+        if mode == RetrievalMode.HYBRID:
+            vector_hits, lexical_hits = await asyncio.gather(vector_stage(), lexical_stage())
+            stats["vector_hits"] = len(vector_hits)
+            if lexical_hits is None:
+                stats["fallback"] = RetrievalMode.VECTOR.value
+                chunks = vector_hits
+            else:
+                stats["lexical_hits"] = len(lexical_hits)
+                with retrieval_stage(stats, "fusion"):
+                    chunks = reciprocal_rank_fusion(vector_hits, lexical_hits)
+        else:
+            chunks = await vector_stage()
+            stats["vector_hits"] = len(chunks)
+
+        if mmr:
+            with retrieval_stage(stats, "mmr"):
+                chunks = mmr_select(chunks, top_k)
+        chunks = chunks[:top_k]
+
+    return chunks, stats
+
 # ============================================
 # AI CALL LOGGING
 # ============================================
 
+@contextmanager
+def llm_call_metrics(model: str, task_type: str):
+    """Time and trace an upstream LLM call, counting it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        with trace_span(f"llm {task_type}", model=model):
+            yield
+    except Exception:
+        LLM_ERRORS.labels(model, task_type).inc()
+        raise
+    finally:
+        LLM_LATENCY.labels(model, task_type).observe(time.perf_counter() - started)
+
+
+def record_llm_tokens(model: str, input_tokens: int, output_tokens: int = 0) -> None:
+    LLM_TOKENS.labels(model, "input").inc(input_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(model, "output").inc(output_tokens)
+
+
 async def log_ai_call(
     supabase: Client,
     org_id: str,
@@ -306,6 +1582,11 @@ async def log_ai_call(
     Returns True if logging succeeded, False otherwise.
     Errors are logged but do not interrupt the main flow.
     """
+    LLM_LATENCY.labels(model, task_type).observe(latency_ms / 1000)
+    record_llm_tokens(model, input_tokens, output_tokens)
+    if error:
+        LLM_ERRORS.labels(model, task_type).inc()
+
     call_data = {
         "org_id": org_id,
         "user_id": user_id,
@@ -341,6 +1622,1121 @@ async def log_ai_call(
         )
         return False
 
+# ============================================
+# COMPLETION CACHE
+# ============================================
+
+# Two tiers in front of /complete and /rag. The exact tier keys on a hash of
+# the model, messages and sampling params. The semantic tier embeds the
+# prompt and reuses an answer whose prompt is at least
+# SEMANTIC_CACHE_THRESHOLD similar and whose other inputs are identical.
+# Entries are scoped to (org, matter). For a matter they also carry the
+# matter's source version (row count and latest updated_at), so adding,
+# editing or removing a source invalidates them on the next lookup; the
+# version is itself reused for SOURCE_VERSION_TTL_SECONDS so exact hits do
+# not each cost a query. Only near-deterministic requests are cached:
+# anything sampled above COMPLETION_CACHE_MAX_TEMPERATURE, or sent with
+# cache=false, bypasses both tiers.
+COMPLETION_CACHE_TTL_SECONDS = float(os.getenv("COMPLETION_CACHE_TTL_SECONDS", "3600"))
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "2000"))
+COMPLETION_CACHE_MAX_TEMPERATURE = float(os.getenv("COMPLETION_CACHE_MAX_TEMPERATURE", "0.2"))
+SOURCE_VERSION_TTL_SECONDS = float(os.getenv("SOURCE_VERSION_TTL_SECONDS", "5"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true") == "true"
+
+
+def cache_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CompletionCache:
+    """Thread-safe TTL/LRU cache of completion responses with a similarity index per variant."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # exact key -> (expires_at, scope, variant, source_version, response)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # (scope, variant) -> {exact key: unit prompt embedding}
+        self._vectors: Dict[tuple, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _usable(self, key: str, source_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, scope, variant, entry_version, response = entry
+        if expires_at < time.monotonic() or entry_version != source_version:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _drop(self, key: str) -> None:
+        _, scope, variant, _, _ = self._entries.pop(key)
+        vectors = self._vectors.get((scope, variant))
+        if vectors is not None:
+            vectors.pop(key, None)
+            if not vectors:
+                del self._vectors[(scope, variant)]
+
+    def get(self, key: str, source_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._usable(key, source_version)
+
+    def get_similar(
+        self,
+        scope: tuple,
+        variant: str,
+        vector: np.ndarray,
+        threshold: float,
+        source_version: Optional[str]
+    ) -> Optional[tuple[Dict[str, Any], float]]:
+        """Best cached response for a prompt embedding, with its similarity."""
+        with self._lock:
+            vectors = self._vectors.get((scope, variant))
+            if not vectors:
+                return None
+            keys = list(vectors)
+            similarities = np.stack([vectors[k] for k in keys]) @ vector
+            for i in np.argsort(-similarities):
+                if similarities[i] < threshold:
+                    return None
+                response = self._usable(keys[i], source_version)
+                if response is not None:
+                    return response, float(similarities[i])
+            return None
+
+    def set(
+        self,
+        key: str,
+        scope: tuple,
+        variant: str,
+        vector: Optional[np.ndarray],
+        source_version: Optional[str],
+        response: Dict[str, Any]
+    ) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, scope, variant, source_version, response)
+            if vector is not None:
+                self._vectors.setdefault((scope, variant), {})[key] = vector
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, org_id: str, matter_id: Optional[str] = None) -> int:
+        """Drop an org's entries, or only one matter's; returns how many were dropped."""
+        with self._lock:
+            keys = [
+                key for key, (_, scope, _, _, _) in self._entries.items()
+                if scope[0] == org_id and (matter_id is None or scope[1] == matter_id)
+            ]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+
+completion_cache = CompletionCache(COMPLETION_CACHE_TTL_SECONDS, COMPLETION_CACHE_MAX_ENTRIES)
+
+
+def cache_eligible(enabled: bool, temperature: float) -> bool:
+    return enabled and COMPLETION_CACHE_TTL_SECONDS > 0 and temperature <= COMPLETION_CACHE_MAX_TEMPERATURE
+
+
+def unit_vector(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# matter_id -> (expires_at, version)
+_source_versions: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+_source_versions_lock = threading.Lock()
+
+
+def matter_source_version(supabase: Client, matter_id: Optional[str]) -> Optional[str]:
+    """Version token for a matter's sources; changes on any insert, update or delete."""
+    if not matter_id:
+        return None
+    with _source_versions_lock:
+        cached = _source_versions.get(matter_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+    result = supabase.table("matter_sources").select("updated_at", count="exact").eq(
+        "matter_id", matter_id
+    ).order("updated_at", desc=True).limit(1).execute()
+    latest = result.data[0]["updated_at"] if result.data else None
+    version = f"{result.count}:{latest}"
+
+    with _source_versions_lock:
+        _source_versions[matter_id] = (time.monotonic() + SOURCE_VERSION_TTL_SECONDS, version)
+        _source_versions.move_to_end(matter_id)
+        while len(_source_versions) > COMPLETION_CACHE_MAX_ENTRIES:
+            _source_versions.popitem(last=False)
+    return version
+
+
+def forget_source_version(matter_id: Optional[str] = None) -> None:
+    """Re-read a matter's source version (every matter's if None) on the next lookup."""
+    with _source_versions_lock:
+        if matter_id is None:
+            _source_versions.clear()
+        else:
+            _source_versions.pop(matter_id, None)
+
+
+def replay_cached_stream(response: Dict[str, Any], sources: Optional[List[Dict]] = None):
+    """Server-sent events for a cached answer, shaped like a live stream."""
+    async def stream() -> AsyncGenerator[str, None]:
+        if sources is not None:
+            yield f"data: {json.dumps({'sources': sources})}\n\n"
+        yield f"data: {json.dumps({'content': response['content'], 'cached': response['cached']})}\n\n"
+        yield f"data: {json.dumps({'done': True})}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+async def lookup_completion(
+    cache_name: str,
+    scope: tuple,
+    exact_key: str,
+    variant: str,
+    source_version: Optional[str],
+    embed: Callable[[], Awaitable[List[float]]]
+) -> tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+    """
+    Check the exact tier, then the semantic tier.
+
+    Returns the cached response (tagged with the tier that served it) and the
+    prompt's unit embedding when one was computed, so misses can store it.
+    """
+    cached = completion_cache.get(exact_key, source_version)
+    if cached is not None:
+        CACHE_LOOKUPS.labels(cache_name, "exact").inc()
+        return {**cached, "cached": "exact"}, None
+
+    vector = None
+    if SEMANTIC_CACHE_ENABLED:
+        vector = unit_vector(await embed())
+        similar = completion_cache.get_similar(scope, variant, vector, SEMANTIC_CACHE_THRESHOLD, source_version)
+        if similar is not None:
+            CACHE_LOOKUPS.labels(cache_name, "semantic").inc()
+            return {**similar[0], "cached": "semantic", "similarity": round(similar[1], 4)}, vector
+
+    CACHE_LOOKUPS.labels(cache_name, "miss").inc()
+    return None, vector
+
+# ============================================
+# TEXT EXTRACTION
+# ============================================
+
+# Sources uploaded to storage (matter_sources.storage_path in
+# SOURCE_STORAGE_BUCKET) have their text extracted in a process pool, so
+# parsing never holds up the event loop or a request worker. The file type
+# is detected from the bytes. PDFs are split into EXTRACTION_PAGES_PER_TASK
+# page ranges that run in parallel. Pages are joined with form feeds, so a
+# page's offset in extracted_text is the position after its preceding "\f".
+# extracted_text is written once the whole document is done, so an
+# interrupted run never leaves partial text that looks complete.
+SOURCE_STORAGE_BUCKET = os.getenv("SOURCE_STORAGE_BUCKET", "documents")
+# sched_getaffinity respects CPU pinning but only exists on Linux
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or (
+    len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+)
+EXTRACTION_PAGES_PER_TASK = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "25"))
+PAGE_SEPARATOR = "\f"
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+EMAIL_MIME = "message/rfc822"
+
+_EMAIL_HEADER_RE = re.compile(r"^(?:from|to|subject|date|received|message-id|return-path):", re.IGNORECASE | re.MULTILINE)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def sniff_mime_type(head: bytes, path: str) -> str:
+    """File type from the leading bytes: libmagic when available, else known signatures."""
+    if magic is not None:
+        try:
+            mime = magic.from_buffer(head, mime=True)
+        except Exception:
+            mime = None
+        if mime in (PDF_MIME, DOCX_MIME, EMAIL_MIME) or (mime or "").startswith("text/") and mime != "text/html":
+            return mime
+    if head.startswith(b"%PDF"):
+        return PDF_MIME
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                return DOCX_MIME if "word/document.xml" in archive.namelist() else "application/zip"
+        except zipfile.BadZipFile:
+            return "application/zip"
+    if _EMAIL_HEADER_RE.search(head[:4096].decode("latin-1")):
+        return EMAIL_MIME
+    return "text/plain"
+
+
+# Pool workers import this module by reference, so these stay top-level.
+# The parsers are imported inside them because only pool processes need them.
+
+def _pdf_page_count(path: str) -> int:
+    from PyPDF2 import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    from PyPDF2 import PdfReader
+    pages = PdfReader(path).pages
+    return [pages[i].extract_text() or "" for i in range(start, min(end, len(pages)))]
+
+
+def _extract_docx(path: str) -> List[str]:
+    import docx
+    document = docx.Document(path)
+    lines = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows:
+            lines.append(" | ".join(cell.text for cell in row.cells))
+    return ["\n".join(lines)]
+
+
+def _extract_email(path: str) -> List[str]:
+    with open(path, "rb") as f:
+        message = BytesParser(policy=email_policy.default).parse(f)
+    lines = [f"{name}: {message[name]}" for name in ("From", "To", "Cc", "Date", "Subject") if message[name]]
+    body = message.get_body(preferencelist=("plain", "html"))
+    if body is not None:
+        content = body.get_content()
+        if body.get_content_type() == "text/html":
+            content = _HTML_TAG_RE.sub(" ", content)
+        lines += ["", content]
+    attachments = [part.get_filename() for part in message.iter_attachments() if part.get_filename()]
+    if attachments:
+        lines += ["", "Attachments: " + ", ".join(attachments)]
+    return ["\n".join(lines)]
+
+
+def _extract_plain(path: str) -> List[str]:
+    with open(path, "rb") as f:
+        return [f.read().decode("utf-8", errors="replace")]
+
+
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+
+
+def extraction_pool() -> ProcessPoolExecutor:
+    """The shared extraction pool, started on first use."""
+    global _extraction_pool
+    if _extraction_pool is None:
+        # forkserver: workers start from a clean process rather than a fork of this threaded one
+        _extraction_pool = ProcessPoolExecutor(EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _extraction_pool
+
+
+async def extract_file_pages(path: str) -> tuple[str, List[str]]:
+    """(mime type, text per page) for a local file, parsed in the extraction pool."""
+    global _extraction_pool
+    try:
+        return await _extract_file_pages(path)
+    except BrokenProcessPool:
+        # A worker died (out of memory on a hostile file, say); start a fresh pool next time
+        _extraction_pool = None
+        raise
+
+
+async def _extract_file_pages(path: str) -> tuple[str, List[str]]:
+    with open(path, "rb") as f:
+        head = f.read(8192)
+    mime = sniff_mime_type(head, path)
+    loop = asyncio.get_running_loop()
+    pool = extraction_pool()
+
+    if mime == PDF_MIME:
+        page_count = await loop.run_in_executor(pool, _pdf_page_count, path)
+        ranges = await asyncio.gather(*(
+            loop.run_in_executor(pool, _extract_pdf_pages, path, start, start + EXTRACTION_PAGES_PER_TASK)
+            for start in range(0, page_count, EXTRACTION_PAGES_PER_TASK)
+        ))
+        return mime, [page for pages in ranges for page in pages]
+    extractor = {DOCX_MIME: _extract_docx, EMAIL_MIME: _extract_email}.get(mime)
+    if extractor is None and not mime.startswith("text/"):
+        raise ValueError(f"Unsupported file type: {mime}")
+    return mime, await loop.run_in_executor(pool, extractor or _extract_plain, path)
+
+
+async def extract_source_text(supabase: Client, source: Dict[str, Any]) -> str:
+    """Download a source's stored file, extract its text and save it to extracted_text."""
+    storage_path = source.get("storage_path")
+    if not storage_path:
+        return ""
+    with trace_span("extract", source_id=source["id"]) as span:
+        data = await asyncio.to_thread(supabase.storage.from_(SOURCE_STORAGE_BUCKET).download, storage_path)
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(storage_path)[1]) as f:
+            f.write(data)
+            f.flush()
+            mime, pages = await extract_file_pages(f.name)
+        text = PAGE_SEPARATOR.join(pages)
+        span.attributes.update({"mime_type": mime, "pages": len(pages), "bytes": len(data)})
+
+    EXTRACTED_PAGES.labels(mime).inc(len(pages))
+    await asyncio.to_thread(
+        lambda: supabase.table("matter_sources").update({"extracted_text": text}).eq("id", source["id"]).execute()
+    )
+    return text
+
+# ============================================
+# INGESTION
+# ============================================
+
+# Turns matter_sources.extracted_text into CHUNK_TABLE rows:
+#   (matter_id, source_id, source_name, chunk_index, content, content_hash,
+#    token_count, embedding), unique on (source_id, chunk_index)
+# A job reads its sources one at a time, splits each into INGEST_CHUNK_TOKENS
+# windows overlapping by INGEST_CHUNK_OVERLAP, and skips chunks whose hash is
+# already stored at that index. A chunk whose text is stored at another
+# index (text inserted earlier in the document shifts every later chunk) is
+# rewritten at its new index with the stored embedding, so only new text is
+# embedded. The rest flow through two bounded queues: embedding workers take
+# provider-sized batches, and a single writer bulk-upserts them. A full queue blocks the stage before it, so a large job
+# holds at most a few batches in memory however many documents it covers.
+# Job progress is checkpointed to INGEST_JOB_TABLE after each source:
+#   (job_id, org_id, matter_id, status, state, lease_owner, lease_expires_at,
+#    updated_at), keyed on job_id
+# so any worker on any host can report it. The running worker holds a lease
+# it renews every INGEST_LEASE_SECONDS / 3. Every worker sweeps for
+# unfinished jobs whose lease has lapsed (their worker died or was
+# restarted) and resumes them, skipping sources already done. Both tables
+# and their indexes are created by supabase/migrations.
+INGEST_CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", "512"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "64"))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "256"))
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+INGEST_UPSERT_BATCH = int(os.getenv("INGEST_UPSERT_BATCH", "500"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "2048"))
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "2"))
+INGEST_JOB_TABLE = os.getenv("INGEST_JOB_TABLE", "ingest_jobs")
+INGEST_LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "120"))
+INGEST_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+INGEST_EMBEDDING_MODEL = LLMModel.EMBEDDING_3_SMALL.value
+INGEST_JOB_HISTORY = 200
+
+
+def chunk_text(text: str, chunk_tokens: int = INGEST_CHUNK_TOKENS, overlap: int = INGEST_CHUNK_OVERLAP):
+    """Yield (content, token_count) windows of chunk_tokens, each sharing overlap tokens with the last."""
+    step = max(1, chunk_tokens - overlap)
+    try:
+        encoding = tiktoken.encoding_for_model(INGEST_EMBEDDING_MODEL)
+    except Exception:
+        # Same rough 4 characters per token as count_tokens
+        for start in range(0, len(text), step * 4):
+            piece = text[start:start + chunk_tokens * 4]
+            if piece.strip():
+                yield piece, len(piece) // 4
+            if start + chunk_tokens * 4 >= len(text):
+                return
+        return
+    tokens = encoding.encode(text)
+    for start in range(0, len(tokens), step):
+        window = tokens[start:start + chunk_tokens]
+        piece = encoding.decode(window)
+        if piece.strip():
+            yield piece, len(window)
+        if start + chunk_tokens >= len(tokens):
+            return
+
+
+class IngestionJob:
+    """Progress of one ingestion job, mirrored to its INGEST_JOB_TABLE row."""
+
+    def __init__(self, job_id: str, org_id: str, matter_id: str, source_ids: List[str], force: bool = False):
+        self.job_id = job_id
+        self.org_id = org_id
+        self.matter_id = matter_id
+        self.source_ids = source_ids
+        self.force = force
+        self.status = "queued"
+        self.sources_done: List[str] = []
+        self.sources_failed: Dict[str, str] = {}
+        self.chunks_embedded = 0
+        self.chunks_skipped = 0
+        self.chunks_reused = 0
+        self.chunks_deleted = 0
+        self.created_at = datetime.utcnow().isoformat()
+        self.finished_at: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "org_id": self.org_id,
+            "matter_id": self.matter_id,
+            "source_ids": self.source_ids,
+            "force": self.force,
+            "status": self.status,
+            "sources_done": self.sources_done,
+            "sources_failed": self.sources_failed,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_skipped": self.chunks_skipped,
+            "chunks_reused": self.chunks_reused,
+            "chunks_deleted": self.chunks_deleted,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IngestionJob":
+        job = cls(data["job_id"], data["org_id"], data["matter_id"], data["source_ids"], data["force"])
+        for key in ("status", "sources_done", "sources_failed", "chunks_embedded", "chunks_skipped",
+                    "chunks_deleted", "created_at", "finished_at", "error"):
+            setattr(job, key, data[key])
+        # Jobs checkpointed before embeddings were reused across indexes
+        job.chunks_reused = data.get("chunks_reused", 0)
+        return job
+
+    @staticmethod
+    def _lease(seconds: float = INGEST_LEASE_SECONDS) -> str:
+        return (datetime.utcnow() + timedelta(seconds=seconds)).isoformat()
+
+    def create(self, supabase: Client) -> bool:
+        """Store a new job already leased to this worker; False if the insert fails."""
+        try:
+            supabase.table(INGEST_JOB_TABLE).insert({
+                "job_id": self.job_id,
+                "org_id": self.org_id,
+                "matter_id": self.matter_id,
+                "status": self.status,
+                "state": self.to_dict(),
+                "lease_owner": INGEST_WORKER_ID,
+                "lease_expires_at": self._lease(),
+                "updated_at": datetime.utcnow().isoformat()
+            }).execute()
+        except APIError as e:
+            logger.error(f"Could not store ingestion job {self.job_id}: {e}")
+            return False
+        return True
+
+    def claim(self, supabase: Client) -> bool:
+        """Take over the job if its lease has lapsed; False if a live worker holds it."""
+        result = supabase.table(INGEST_JOB_TABLE).update({
+            "lease_owner": INGEST_WORKER_ID,
+            "lease_expires_at": self._lease()
+        }).eq("job_id", self.job_id).lt("lease_expires_at", datetime.utcnow().isoformat()).execute()
+        return bool(result.data)
+
+    def checkpoint(self, supabase: Client) -> None:
+        """Save progress and renew the lease."""
+        result = supabase.table(INGEST_JOB_TABLE).update({
+            "status": self.status,
+            "state": self.to_dict(),
+            "lease_expires_at": self._lease(),
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("job_id", self.job_id).eq("lease_owner", INGEST_WORKER_ID).execute()
+        if not result.data:
+            logger.warning(f"Ingestion job {self.job_id} lease was taken over by another worker")
+
+    def release(self, supabase: Client) -> None:
+        """Give up the lease so an unfinished job can be resumed straight away."""
+        supabase.table(INGEST_JOB_TABLE).update({
+            "lease_expires_at": datetime.utcnow().isoformat()
+        }).eq("job_id", self.job_id).eq("lease_owner", INGEST_WORKER_ID).execute()
+
+
+class _SourceProgress:
+    """Chunks of one source still in flight through the pipeline."""
+
+    def __init__(self, source_id: str, total_chunks: int, pending: int):
+        self.source_id = source_id
+        self.total_chunks = total_chunks
+        self.changed = pending
+        self.pending = pending
+        self.error: Optional[str] = None
+
+
+def _existing_chunk_hashes(supabase: Client, source_id: str, page_size: int = 1000) -> Dict[int, str]:
+    hashes = {}
+    offset = 0
+    while True:
+        rows = supabase.table(CHUNK_TABLE).select("chunk_index, content_hash").eq("source_id", source_id).order(
+            "chunk_index"
+        ).range(offset, offset + page_size - 1).execute().data or []
+        hashes.update((row["chunk_index"], row["content_hash"]) for row in rows)
+        if len(rows) < page_size:
+            return hashes
+        offset += page_size
+
+
+def _stored_embeddings(
+    supabase: Client,
+    source_id: str,
+    content_hashes: List[str],
+    batch_size: int = 100
+) -> Dict[str, Any]:
+    """Stored embeddings of a source's chunks by content hash."""
+    embeddings = {}
+    for start in range(0, len(content_hashes), batch_size):
+        rows = supabase.table(CHUNK_TABLE).select("content_hash, embedding").eq("source_id", source_id).in_(
+            "content_hash", content_hashes[start:start + batch_size]
+        ).execute().data or []
+        embeddings.update((row["content_hash"], row["embedding"]) for row in rows if row.get("embedding") is not None)
+    return embeddings
+
+
+class IngestionPipeline:
+    """Runs ingestion jobs, at most INGEST_MAX_JOBS at a time per worker."""
+
+    def __init__(self):
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._tasks: set = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def get(self, supabase: Client, org_id: str, job_id: str) -> Optional[IngestionJob]:
+        """An org's job, from this worker or from INGEST_JOB_TABLE if another worker runs it."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job if job.org_id == org_id else None
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        result = supabase.table(INGEST_JOB_TABLE).select("state").eq("job_id", job_id).eq("org_id", org_id).limit(1).execute()
+        return IngestionJob.from_dict(result.data[0]["state"]) if result.data else None
+
+    async def submit(self, job: IngestionJob, supabase: Client, openai_client: AsyncOpenAI) -> bool:
+        """Store a new job and start it in the background; False if it could not be stored."""
+        if not await asyncio.to_thread(job.create, supabase):
+            return False
+        self._start(job, supabase, openai_client)
+        return True
+
+    def _start(self, job: IngestionJob, supabase: Client, openai_client: AsyncOpenAI) -> None:
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > INGEST_JOB_HISTORY:
+            self.jobs.popitem(last=False)
+        task = asyncio.create_task(self._run(job, supabase, openai_client))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def resume_unfinished(self, supabase: Client, openai_client: AsyncOpenAI) -> int:
+        """Pick up unfinished jobs whose lease has lapsed."""
+        result = await asyncio.to_thread(
+            supabase.table(INGEST_JOB_TABLE).select("state").in_("status", ["queued", "running"]).lt(
+                "lease_expires_at", datetime.utcnow().isoformat()
+            ).execute
+        )
+        resumed = 0
+        for row in result.data or []:
+            job = IngestionJob.from_dict(row["state"])
+            if job.job_id not in self.jobs and await asyncio.to_thread(job.claim, supabase):
+                self._start(job, supabase, openai_client)
+                resumed += 1
+        return resumed
+
+    async def sweep(self, supabase: Client, openai_client: AsyncOpenAI) -> None:
+        """Resume orphaned jobs every lease period, for as long as the worker runs."""
+        while True:
+            try:
+                resumed = await self.resume_unfinished(supabase, openai_client)
+                if resumed:
+                    logger.info(f"Resumed {resumed} ingestion job(s)")
+            except Exception as e:
+                logger.warning(f"Ingestion sweep failed: {e}")
+            await asyncio.sleep(INGEST_LEASE_SECONDS)
+
+    async def _heartbeat(self, job: IngestionJob, supabase: Client) -> None:
+        while True:
+            await asyncio.sleep(INGEST_LEASE_SECONDS / 3)
+            try:
+                await asyncio.to_thread(job.checkpoint, supabase)
+            except Exception as e:
+                logger.warning(f"Ingestion job {job.job_id} heartbeat failed: {e}")
+
+    async def _run(self, job: IngestionJob, supabase: Client, openai_client: AsyncOpenAI) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(INGEST_MAX_JOBS)
+        heartbeat = asyncio.create_task(self._heartbeat(job, supabase))
+        try:
+            async with self._slots:
+                job.status = "running"
+                await asyncio.to_thread(job.checkpoint, supabase)
+                with trace_span("ingest", job_id=job.job_id, matter_id=job.matter_id, sources=len(job.source_ids)):
+                    await self._pipeline(job, supabase, openai_client)
+                job.status = "completed" if not job.sources_failed else "completed_with_errors"
+        except asyncio.CancelledError:
+            # Shutting down: leave the job unfinished for another worker to resume
+            heartbeat.cancel()
+            await asyncio.to_thread(job.release, supabase)
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        heartbeat.cancel()
+        job.finished_at = datetime.utcnow().isoformat()
+        await asyncio.to_thread(job.checkpoint, supabase)
+        completion_cache.invalidate(job.org_id, job.matter_id)
+        forget_source_version(job.matter_id)
+
+    async def _pipeline(self, job: IngestionJob, supabase: Client, openai_client: AsyncOpenAI) -> None:
+        embed_queue: asyncio.Queue = asyncio.Queue(INGEST_QUEUE_SIZE)
+        upsert_queue: asyncio.Queue = asyncio.Queue(INGEST_QUEUE_SIZE)
+
+        async def finish_source(progress: _SourceProgress) -> None:
+            if progress.error is None:
+                try:
+                    await asyncio.to_thread(self._finish_source, job, supabase, progress)
+                except Exception as e:
+                    progress.error = str(e)
+            if progress.error is None:
+                job.sources_done.append(progress.source_id)
+                INGEST_SOURCES.labels("ingested").inc()
+            else:
+                job.sources_failed[progress.source_id] = progress.error
+                INGEST_SOURCES.labels("failed").inc()
+            await asyncio.to_thread(job.checkpoint, supabase)
+
+        async def read_sources() -> None:
+            done = set(job.sources_done)
+            remaining = iter([source_id for source_id in job.source_ids if source_id not in done])
+            # Sources are prepared EXTRACTION_WORKERS ahead so extraction keeps the pool busy
+            window: deque = deque()
+
+            def prepare_next() -> None:
+                source_id = next(remaining, None)
+                if source_id is not None:
+                    window.append((source_id, asyncio.create_task(self._prepare_source(job, supabase, source_id))))
+
+            for _ in range(EXTRACTION_WORKERS):
+                prepare_next()
+            while window:
+                source_id, task = window.popleft()
+                try:
+                    progress, rows = await task
+                except Exception as e:
+                    progress, rows = _SourceProgress(source_id, 0, 0), []
+                    progress.error = str(e)
+                prepare_next()
+                if not rows:
+                    await finish_source(progress)
+                for row in rows:
+                    # Rows planned with a stored embedding go straight to the writer
+                    if "embedding" in row:
+                        await upsert_queue.put((progress, row, True))
+                        continue
+                    await embed_queue.put((progress, row))
+                    INGEST_QUEUE_DEPTH.labels("embed").set(embed_queue.qsize())
+            for _ in range(INGEST_EMBED_CONCURRENCY):
+                await embed_queue.put(None)
+
+        async def embed_batches() -> None:
+            finished = False
+            while not finished:
+                batch = []
+                item = await embed_queue.get()
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= INGEST_EMBED_BATCH or embed_queue.empty():
+                        break
+                    item = embed_queue.get_nowait()
+                finished = item is None
+                INGEST_QUEUE_DEPTH.labels("embed").set(embed_queue.qsize())
+                if not batch:
+                    continue
+                try:
+                    embeddings = await embed_texts(openai_client, [row["content"] for _, row in batch], INGEST_EMBEDDING_MODEL)
+                except Exception as e:
+                    embeddings = [None] * len(batch)
+                    for progress, _ in batch:
+                        progress.error = progress.error or f"Embedding failed: {e}"
+                for (progress, row), embedding in zip(batch, embeddings):
+                    await upsert_queue.put((progress, {**row, "embedding": embedding}, False))
+                INGEST_QUEUE_DEPTH.labels("upsert").set(upsert_queue.qsize())
+
+        async def write_rows() -> None:
+            finished = False
+            while not finished:
+                batch = []
+                item = await upsert_queue.get()
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= INGEST_UPSERT_BATCH or upsert_queue.empty():
+                        break
+                    item = upsert_queue.get_nowait()
+                finished = item is None
+                INGEST_QUEUE_DEPTH.labels("upsert").set(upsert_queue.qsize())
+                rows = [row for progress, row, _ in batch if progress.error is None]
+                if rows:
+                    try:
+                        await asyncio.to_thread(
+                            lambda: supabase.table(CHUNK_TABLE).upsert(rows, on_conflict="source_id,chunk_index").execute()
+                        )
+                        embedded = sum(1 for progress, _, reused in batch if progress.error is None and not reused)
+                        job.chunks_embedded += embedded
+                        job.chunks_reused += len(rows) - embedded
+                        INGEST_CHUNKS.labels("embedded").inc(embedded)
+                        INGEST_CHUNKS.labels("reused").inc(len(rows) - embedded)
+                    except Exception as e:
+                        for progress, _, _ in batch:
+                            progress.error = progress.error or f"Upsert failed: {e}"
+                for progress, _, _ in batch:
+                    progress.pending -= 1
+                    if progress.pending == 0:
+                        await finish_source(progress)
+
+        async def embed_workers() -> None:
+            await asyncio.gather(*(embed_batches() for _ in range(INGEST_EMBED_CONCURRENCY)))
+            await upsert_queue.put(None)
+
+        await asyncio.gather(read_sources(), embed_workers(), write_rows())
+
+    async def _prepare_source(
+        self,
+        job: IngestionJob,
+        supabase: Client,
+        source_id: str
+    ) -> tuple[_SourceProgress, List[Dict[str, Any]]]:
+        """Load a source, extracting its stored file first if it has no text yet."""
+        result = await asyncio.to_thread(
+            lambda: supabase.table("matter_sources").select("*").eq("id", source_id).eq(
+                "matter_id", job.matter_id
+            ).limit(1).execute()
+        )
+        if not result.data:
+            raise ValueError("Source not found")
+        source = result.data[0]
+        text = source.get("extracted_text") or ""
+        if not text.strip():
+            text = await extract_source_text(supabase, source)
+        return await asyncio.to_thread(self._plan_source, job, supabase, source, text)
+
+    def _plan_source(
+        self,
+        job: IngestionJob,
+        supabase: Client,
+        source: Dict[str, Any],
+        text: str
+    ) -> tuple[_SourceProgress, List[Dict[str, Any]]]:
+        """
+        Chunk one source and return the rows whose content changed. Rows
+        whose text is stored at another index carry that stored embedding.
+        """
+        source_id = source["id"]
+        existing = {} if job.force else _existing_chunk_hashes(supabase, source_id)
+        stored_hashes = set(existing.values())
+        rows = []
+        moved = []
+        total = 0
+        for index, (content, token_count) in enumerate(chunk_text(text)):
+            total += 1
+            content_hash = hashlib.sha256(content.encode()).hexdigest()
+            if existing.get(index) == content_hash:
+                continue
+            if content_hash in stored_hashes:
+                moved.append(len(rows))
+            rows.append({
+                "matter_id": job.matter_id,
+                "source_id": source_id,
+                "source_name": source.get("source_name") or "",
+                "chunk_index": index,
+                "content": content,
+                "content_hash": content_hash,
+                "token_count": token_count,
+            })
+        if moved:
+            embeddings = _stored_embeddings(supabase, source_id, list({rows[i]["content_hash"] for i in moved}))
+            for i in moved:
+                embedding = embeddings.get(rows[i]["content_hash"])
+                if embedding is not None:
+                    rows[i]["embedding"] = embedding
+        job.chunks_skipped += total - len(rows)
+        INGEST_CHUNKS.labels("skipped").inc(total - len(rows))
+        return _SourceProgress(source_id, total, len(rows)), rows
+
+    def _finish_source(self, job: IngestionJob, supabase: Client, progress: _SourceProgress) -> None:
+        """Drop chunks past the source's new end and refresh its rows in the local index."""
+        deleted = supabase.table(CHUNK_TABLE).delete().eq("source_id", progress.source_id).gte(
+            "chunk_index", progress.total_chunks
+        ).execute()
+        job.chunks_deleted += len(deleted.data or [])
+        if (progress.changed or deleted.data) and vector_index.has_matter(job.matter_id):
+            chunks = load_matter_chunks(supabase, job.matter_id, source_id=progress.source_id)
+            vector_index.add_chunks(job.matter_id, chunks, replace_sources=[progress.source_id])
+
+
+ingestion_pipeline = IngestionPipeline()
+
+# ============================================
+# DOCUMENT ANALYSIS
+# ============================================
+
+# Documents that fit DOCUMENT_TOKEN_BUDGET are analysed in one call. Longer
+# ones go map-reduce: the text is split into ANALYZE_SECTION_TOKENS sections,
+# each section is condensed into notes for the requested analysis (at most
+# ANALYZE_MAP_CONCURRENCY calls at once), and the notes are reduced into the
+# usual comprehensive/risk/summary structure. If the notes themselves
+# outgrow the budget, they are condensed again in groups until they fit.
+# A section that fails is noted in the reduce prompt rather than failing
+# the whole analysis.
+ANALYZE_MODEL = LLMModel.GPT4_TURBO.value
+ANALYZE_MAP_MODEL = os.getenv("ANALYZE_MAP_MODEL", ANALYZE_MODEL)
+ANALYZE_SECTION_TOKENS = int(os.getenv("ANALYZE_SECTION_TOKENS", "6000"))
+ANALYZE_SECTION_OVERLAP = 200
+ANALYZE_MAP_CONCURRENCY = int(os.getenv("ANALYZE_MAP_CONCURRENCY", "8"))
+ANALYZE_MAP_MAX_TOKENS = 1024
+ANALYZE_MAX_TOKENS = 4096
+
+ANALYSIS_PROMPTS = {
+    "comprehensive": """Analyze this legal document comprehensively:
+1. Document Type & Purpose
+2. Key Parties & Their Roles
+3. Important Dates & Deadlines
+4. Key Obligations & Rights
+5. Potential Risks & Issues
+6. Recommended Actions
+
+Provide structured analysis with clear sections.""",
+
+    "risk": """Analyze this document for legal risks:
+1. Contractual Risks
+2. Compliance Risks
+3. Liability Exposure
+4. Ambiguous Terms
+5. Missing Protections
+6. Risk Mitigation Recommendations
+
+Rate overall risk level: Low/Medium/High/Critical""",
+
+    "summary": """Provide a comprehensive yet concise summary:
+1. One-paragraph executive summary
+2. Key facts (bullet points)
+3. Important dates
+4. Action items
+5. Notable concerns"""
+}
+
+# What the map step keeps from each section, per analysis type
+ANALYSIS_FOCUS = {
+    "comprehensive": "document type and purpose, parties and their roles, dates and deadlines, "
+                     "obligations and rights, risks and issues, and anything calling for action",
+    "risk": "contractual, compliance and liability risks, ambiguous terms and missing protections, "
+            "quoting clause numbers",
+    "summary": "key facts, important dates, action items and notable concerns",
+}
+
+
+# Results are cached in ANALYSIS_CACHE_TABLE under a key built from the org,
+# a hash of the document text, the focus actually analysed (unknown types
+# fall back to comprehensive and share its entries), ANALYSIS_VERSION and
+# the models and mode used. Re-analysing unchanged text then costs no LLM
+# calls. ANALYSIS_VERSION hashes the prompts and the budget and sectioning
+# settings, so changing any of them starts a fresh cache; bump
+# ANALYSIS_PROMPT_VERSION when the map/condense instructions in the code
+# below change.
+ANALYSIS_CACHE_TABLE = os.getenv("ANALYSIS_CACHE_TABLE", "analysis_cache")
+ANALYSIS_PROMPT_VERSION = "1"
+ANALYSIS_VERSION = ANALYSIS_PROMPT_VERSION + "-" + hashlib.sha256(json.dumps({
+    "prompts": ANALYSIS_PROMPTS,
+    "focus": ANALYSIS_FOCUS,
+    "system": SYSTEM_PROMPTS[TaskType.ANALYSIS],
+    "document_token_budget": DOCUMENT_TOKEN_BUDGET,
+    "section_tokens": ANALYZE_SECTION_TOKENS,
+    "section_overlap": ANALYZE_SECTION_OVERLAP,
+    "map_max_tokens": ANALYZE_MAP_MAX_TOKENS,
+    "max_tokens": ANALYZE_MAX_TOKENS,
+}, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def analysis_cache_key(org_id: str, content: str, focus: str, map_reduce: bool) -> str:
+    return cache_key(
+        org_id, hashlib.sha256(content.encode()).hexdigest(), focus, ANALYSIS_VERSION,
+        ANALYZE_MODEL, ANALYZE_MAP_MODEL if map_reduce else None, map_reduce
+    )
+
+
+def load_cached_analysis(supabase: Client, key: str) -> Optional[Dict[str, Any]]:
+    """A stored analysis result for key, or None (also when the cache table is unavailable)."""
+    try:
+        result = supabase.table(ANALYSIS_CACHE_TABLE).select("result").eq("cache_key", key).limit(1).execute()
+    except Exception as e:
+        logger.warning(f"Analysis cache lookup failed: {e}")
+        return None
+    return result.data[0]["result"] if result.data else None
+
+
+def store_cached_analysis(supabase: Client, key: str, org_id: str, source_id: str, result: Dict[str, Any]) -> None:
+    try:
+        supabase.table(ANALYSIS_CACHE_TABLE).upsert({
+            "cache_key": key,
+            "org_id": org_id,
+            "source_id": source_id,
+            "prompt_version": ANALYSIS_VERSION,
+            "result": result,
+            "created_at": datetime.utcnow().isoformat()
+        }, on_conflict="cache_key").execute()
+    except Exception as e:
+        logger.warning(f"Analysis cache store failed: {e}")
+
+
+def analysis_messages(prompt: str) -> List[Dict[str, str]]:
+    system_prompt, user_prompt = assemble_prompt(CompletionRequest(task_type=TaskType.ANALYSIS, prompt=prompt))
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+
+
+async def analysis_call(
+    openai_client: AsyncOpenAI,
+    model: str,
+    task_type: str,
+    prompt: str,
+    max_tokens: int,
+    usage: Dict[str, int]
+) -> str:
+    """One non-streamed analysis completion, adding its tokens to usage."""
+    with llm_call_metrics(model, task_type):
+        response = await openai_client.chat.completions.create(
+            model=model,
+            messages=analysis_messages(prompt),
+            temperature=0.3,
+            max_tokens=max_tokens
+        )
+    record_llm_tokens(model, response.usage.prompt_tokens, response.usage.completion_tokens)
+    usage["input_tokens"] += response.usage.prompt_tokens
+    usage["output_tokens"] += response.usage.completion_tokens
+    return response.choices[0].message.content
+
+
+def split_sections(content: str) -> List[str]:
+    return [section for section, _ in chunk_text(content, ANALYZE_SECTION_TOKENS, ANALYZE_SECTION_OVERLAP)]
+
+
+async def condense_notes(
+    openai_client: AsyncOpenAI,
+    notes: List[str],
+    analysis_type: str,
+    budget: int,
+    usage: Dict[str, int],
+    limit: asyncio.Semaphore
+) -> List[str]:
+    """Merge groups of notes until all of them fit in budget tokens."""
+    while len(notes) > 1 and count_tokens("\n\n".join(notes)) > budget:
+        groups: List[List[str]] = [[]]
+        group_tokens = 0
+        for note in notes:
+            tokens = count_tokens(note)
+            if groups[-1] and group_tokens + tokens > budget:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(note)
+            group_tokens += tokens
+        if len(groups) == len(notes):
+            # Every note fills a group on its own; condensing cannot shrink this further
+            break
+
+        async def condense(group: List[str]) -> str:
+            async with limit:
+                return await analysis_call(
+                    openai_client, ANALYZE_MAP_MODEL, "analysis_condense",
+                    f"Merge these consecutive notes on parts of one legal document into a single set of notes. "
+                    f"Keep every concrete fact about {ANALYSIS_FOCUS[analysis_type]}; drop repetition.\n\n"
+                    + "\n\n".join(group),
+                    ANALYZE_MAP_MAX_TOKENS, usage
+                )
+        notes = await asyncio.gather(*(condense(group) for group in groups))
+    return notes
+
+
+async def analysis_events(
+    openai_client: AsyncOpenAI,
+    content: str,
+    analysis_type: str,
+    map_reduce: bool,
+    stream: bool
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Run an analysis, yielding progress events; the last one has done=True and the result."""
+    prompt = ANALYSIS_PROMPTS[analysis_type]
+    usage = {"input_tokens": 0, "output_tokens": 0}
+    budget = min(DOCUMENT_TOKEN_BUDGET, available_tokens(ANALYZE_MODEL, ANALYZE_MAX_TOKENS, SYSTEM_PROMPTS[TaskType.ANALYSIS], prompt))
+    result: Dict[str, Any] = {"mode": "map_reduce" if map_reduce else "single", "truncated_tokens": 0}
+
+    if map_reduce:
+        sections = split_sections(content)
+        result.update({"sections": len(sections), "failed_sections": []})
+        yield {"sections": len(sections)}
+
+        limit = asyncio.Semaphore(ANALYZE_MAP_CONCURRENCY)
+        notes: List[Optional[str]] = [None] * len(sections)
+
+        async def map_section(index: int) -> tuple[int, Optional[str]]:
+            async with limit:
+                try:
+                    return index, await analysis_call(
+                        openai_client, ANALYZE_MAP_MODEL, "analysis_map",
+                        f"This is section {index + 1} of {len(sections)} of a legal document. Take concise notes "
+                        f"on {ANALYSIS_FOCUS[analysis_type]}. Quote names, dates, amounts and clause numbers "
+                        f"exactly. If the section has none of these, reply \"Nothing relevant\".\n\n"
+                        f"SECTION:\n{sections[index]}",
+                        ANALYZE_MAP_MAX_TOKENS, usage
+                    )
+                except Exception as e:
+                    logger.warning(f"Analysis of section {index + 1}/{len(sections)} failed: {e}")
+                    return index, None
+
+        tasks = [asyncio.create_task(map_section(index)) for index in range(len(sections))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, section_notes = await finished
+                notes[index] = section_notes
+                if section_notes is None:
+                    result["failed_sections"].append(index + 1)
+                yield {"section": index + 1, "notes": section_notes, "failed": section_notes is None}
+        finally:
+            # A disconnected stream stops the remaining sections
+            for task in tasks:
+                task.cancel()
+        if len(result["failed_sections"]) == len(sections):
+            raise HTTPException(status_code=502, detail="Analysis failed for every section")
+
+        labelled = [
+            f"[Section {index + 1}]\n{section_notes if section_notes is not None else '(could not be analyzed)'}"
+            for index, section_notes in enumerate(notes)
+        ]
+        labelled = await condense_notes(openai_client, labelled, analysis_type, budget, usage, limit)
+        prompt += (
+            f"\n\nThe document was too long to read at once, so it was split into {len(sections)} sections "
+            f"and notes were taken on each, in order. Base the analysis on these notes.\n\n"
+            f"SECTION NOTES:\n" + "\n\n".join(labelled)
+        )
+    else:
+        content, truncated_tokens = truncate_to_tokens(content, budget, ANALYZE_MODEL)
+        if truncated_tokens:
+            content += f"\n\n[Document truncated: {truncated_tokens} tokens omitted]"
+        result["truncated_tokens"] = truncated_tokens
+        prompt += f"\n\nDOCUMENT:\n{content}"
+
+    if stream:
+        analysis = ""
+        messages = analysis_messages(prompt)
+        with llm_call_metrics(ANALYZE_MODEL, TaskType.ANALYSIS.value):
+            async for chunk in await openai_client.chat.completions.create(
+                model=ANALYZE_MODEL,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=ANALYZE_MAX_TOKENS,
+                stream=True
+            ):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    analysis += chunk.choices[0].delta.content
+                    yield {"content": chunk.choices[0].delta.content}
+        input_tokens = count_tokens(messages[0]["content"] + messages[1]["content"])
+        output_tokens = count_tokens(analysis)
+        record_llm_tokens(ANALYZE_MODEL, input_tokens, output_tokens)
+        usage["input_tokens"] += input_tokens
+        usage["output_tokens"] += output_tokens
+    else:
+        analysis = await analysis_call(openai_client, ANALYZE_MODEL, TaskType.ANALYSIS.value, prompt, ANALYZE_MAX_TOKENS, usage)
+
+    yield {"done": True, "analysis": analysis, "usage": usage, **result}
+
 # ============================================
 # AUTHENTICATION
 # ============================================
@@ -349,7 +2745,7 @@ def get_demo_mode() -> bool:
     """Check if running in demo mode (no JWT secret configured)"""
     return not os.getenv("SUPABASE_JWT_SECRET")
 
-async def get_current_user(
+async def authenticate_user(
     authorization: str = Header(None),
     supabase: Client = Depends(get_supabase)
 ) -> Dict:
@@ -420,6 +2816,17 @@ async def get_current_user(
         logger.error(f"Authentication error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=401, detail="Authentication failed")
 
+async def get_current_user(
+    request: Request,
+    authorization: str = Header(None),
+    supabase: Client = Depends(get_supabase)
+) -> Dict:
+    """Authenticate the caller and charge the request to their org's quota"""
+    user = await authenticate_user(authorization, supabase)
+    charge_org_quota(user["org_id"], request_cost(request, ROUTE_COSTS))
+    return user
+
+
 # ============================================
 # ENDPOINTS
 # ============================================
@@ -437,8 +2844,8 @@ async def health_check():
 @app.post("/api/v1/complete")
 @limiter.limit("30/minute")
 async def complete(
-    http_request: Request,
-    request: CompletionRequest,
+    request: Request,
+    completion: CompletionRequest,
     background_tasks: BackgroundTasks,
     supabase: Client = Depends(get_supabase),
     openai_client: AsyncOpenAI = Depends(get_openai),
@@ -448,7 +2855,7 @@ async def complete(
     start_time = datetime.utcnow()
 
     # Assemble prompts
-    system_prompt, user_prompt = assemble_prompt(request)
+    system_prompt, user_prompt = assemble_prompt(completion)
 
     # Count input tokens
     input_tokens = count_tokens(system_prompt + user_prompt)
@@ -459,40 +2866,81 @@ async def complete(
     ]
 
     # Add conversation context if provided
-    if request.context:
-        for ctx in request.context:
+    if completion.context:
+        for ctx in completion.context:
             messages.insert(-1, ctx)
 
     model = LLMModel.GPT4_TURBO.value
 
-    if request.stream:
+    # Leave the reply whatever room the prompt does not use, rather than overflowing
+    context_texts = [str(ctx.get("content", "")) for ctx in completion.context or []]
+    room = available_tokens(model, 0, system_prompt, user_prompt, *context_texts)
+    if room < 1:
+        raise HTTPException(status_code=400, detail="Prompt exceeds the model's context window")
+    max_tokens = min(completion.max_tokens, room)
+
+    use_cache = cache_eligible(completion.cache, completion.temperature)
+    if use_cache:
+        scope = (current_user["org_id"], completion.matter_id)
+        exact_key = cache_key("complete", model, messages, completion.temperature, max_tokens)
+        # Everything except the user's prompt, which the semantic tier compares by embedding
+        variant = cache_key(
+            "complete", model, completion.task_type.value, messages[:-1],
+            completion.temperature, max_tokens
+        )
+        source_version = await asyncio.to_thread(matter_source_version, supabase, completion.matter_id)
+        cached, prompt_vector = await lookup_completion(
+            "complete", scope, exact_key, variant, source_version,
+            lambda: embed_query(openai_client, completion.prompt)
+        )
+        if cached is not None:
+            cached["latency_ms"] = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+            return replay_cached_stream(cached) if completion.stream else cached
+    else:
+        CACHE_LOOKUPS.labels("complete", "bypass").inc()
+
+    if completion.stream:
         async def stream_response() -> AsyncGenerator[str, None]:
             full_response = ""
+            llm_span = start_span(f"llm {completion.task_type.value}", model=model, stream=True)
             try:
                 async for chunk in await openai_client.chat.completions.create(
                     model=model,
                     messages=messages,
-                    temperature=request.temperature,
-                    max_tokens=request.max_tokens,
+                    temperature=completion.temperature,
+                    max_tokens=max_tokens,
                     stream=True
                 ):
                     if chunk.choices[0].delta.content:
                         content = chunk.choices[0].delta.content
                         full_response += content
                         yield f"data: {json.dumps({'content': content})}\n\n"
+                llm_span.end()
 
                 yield f"data: {json.dumps({'done': True})}\n\n"
 
                 # Log call after successful completion
                 output_tokens = count_tokens(full_response)
                 latency_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+                if use_cache:
+                    completion_cache.set(exact_key, scope, variant, prompt_vector, source_version, {
+                        "content": full_response,
+                        "model": model,
+                        "usage": {
+                            "input_tokens": input_tokens,
+                            "output_tokens": output_tokens,
+                            "total_tokens": input_tokens + output_tokens
+                        }
+                    })
                 await log_ai_call(
                     supabase, current_user["org_id"], current_user["id"],
-                    model, request.task_type.value,
+                    model, completion.task_type.value,
                     input_tokens, output_tokens, latency_ms,
-                    request.matter_id, request.metadata
+                    completion.matter_id, completion.metadata
                 )
             except Exception as e:
+                llm_span.end(e)
+
                 # Send error to client
                 error_msg = str(e) if os.getenv("DEBUG") == "true" else "An error occurred during completion"
                 yield f"data: {json.dumps({'error': error_msg, 'done': True})}\n\n"
@@ -503,8 +2951,8 @@ async def complete(
                     extra={
                         "user_id": current_user["id"],
                         "org_id": current_user["org_id"],
-                        "matter_id": request.matter_id,
-                        "task_type": request.task_type.value,
+                        "matter_id": completion.matter_id,
+                        "task_type": completion.task_type.value,
                         "error_type": type(e).__name__
                     },
                     exc_info=True  # Include stack trace
@@ -514,9 +2962,9 @@ async def complete(
                 latency_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
                 await log_ai_call(
                     supabase, current_user["org_id"], current_user["id"],
-                    model, request.task_type.value,
+                    model, completion.task_type.value,
                     input_tokens, 0, latency_ms,
-                    request.matter_id, request.metadata or {},
+                    completion.matter_id, completion.metadata or {},
                     error=str(e)
                 )
 
@@ -525,12 +2973,13 @@ async def complete(
             media_type="text/event-stream"
         )
     else:
-        response = await openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=request.temperature,
-            max_tokens=request.max_tokens
-        )
+        with trace_span(f"llm {completion.task_type.value}", model=model):
+            response = await openai_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=completion.temperature,
+                max_tokens=max_tokens
+            )
 
         content = response.choices[0].message.content
         output_tokens = response.usage.completion_tokens
@@ -540,41 +2989,45 @@ async def complete(
         background_tasks.add_task(
             log_ai_call,
             supabase, current_user["org_id"], current_user["id"],
-            model, request.task_type.value,
+            model, completion.task_type.value,
             input_tokens, output_tokens, latency_ms,
-            request.matter_id, request.metadata
+            completion.matter_id, completion.metadata
         )
 
-        return {
+        result = {
             "content": content,
             "model": model,
             "usage": {
                 "input_tokens": input_tokens,
                 "output_tokens": output_tokens,
                 "total_tokens": input_tokens + output_tokens
-            },
-            "latency_ms": latency_ms
+            }
         }
+        if use_cache:
+            completion_cache.set(exact_key, scope, variant, prompt_vector, source_version, result)
+
+        return {**result, "latency_ms": latency_ms}
 
 @app.post("/api/v1/embed")
 @limiter.limit("60/minute")
 async def generate_embeddings(
-    http_request: Request,
-    request: EmbeddingRequest,
+    request: Request,
+    embedding_request: EmbeddingRequest,
     openai_client: AsyncOpenAI = Depends(get_openai),
     current_user: Dict = Depends(get_current_user)
 ):
     """Generate embeddings for texts"""
-    response = await openai_client.embeddings.create(
-        input=request.texts,
-        model=request.model.value
-    )
+    # Large batches spend extra quota on top of the flat route cost
+    charge_org_quota(current_user["org_id"], len(embedding_request.texts) // 16)
 
-    embeddings = [item.embedding for item in response.data]
+    embeddings = await embed_texts(
+        openai_client, embedding_request.texts,
+        embedding_request.model.value, embedding_request.dimensions
+    )
 
     return {
         "embeddings": embeddings,
-        "model": request.model.value,
+        "model": embedding_request.model.value,
         "dimensions": len(embeddings[0]) if embeddings else 0,
         "count": len(embeddings)
     }
@@ -582,46 +3035,93 @@ async def generate_embeddings(
 @app.post("/api/v1/rag")
 @limiter.limit("20/minute")
 async def rag_complete(
-    http_request: Request,
-    request: RAGRequest,
+    request: Request,
+    rag_request: RAGRequest,
     background_tasks: BackgroundTasks,
     supabase: Client = Depends(get_supabase),
     openai_client: AsyncOpenAI = Depends(get_openai),
     current_user: Dict = Depends(get_current_user)
 ):
     """RAG-enhanced completion with context retrieval"""
+    # Wider retrieval means a bigger prompt, so it spends extra quota
+    charge_org_quota(current_user["org_id"], rag_request.top_k // 2)
+
     start_time = datetime.utcnow()
+    model = LLMModel.GPT4_TURBO.value
+
+    retrieval_mode = rag_request.retrieval_mode or DEFAULT_RETRIEVAL_MODE
 
-    # Retrieve relevant context
-    context_chunks = await retrieve_context(
+    use_cache = cache_eligible(rag_request.cache, rag_request.temperature)
+    query_vector = None
+    if use_cache:
+        scope = (current_user["org_id"], rag_request.matter_id)
+        variant = cache_key(
+            "rag", model, rag_request.task_type.value, rag_request.top_k, rag_request.similarity_threshold,
+            retrieval_mode.value, rag_request.mmr, rag_request.temperature
+        )
+        exact_key = cache_key(variant, rag_request.query)
+        source_version = await asyncio.to_thread(matter_source_version, supabase, rag_request.matter_id)
+        cached, query_vector = await lookup_completion(
+            "rag", scope, exact_key, variant, source_version,
+            lambda: embed_query(openai_client, rag_request.query)
+        )
+        if cached is not None:
+            sources = cached.pop("sources")
+            cached["latency_ms"] = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+            if rag_request.stream:
+                return replay_cached_stream(cached, [
+                    {key: source[key] for key in ("source_id", "source_name", "similarity")}
+                    for source in sources
+                ] if rag_request.include_sources else None)
+            if rag_request.include_sources:
+                cached["sources"] = sources
+            return cached
+    else:
+        CACHE_LOOKUPS.labels("rag", "bypass").inc()
+
+    # Retrieve relevant context, reusing the cache lookup's query embedding
+    context_chunks, retrieval = await search_context(
         supabase, openai_client,
-        request.query, request.matter_id,
-        request.top_k, request.similarity_threshold
+        rag_request.query, rag_request.matter_id,
+        rag_request.top_k, rag_request.similarity_threshold,
+        retrieval_mode, rag_request.mmr,
+        query_embedding=query_vector.tolist() if query_vector is not None else None
     )
 
     # Create completion request
     completion_request = CompletionRequest(
-        task_type=request.task_type,
-        prompt=request.query,
-        matter_id=request.matter_id,
-        stream=request.stream
+        task_type=rag_request.task_type,
+        prompt=rag_request.query,
+        matter_id=rag_request.matter_id,
+        stream=rag_request.stream
     )
 
-    # Assemble prompt with context
+    # Pack the retrieved chunks into the context budget, then assemble the prompt
+    context_budget = min(CONTEXT_TOKEN_BUDGET, available_tokens(model, 2048, *assemble_prompt(completion_request)))
+    context_chunks, packing = pack_context(context_chunks, context_budget, model)
     system_prompt, user_prompt = assemble_prompt(completion_request, context_chunks)
 
+    all_sources = [
+        {
+            "source_id": c.source_id,
+            "source_name": c.source_name,
+            "similarity": c.similarity,
+            "excerpt": c.content[:200] + "..." if len(c.content) > 200 else c.content
+        }
+        for c in context_chunks
+    ]
+
     input_tokens = count_tokens(system_prompt + user_prompt)
-    model = LLMModel.GPT4_TURBO.value
 
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
-    if request.stream:
+    if rag_request.stream:
         async def stream_rag_response() -> AsyncGenerator[str, None]:
             # Send sources first
-            if request.include_sources:
+            if rag_request.include_sources:
                 sources = [
                     {
                         "source_id": c.source_id,
@@ -633,27 +3133,47 @@ async def rag_complete(
                 yield f"data: {json.dumps({'sources': sources})}\n\n"
 
             full_response = ""
-            async for chunk in await openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2048,
-                stream=True
-            ):
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-                    yield f"data: {json.dumps({'content': content})}\n\n"
+            llm_span = start_span(f"llm rag_{rag_request.task_type.value}", model=model, stream=True)
+            try:
+                async for chunk in await openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=rag_request.temperature,
+                    max_tokens=2048,
+                    stream=True
+                ):
+                    if chunk.choices[0].delta.content:
+                        content = chunk.choices[0].delta.content
+                        full_response += content
+                        yield f"data: {json.dumps({'content': content})}\n\n"
+            except Exception as e:
+                llm_span.end(e)
+                raise
+            llm_span.end()
 
             yield f"data: {json.dumps({'done': True})}\n\n"
 
             output_tokens = count_tokens(full_response)
             latency_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+            if use_cache:
+                completion_cache.set(exact_key, scope, variant, query_vector, source_version, {
+                    "content": full_response,
+                    "model": model,
+                    "usage": {
+                        "input_tokens": input_tokens,
+                        "output_tokens": output_tokens,
+                        "total_tokens": input_tokens + output_tokens
+                    },
+                    "context_chunks_used": len(context_chunks),
+                    "context_packing": packing,
+                    "sources": all_sources
+                })
             await log_ai_call(
                 supabase, current_user["org_id"], current_user["id"],
-                model, f"rag_{request.task_type.value}",
+                model, f"rag_{rag_request.task_type.value}",
                 input_tokens, output_tokens, latency_ms,
-                request.matter_id, {"context_chunks": len(context_chunks)}
+                rag_request.matter_id,
+                {"context_chunks": len(context_chunks), "context_packing": packing, "retrieval": retrieval}
             )
 
         return StreamingResponse(
@@ -661,12 +3181,13 @@ async def rag_complete(
             media_type="text/event-stream"
         )
     else:
-        response = await openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=2048
-        )
+        with trace_span(f"llm rag_{rag_request.task_type.value}", model=model):
+            response = await openai_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=rag_request.temperature,
+                max_tokens=2048
+            )
 
         content = response.choices[0].message.content
         output_tokens = response.usage.completion_tokens
@@ -675,9 +3196,10 @@ async def rag_complete(
         background_tasks.add_task(
             log_ai_call,
             supabase, current_user["org_id"], current_user["id"],
-            model, f"rag_{request.task_type.value}",
+            model, f"rag_{rag_request.task_type.value}",
             input_tokens, output_tokens, latency_ms,
-            request.matter_id, {"context_chunks": len(context_chunks)}
+            rag_request.matter_id,
+            {"context_chunks": len(context_chunks), "context_packing": packing, "retrieval": retrieval}
         )
 
         result = {
@@ -689,112 +3211,214 @@ async def rag_complete(
                 "total_tokens": input_tokens + output_tokens
             },
             "latency_ms": latency_ms,
-            "context_chunks_used": len(context_chunks)
+            "context_chunks_used": len(context_chunks),
+            "context_packing": packing,
+            "retrieval": retrieval
         }
+        if use_cache:
+            completion_cache.set(exact_key, scope, variant, query_vector, source_version, {
+                **{key: value for key, value in result.items() if key not in ("latency_ms", "retrieval")},
+                "sources": all_sources
+            })
 
-        if request.include_sources:
-            result["sources"] = [
-                {
-                    "source_id": c.source_id,
-                    "source_name": c.source_name,
-                    "similarity": c.similarity,
-                    "excerpt": c.content[:200] + "..." if len(c.content) > 200 else c.content
-                }
-                for c in context_chunks
-            ]
+        if rag_request.include_sources:
+            result["sources"] = all_sources
 
         return result
 
+@app.post("/api/v1/cache/invalidate")
+async def invalidate_completion_cache(
+    invalidate_request: CacheInvalidateRequest,
+    current_user: Dict = Depends(get_current_user)
+):
+    """Drop cached completions for the caller's org, or for one matter"""
+    dropped = completion_cache.invalidate(current_user["org_id"], invalidate_request.matter_id)
+    forget_source_version(invalidate_request.matter_id)
+    return {"invalidated": dropped}
+
+@app.post("/api/v1/index/rebuild")
+@limiter.limit("6/minute")
+async def rebuild_vector_index(
+    request: Request,
+    rebuild_request: IndexRebuildRequest,
+    supabase: Client = Depends(get_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Rebuild a matter's local vector index from its stored chunk embeddings"""
+    matter = supabase.table("matters").select("id").eq("id", rebuild_request.matter_id).eq(
+        "org_id", current_user["org_id"]
+    ).limit(1).execute()
+    if not matter.data:
+        raise HTTPException(status_code=404, detail="Matter not found")
+
+    start_time = time.time()
+    chunks = await asyncio.to_thread(load_matter_chunks, supabase, rebuild_request.matter_id)
+    await asyncio.to_thread(vector_index.add_chunks, rebuild_request.matter_id, chunks, rebuild=True)
+
+    return {
+        "matter_id": rebuild_request.matter_id,
+        "chunks": len(chunks),
+        "latency_ms": int((time.time() - start_time) * 1000)
+    }
+
+@app.post("/api/v1/ingest", status_code=202)
+@limiter.limit("10/minute")
+async def start_ingestion(
+    request: Request,
+    ingest_request: IngestRequest,
+    supabase: Client = Depends(get_supabase),
+    openai_client: AsyncOpenAI = Depends(get_openai),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Queue a background job that chunks and embeds a matter's sources"""
+    matter = supabase.table("matters").select("id").eq("id", ingest_request.matter_id).eq(
+        "org_id", current_user["org_id"]
+    ).limit(1).execute()
+    if not matter.data:
+        raise HTTPException(status_code=404, detail="Matter not found")
+
+    source_ids = ingest_request.source_ids
+    if source_ids is None:
+        sources = supabase.table("matter_sources").select("id").eq("matter_id", ingest_request.matter_id).execute()
+        source_ids = [source["id"] for source in sources.data or []]
+    # Big jobs spend quota by size on top of the flat route cost
+    charge_org_quota(current_user["org_id"], len(source_ids) // 10)
+
+    job = IngestionJob(
+        secrets.token_hex(16), current_user["org_id"], ingest_request.matter_id,
+        list(dict.fromkeys(source_ids)), ingest_request.force
+    )
+    if not await ingestion_pipeline.submit(job, supabase, openai_client):
+        raise HTTPException(status_code=409, detail="Ingestion job could not be started")
+    return {"job_id": job.job_id, "status": job.status, "sources": len(job.source_ids)}
+
+@app.get("/api/v1/ingest/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    supabase: Client = Depends(get_supabase),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Progress of an ingestion job"""
+    job = await asyncio.to_thread(ingestion_pipeline.get, supabase, current_user["org_id"], job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    progress = job.to_dict()
+    del progress["org_id"]
+    return {
+        **progress,
+        "sources_total": len(job.source_ids),
+        "sources_remaining": len(job.source_ids) - len(job.sources_done) - len(job.sources_failed)
+    }
+
 @app.post("/api/v1/analyze")
 async def analyze_document(
     matter_id: str,
     source_id: str,
     analysis_type: str = "comprehensive",
+    mode: AnalysisMode = AnalysisMode.AUTO,
+    stream: bool = False,
+    force: bool = False,
     background_tasks: BackgroundTasks = None,
     supabase: Client = Depends(get_supabase),
     openai_client: AsyncOpenAI = Depends(get_openai),
     current_user: Dict = Depends(get_current_user)
 ):
-    """Analyze a document and return structured insights"""
+    """Analyze a document and return structured insights; force skips the analysis cache"""
 
     # Get source document
-    source = supabase.table("matter_sources").select("*").eq("id", source_id).single().execute()
+    # Sources carry no org_id, so scope through the owning matter before any
+    # storage download
+    source = supabase.table("matter_sources").select("*, matters!inner(org_id)").eq("id", source_id).eq(
+        "matter_id", matter_id
+    ).eq("matters.org_id", current_user["org_id"]).limit(1).execute()
     if not source.data:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    doc = source.data
+    doc = source.data[0]
+    doc.pop("matters", None)
     content = doc.get("extracted_text", "") or doc.get("summary", "")
+    if not content.strip() and doc.get("storage_path"):
+        try:
+            content = await extract_source_text(supabase, doc)
+        except ValueError as e:
+            raise HTTPException(status_code=415, detail=str(e))
 
-    if not content:
+    if not content.strip():
         raise HTTPException(status_code=400, detail="No content to analyze")
 
-    analysis_prompts = {
-        "comprehensive": """Analyze this legal document comprehensively:
-1. Document Type & Purpose
-2. Key Parties & Their Roles
-3. Important Dates & Deadlines
-4. Key Obligations & Rights
-5. Potential Risks & Issues
-6. Recommended Actions
-
-Provide structured analysis with clear sections.""",
-
-        "risk": """Analyze this document for legal risks:
-1. Contractual Risks
-2. Compliance Risks
-3. Liability Exposure
-4. Ambiguous Terms
-5. Missing Protections
-6. Risk Mitigation Recommendations
-
-Rate overall risk level: Low/Medium/High/Critical""",
-
-        "summary": """Provide a comprehensive yet concise summary:
-1. One-paragraph executive summary
-2. Key facts (bullet points)
-3. Important dates
-4. Action items
-5. Notable concerns"""
-    }
-
-    prompt = analysis_prompts.get(analysis_type, analysis_prompts["comprehensive"])
-    prompt += f"\n\nDOCUMENT:\n{content}"
-
-    request = CompletionRequest(
-        task_type=TaskType.ANALYSIS,
-        prompt=prompt,
-        matter_id=matter_id,
-        temperature=0.3,
-        max_tokens=4096
+    focus = analysis_type if analysis_type in ANALYSIS_PROMPTS else "comprehensive"
+    budget = min(
+        DOCUMENT_TOKEN_BUDGET,
+        available_tokens(ANALYZE_MODEL, ANALYZE_MAX_TOKENS, SYSTEM_PROMPTS[TaskType.ANALYSIS], ANALYSIS_PROMPTS[focus])
     )
-
-    system_prompt, user_prompt = assemble_prompt(request)
-
-    response = await openai_client.chat.completions.create(
-        model=LLMModel.GPT4_TURBO.value,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.3,
-        max_tokens=4096
+    # auto reads the document in one call when it fits, map-reduce otherwise
+    map_reduce = mode == AnalysisMode.MAP_REDUCE or (
+        mode == AnalysisMode.AUTO and count_tokens(content, ANALYZE_MODEL) > budget
     )
 
-    analysis = response.choices[0].message.content
+    def store(analysis: str) -> None:
+        supabase.table("matter_sources").update({
+            "analysis": analysis,
+            "analysis_type": analysis_type,
+            "analyzed_at": datetime.utcnow().isoformat()
+        }).eq("id", source_id).execute()
+
+    key = analysis_cache_key(current_user["org_id"], content, focus, map_reduce)
+    cached = None
+    if force:
+        CACHE_LOOKUPS.labels("analysis", "bypass").inc()
+    else:
+        cached = await asyncio.to_thread(load_cached_analysis, supabase, key)
+        CACHE_LOOKUPS.labels("analysis", "hit" if cached else "miss").inc()
+
+    if cached:
+        # Leave analyzed_at alone when the stored analysis is already current
+        if doc.get("analysis") != cached["analysis"] or doc.get("analysis_type") != analysis_type:
+            await asyncio.to_thread(store, cached["analysis"])
+        result = {**cached, "source_id": source_id, "cached": True}
+        if stream:
+            async def replay_analysis() -> AsyncGenerator[str, None]:
+                yield f"data: {json.dumps({'content': result['analysis']})}\n\n"
+                yield f"data: {json.dumps({**result, 'done': True})}\n\n"
+
+            return StreamingResponse(replay_analysis(), media_type="text/event-stream")
+        return result
+
+    def remember(event: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            "source_id": source_id,
+            "analysis_type": analysis_type,
+            "analysis": event["analysis"],
+            "model": ANALYZE_MODEL,
+            "mode": event["mode"],
+            "sections": event.get("sections"),
+            "failed_sections": event.get("failed_sections", []),
+            "usage": event["usage"],
+            "truncated_tokens": event["truncated_tokens"]
+        }
+        store(event["analysis"])
+        # A partial map-reduce result is returned but not cached
+        if not result["failed_sections"]:
+            store_cached_analysis(supabase, key, current_user["org_id"], source_id, result)
+        return result
 
-    # Store analysis result
-    supabase.table("matter_sources").update({
-        "analysis": analysis,
-        "analysis_type": analysis_type,
-        "analyzed_at": datetime.utcnow().isoformat()
-    }).eq("id", source_id).execute()
+    events = analysis_events(openai_client, content, focus, map_reduce, stream)
 
-    return {
-        "source_id": source_id,
-        "analysis_type": analysis_type,
-        "analysis": analysis,
-        "model": LLMModel.GPT4_TURBO.value
-    }
+    if stream:
+        async def stream_analysis() -> AsyncGenerator[str, None]:
+            try:
+                async for event in events:
+                    if event.get("done"):
+                        event = {**await asyncio.to_thread(remember, event), "done": True}
+                    yield f"data: {json.dumps(event)}\n\n"
+            except HTTPException as e:
+                yield f"data: {json.dumps({'error': e.detail})}\n\n"
+
+        return StreamingResponse(stream_analysis(), media_type="text/event-stream")
+
+    async for event in events:
+        pass
+    return await asyncio.to_thread(remember, event)
 
 # ============================================
 # RUN SERVER
@@ -0,0 +1,56 @@
+"""
+Analysis cache keys: what invalidates a cached document analysis.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+ARGS = ("org-1", "The tenant shall pay rent.", "risk", False)
+
+
+def test_key_is_stable_for_the_same_inputs():
+    assert main.analysis_cache_key(*ARGS) == main.analysis_cache_key(*ARGS)
+
+
+def test_key_changes_with_org_text_focus_and_mode():
+    key = main.analysis_cache_key(*ARGS)
+    variants = [
+        ("org-2", *ARGS[1:]),
+        (ARGS[0], "The tenant shall pay rent monthly.", *ARGS[2:]),
+        (*ARGS[:2], "summary", ARGS[3]),
+        (*ARGS[:3], True),
+    ]
+
+    keys = {main.analysis_cache_key(*args) for args in variants}
+
+    assert key not in keys and len(keys) == len(variants)
+
+
+def test_key_changes_with_the_analysis_version(monkeypatch):
+    key = main.analysis_cache_key(*ARGS)
+    monkeypatch.setattr(main, "ANALYSIS_VERSION", main.ANALYSIS_VERSION + "-next")
+
+    assert main.analysis_cache_key(*ARGS) != key
+
+
+def test_map_model_only_matters_for_map_reduce(monkeypatch):
+    single, mapped = main.analysis_cache_key(*ARGS), main.analysis_cache_key(*ARGS[:3], True)
+    monkeypatch.setattr(main, "ANALYZE_MAP_MODEL", "another-model")
+
+    assert main.analysis_cache_key(*ARGS) == single
+    assert main.analysis_cache_key(*ARGS[:3], True) != mapped
+
+
+def test_unavailable_cache_table_is_a_miss():
+    class Broken:
+        def table(self, name):
+            raise RuntimeError("relation analysis_cache does not exist")
+
+    assert main.load_cached_analysis(Broken(), "key") is None
+    main.store_cached_analysis(Broken(), "key", "org-1", "source-1", {"analysis": "x"})
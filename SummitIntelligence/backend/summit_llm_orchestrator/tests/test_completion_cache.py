@@ -0,0 +1,82 @@
+"""
+Completion cache: exact and semantic tiers, eviction and invalidation.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+SCOPE = ("org-1", "matter-1")
+VARIANT = "gpt-4|rag"
+
+
+def vector(*values) -> np.ndarray:
+    return main.unit_vector(list(values))
+
+
+def test_exact_hit_needs_the_same_source_version():
+    cache = main.CompletionCache(ttl_seconds=60, max_entries=10)
+    cache.set("key", SCOPE, VARIANT, None, "v1", {"content": "answer"})
+
+    assert cache.get("key", "v1") == {"content": "answer"}
+    assert cache.get("key", "v2") is None
+    # A stale version drops the entry
+    assert cache.get("key", "v1") is None
+
+
+def test_expired_entries_are_not_served():
+    cache = main.CompletionCache(ttl_seconds=0.01, max_entries=10)
+    cache.set("key", SCOPE, VARIANT, None, None, {"content": "answer"})
+    time.sleep(0.02)
+
+    assert cache.get("key", None) is None
+
+
+def test_semantic_hit_above_the_threshold_within_the_same_variant():
+    cache = main.CompletionCache(ttl_seconds=60, max_entries=10)
+    cache.set("key", SCOPE, VARIANT, vector(1, 0, 0), None, {"content": "answer"})
+
+    hit = cache.get_similar(SCOPE, VARIANT, vector(1, 0.05, 0), 0.97, None)
+    assert hit is not None and hit[0] == {"content": "answer"} and hit[1] > 0.97
+    assert cache.get_similar(SCOPE, VARIANT, vector(1, 1, 0), 0.97, None) is None
+    assert cache.get_similar(SCOPE, "gpt-4|complete", vector(1, 0, 0), 0.97, None) is None
+    assert cache.get_similar(("org-2", "matter-1"), VARIANT, vector(1, 0, 0), 0.97, None) is None
+
+
+def test_least_recently_used_entry_is_evicted_with_its_vector():
+    cache = main.CompletionCache(ttl_seconds=60, max_entries=2)
+    cache.set("a", SCOPE, VARIANT, vector(1, 0, 0), None, {"content": "a"})
+    cache.set("b", SCOPE, VARIANT, vector(0, 1, 0), None, {"content": "b"})
+    cache.get("a", None)
+    cache.set("c", SCOPE, VARIANT, vector(0, 0, 1), None, {"content": "c"})
+
+    assert cache.get("b", None) is None
+    assert cache.get_similar(SCOPE, VARIANT, vector(0, 1, 0), 0.97, None) is None
+    assert cache.get("a", None) == {"content": "a"}
+
+
+def test_invalidate_drops_one_matter_or_the_whole_org():
+    cache = main.CompletionCache(ttl_seconds=60, max_entries=10)
+    cache.set("m1", ("org-1", "matter-1"), VARIANT, vector(1, 0), None, {"content": "m1"})
+    cache.set("m2", ("org-1", "matter-2"), VARIANT, None, None, {"content": "m2"})
+    cache.set("other", ("org-2", "matter-1"), VARIANT, None, None, {"content": "other"})
+
+    assert cache.invalidate("org-1", "matter-1") == 1
+    assert cache.get_similar(("org-1", "matter-1"), VARIANT, vector(1, 0), 0.97, None) is None
+    assert cache.invalidate("org-1") == 1
+    assert cache.get("other", None) == {"content": "other"}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = main.CompletionCache(ttl_seconds=0, max_entries=10)
+    cache.set("key", SCOPE, VARIANT, None, None, {"content": "answer"})
+
+    assert cache.get("key", None) is None
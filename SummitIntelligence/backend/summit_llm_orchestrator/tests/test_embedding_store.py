@@ -0,0 +1,90 @@
+"""
+Embedding cache: the shared on-disk store and the in-memory LRU in front of it.
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+DIMS = 4
+
+
+def digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode()).digest()
+
+
+def embedding(seed: int) -> np.ndarray:
+    return np.arange(DIMS, dtype=np.float32) + seed
+
+
+def test_rows_round_trip_and_survive_reopening(tmp_path):
+    store = main.EmbeddingStore(str(tmp_path), "model-4", DIMS)
+    store.put_many({digest("a"): embedding(1), digest("b"): embedding(2)})
+
+    reopened = main.EmbeddingStore(str(tmp_path), "model-4", DIMS)
+    found = reopened.get_many([digest("a"), digest("b"), digest("c")])
+
+    assert set(found) == {digest("a"), digest("b")}
+    np.testing.assert_array_equal(found[digest("b")], embedding(2))
+
+
+def test_another_worker_sees_rows_appended_after_it_opened(tmp_path):
+    reader = main.EmbeddingStore(str(tmp_path), "model-4", DIMS)
+    writer = main.EmbeddingStore(str(tmp_path), "model-4", DIMS)
+    assert reader.get_many([digest("a")]) == {}
+
+    writer.put_many({digest("a"): embedding(1)})
+
+    np.testing.assert_array_equal(reader.get_many([digest("a")])[digest("a")], embedding(1))
+
+
+def test_existing_digests_are_not_appended_again(tmp_path):
+    store = main.EmbeddingStore(str(tmp_path), "model-4", DIMS)
+    store.put_many({digest("a"): embedding(1)})
+    store.put_many({digest("a"): embedding(9), digest("b"): embedding(2)})
+
+    assert os.path.getsize(store.index_path) == 2 * 32
+    np.testing.assert_array_equal(store.get_many([digest("a")])[digest("a")], embedding(1))
+
+
+def test_partial_row_from_a_crashed_writer_is_discarded(tmp_path):
+    store = main.EmbeddingStore(str(tmp_path), "model-4", DIMS)
+    store.put_many({digest("a"): embedding(1)})
+    with open(store.data_path, "ab") as f:
+        f.write(b"\x00" * 6)
+
+    store.put_many({digest("b"): embedding(2)})
+
+    found = main.EmbeddingStore(str(tmp_path), "model-4", DIMS).get_many([digest("a"), digest("b")])
+    np.testing.assert_array_equal(found[digest("b")], embedding(2))
+
+
+def test_disk_row_cap_stops_appends(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "EMBEDDING_CACHE_MAX_DISK_ROWS", 1)
+    store = main.EmbeddingStore(str(tmp_path), "model-4", DIMS)
+    store.put_many({digest("a"): embedding(1)})
+    store.put_many({digest("b"): embedding(2)})
+
+    assert store.get_many([digest("b")]) == {}
+
+
+def test_memory_cache_evicts_but_falls_back_to_disk(tmp_path):
+    cache = main.EmbeddingCache(str(tmp_path), max_entries=1)
+    cache.put_many("model", DIMS, {digest("a"): embedding(1)})
+    cache.put_many("model", DIMS, {digest("b"): embedding(2)})
+
+    assert ("model", DIMS, digest("a")) not in cache._entries
+    np.testing.assert_array_equal(cache.get_many("model", DIMS, [digest("a")])[digest("a")], embedding(1))
+
+    memory_only = main.EmbeddingCache("", max_entries=1)
+    memory_only.put_many("model", DIMS, {digest("a"): embedding(1)})
+    memory_only.put_many("model", DIMS, {digest("b"): embedding(2)})
+    assert memory_only.get_many("model", DIMS, [digest("a")]) == {}
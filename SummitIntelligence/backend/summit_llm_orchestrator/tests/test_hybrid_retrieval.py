@@ -0,0 +1,79 @@
+"""
+Hybrid retrieval: BM25, reciprocal rank fusion, MMR and the lexical fallback.
+"""
+
+import asyncio
+import os
+import sys
+
+from postgrest.exceptions import APIError
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+
+def chunk(content: str, similarity: float = 0.0, source_id: str = "source-1") -> main.ContextChunk:
+    return main.ContextChunk(source_id=source_id, source_name="Lease", content=content, similarity=similarity)
+
+
+def test_bm25_ranks_by_term_frequency_and_rarity():
+    documents = ["rent rent rent review", "rent review clause", "break clause notice", "unrelated text"]
+
+    scores = main.bm25_scores(["rent", "break"], documents)
+
+    assert scores[0] > scores[1] > 0
+    assert scores[2] > scores[1]  # "break" is rarer than "rent"
+    assert scores[3] == 0
+    assert main.bm25_scores(["rent"], []) == []
+
+
+def test_fusion_puts_chunks_found_by_both_stages_first():
+    shared, vector_only, lexical_only = chunk("shared"), chunk("vector", 0.9), chunk("lexical")
+
+    fused = main.reciprocal_rank_fusion(
+        [shared.model_copy(update={"similarity": 0.8}), vector_only],
+        [shared, lexical_only]
+    )
+
+    assert [c.content for c in fused][0] == "shared"
+    assert fused[0].similarity == 1.0
+    assert fused[0].metadata["vector_rank"] == 1 and fused[0].metadata["lexical_rank"] == 1
+    assert fused[0].metadata["vector_similarity"] == 0.8
+    assert {c.content for c in fused[1:]} == {"vector", "lexical"}
+
+
+def test_mmr_skips_near_duplicates():
+    chunks = [
+        chunk("the tenant shall pay rent quarterly", 0.9),
+        chunk("the tenant shall pay rent quarterly in advance", 0.89),
+        chunk("landlord may terminate on notice", 0.6),
+    ]
+
+    selected = main.mmr_select(chunks, 2)
+
+    assert [c.content for c in selected] == [chunks[0].content, chunks[2].content]
+
+
+def test_hybrid_falls_back_to_vector_results_when_lexical_fails(monkeypatch):
+    vector_hits = [chunk("first", 0.9), chunk("second", 0.8)]
+
+    async def retrieve_context(*args, **kwargs):
+        return vector_hits
+
+    def lexical_search(*args, **kwargs):
+        raise APIError({"message": "column source_chunk.source_id does not exist", "code": "42703"})
+
+    monkeypatch.setattr(main, "retrieve_context", retrieve_context)
+    monkeypatch.setattr(main, "lexical_search", lexical_search)
+
+    chunks, stats = asyncio.run(main.search_context(
+        None, None, "rent review", "matter-1", top_k=1, threshold=0.5, mode=main.RetrievalMode.HYBRID
+    ))
+
+    assert [c.content for c in chunks] == ["first"]
+    assert chunks[0].similarity == 0.9
+    assert stats["fallback"] == "vector" and stats["lexical_error"] == "42703"
+    assert "lexical_hits" not in stats
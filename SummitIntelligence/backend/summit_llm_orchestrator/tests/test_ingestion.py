@@ -0,0 +1,161 @@
+"""
+Ingestion: chunking and reuse of stored chunks when text moves.
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+MATTER_ID = "matter-1"
+SOURCE_ID = "source-1"
+
+
+class CharEncoding:
+    """One token per character, so windows are easy to predict."""
+
+    def encode(self, text: str):
+        return list(text)
+
+    def decode(self, tokens) -> str:
+        return "".join(tokens)
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db, self.table = db, table
+        self.op, self.payload, self.filters, self.bounds = "select", None, [], None
+
+    def select(self, columns: str = "*", **kwargs):
+        return self
+
+    def upsert(self, rows, **kwargs):
+        self.op, self.payload = "upsert", rows
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) >= value)
+        return self
+
+    def in_(self, column: str, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, count: int):
+        return self
+
+    def range(self, start: int, end: int):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self) -> Result:
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.op == "upsert":
+            for new in self.payload:
+                rows[:] = [r for r in rows if (r["source_id"], r["chunk_index"]) != (new["source_id"], new["chunk_index"])]
+                rows.append(dict(new))
+            return Result(self.payload)
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.op == "delete":
+            rows[:] = [row for row in rows if row not in matched]
+        if self.op == "update":
+            return Result([self.payload])
+        if self.bounds:
+            matched = matched[self.bounds[0]:self.bounds[1] + 1]
+        return Result([dict(row) for row in matched])
+
+
+class FakeSupabase:
+    def __init__(self, text: str, stored_chunks):
+        self.tables = {
+            "matter_sources": [{"id": SOURCE_ID, "matter_id": MATTER_ID, "source_name": "Lease", "extracted_text": text}],
+            main.CHUNK_TABLE: [
+                {
+                    "source_id": SOURCE_ID, "chunk_index": index, "content": content,
+                    "content_hash": hashlib.sha256(content.encode()).hexdigest(), "embedding": [float(index)]
+                }
+                for index, content in enumerate(stored_chunks)
+            ],
+        }
+
+    def table(self, name: str) -> Query:
+        return Query(self, name)
+
+
+@pytest.fixture
+def char_tokens(monkeypatch):
+    monkeypatch.setattr(main.tiktoken, "encoding_for_model", lambda model: CharEncoding())
+
+
+def test_chunks_overlap_and_end_at_the_text_end(char_tokens):
+    chunks = list(main.chunk_text("abcdefghij", chunk_tokens=4, overlap=1))
+
+    assert chunks == [("abcd", 4), ("defg", 4), ("ghij", 4)]
+
+
+def test_blank_text_has_no_chunks(char_tokens):
+    assert list(main.chunk_text("", chunk_tokens=4, overlap=1)) == []
+    assert list(main.chunk_text("      ", chunk_tokens=4, overlap=1)) == []
+
+
+def test_without_a_tokenizer_chunks_by_characters(monkeypatch):
+    def unavailable(model):
+        raise KeyError(model)
+
+    monkeypatch.setattr(main.tiktoken, "encoding_for_model", unavailable)
+
+    chunks = list(main.chunk_text("a" * 20, chunk_tokens=2, overlap=0))
+
+    assert chunks == [("a" * 8, 2), ("a" * 8, 2), ("a" * 4, 1)]
+
+
+def test_inserted_text_reuses_the_embeddings_of_shifted_chunks(char_tokens, monkeypatch):
+    # "new!" is inserted before two chunks that were already embedded
+    supabase = FakeSupabase("new!abcdefgh", ["abcd", "efgh"])
+    embedded = []
+
+    async def embed_texts(openai_client, texts, model=None, dimensions=None):
+        embedded.extend(texts)
+        return [[9.0] for _ in texts]
+
+    chunk_text = main.chunk_text
+    monkeypatch.setattr(main, "chunk_text", lambda text: chunk_text(text, chunk_tokens=4, overlap=0))
+    monkeypatch.setattr(main, "embed_texts", embed_texts)
+
+    job = main.IngestionJob("job-1", "org-1", MATTER_ID, [SOURCE_ID])
+    asyncio.run(main.IngestionPipeline()._pipeline(job, supabase, None))
+
+    stored = sorted(supabase.tables[main.CHUNK_TABLE], key=lambda row: row["chunk_index"])
+    assert [(row["content"], row["embedding"]) for row in stored] == [
+        ("new!", [9.0]), ("abcd", [0.0]), ("efgh", [1.0])
+    ]
+    assert embedded == ["new!"]
+    assert (job.chunks_embedded, job.chunks_reused, job.sources_done) == (1, 2, [SOURCE_ID])
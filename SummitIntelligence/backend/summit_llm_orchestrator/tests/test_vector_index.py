@@ -0,0 +1,96 @@
+"""
+Local vector index: append, search, tombstones, sharing and IVF retraining.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import main  # noqa: E402
+
+DIMS = 16
+
+
+def make_rows(source_id: str, count: int, start: int = 0):
+    rows = [
+        {"chunk_id": f"{source_id}-{i}", "source_id": source_id, "chunk_index": i, "content": f"{source_id} chunk {i}"}
+        for i in range(start, start + count)
+    ]
+    return rows, np.random.default_rng(sum(map(ord, source_id)) + start).normal(size=(count, DIMS)).astype(np.float32)
+
+
+def test_search_returns_the_nearest_rows_with_their_content(tmp_path):
+    index = main.MatterVectorIndex(str(tmp_path))
+    rows, vectors = make_rows("source-a", 20)
+    index.add(rows, vectors)
+
+    hits = index.search(vectors[7], top_k=3, threshold=-1.0)
+
+    assert len(hits) == 3
+    assert hits[0][0]["chunk_id"] == "source-a-7" and hits[0][0]["content"] == "source-a chunk 7"
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    assert index.search(vectors[7], top_k=3, threshold=1.1) == []
+
+
+def test_replacing_a_source_tombstones_its_old_rows(tmp_path):
+    index = main.MatterVectorIndex(str(tmp_path))
+    a_rows, a_vectors = make_rows("source-a", 10)
+    b_rows, b_vectors = make_rows("source-b", 10)
+    index.add(a_rows + b_rows, np.vstack([a_vectors, b_vectors]))
+
+    new_rows, new_vectors = make_rows("source-a", 8, start=100)
+    index.add(new_rows, new_vectors, replace_sources=["source-a"])
+
+    assert len(index) == 18
+    hits = index.search(a_vectors[3], top_k=30, threshold=-1.0)
+    assert "source-a-3" not in {row["chunk_id"] for row, _ in hits}
+    assert {row["source_id"] for row, _ in hits} == {"source-a", "source-b"}
+
+
+def test_another_reader_catches_up_with_appended_rows(tmp_path):
+    writer = main.MatterVectorIndex(str(tmp_path))
+    reader = main.MatterVectorIndex(str(tmp_path))
+    rows, vectors = make_rows("source-a", 5)
+    writer.add(rows, vectors)
+    assert len(reader) == 5
+
+    more_rows, more_vectors = make_rows("source-b", 5)
+    writer.add(more_rows, more_vectors)
+
+    assert len(reader) == 10
+    assert reader.search(more_vectors[2], top_k=1, threshold=-1.0)[0][0]["chunk_id"] == "source-b-2"
+
+
+def test_index_trains_ivf_once_large_enough_and_keeps_appending(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "IVF_MIN_ROWS", 32)
+    index = main.MatterVectorIndex(str(tmp_path))
+    rows, vectors = make_rows("source-a", 40)
+    index.add(rows, vectors)
+
+    assert len(index) == 40
+    assert index.centroids is not None and index.trained_rows == 40
+    generation = index.generation
+    more_rows, more_vectors = make_rows("source-b", 10)
+    index.add(more_rows, more_vectors)
+
+    assert len(index) == 50
+    assert index.generation == generation
+    nlist = len(index.centroids)
+    for query, chunk_id in ((vectors[11], "source-a-11"), (more_vectors[4], "source-b-4")):
+        assert index.search(query, top_k=1, threshold=-1.0, nprobe=nlist)[0][0]["chunk_id"] == chunk_id
+
+
+def test_embeddings_of_another_size_are_rejected(tmp_path):
+    index = main.MatterVectorIndex(str(tmp_path))
+    rows, vectors = make_rows("source-a", 3)
+    index.add(rows, vectors)
+
+    with pytest.raises(ValueError):
+        index.add(rows, np.ones((3, DIMS * 2), dtype=np.float32))
@@ -187,6 +187,19 @@ export async function getMatter(token: string, matterId: string): Promise<Matter
   return fetchAPI(`${API_BASE_URL}/api/v1/matters/${matterId}`, { token });
 }
 
+export interface BatchResult<T> {
+  items: T[];
+  missing: string[];
+}
+
+export async function getMattersBatch(token: string, ids: string[]): Promise<BatchResult<MatterSummary>> {
+  return fetchAPI(`${API_BASE_URL}/api/v1/matters/batch`, {
+    method: "POST",
+    body: JSON.stringify({ ids }),
+    token,
+  });
+}
+
 // ============================================
 // MATTER SOURCES
 // ============================================
@@ -213,12 +226,58 @@ export async function getMatterSources(
   return fetchAPI(`${API_BASE_URL}/api/v1/matters/${matterId}/sources${params}`, { token });
 }
 
+export interface SourceDetail extends MatterSource {
+  extracted_text: string | null;
+  analysis: string | null;
+  analysis_type: string | null;
+  analyzed_at: string | null;
+  storage_path: string | null;
+  created_at: string;
+  updated_at: string;
+  [column: string]: unknown;
+}
+
+export interface SourceContent {
+  id: string;
+  extracted_text?: string | null;
+  analysis?: string | null;
+}
+
+/** The whole source row, or only `fields` (plus id) when given. */
 export async function getSource(
   token: string,
   matterId: string,
-  sourceId: string
-): Promise<MatterSource & { extracted_text?: string }> {
-  return fetchAPI(`${API_BASE_URL}/api/v1/matters/${matterId}/sources/${sourceId}`, { token });
+  sourceId: string,
+  fields?: string[]
+): Promise<SourceDetail> {
+  const params = fields?.length ? `?fields=${fields.join(",")}` : "";
+  return fetchAPI(`${API_BASE_URL}/api/v1/matters/${matterId}/sources/${sourceId}${params}`, { token });
+}
+
+/** Just the large text columns of a source, without its metadata. */
+export async function getSourceContent(
+  token: string,
+  matterId: string,
+  sourceId: string,
+  fields: ("extracted_text" | "analysis")[] = ["extracted_text", "analysis"]
+): Promise<SourceContent> {
+  return fetchAPI(
+    `${API_BASE_URL}/api/v1/matters/${matterId}/sources/${sourceId}/content?fields=${fields.join(",")}`,
+    { token }
+  );
+}
+
+export async function getSourcesBatch(
+  token: string,
+  ids: string[],
+  fields?: string[]
+): Promise<BatchResult<MatterSource>> {
+  const params = fields?.length ? `?fields=${fields.join(",")}` : "";
+  return fetchAPI(`${API_BASE_URL}/api/v1/sources/batch${params}`, {
+    method: "POST",
+    body: JSON.stringify({ ids }),
+    token,
+  });
 }
 
 // ============================================
@@ -378,6 +437,116 @@ export async function startAgentRun(
   });
 }
 
+// ============================================
+// DASHBOARD
+// ============================================
+
+export type DashboardSection = "organisation" | "matters" | "deadlines" | "sgi" | "agents";
+
+export interface Dashboard {
+  organisation: Organisation | null;
+  matters: MatterSummary[] | null;
+  deadlines: (MatterEvent & { matters: { code: string; name: string } })[] | null;
+  sgi: SGISnapshot | null;
+  agents: AgentDefinition[] | null;
+  timings_ms: Partial<Record<DashboardSection | "total", number>>;
+  errors: Partial<Record<DashboardSection, "timeout" | "failed">>;
+  partial: boolean;
+}
+
+export async function getDashboard(
+  token: string,
+  mattersLimit = 20,
+  deadlineDays = 30
+): Promise<Dashboard> {
+  const params = `?matters_limit=${mattersLimit}&deadline_days=${deadlineDays}`;
+  return fetchAPI(`${API_BASE_URL}/api/v1/dashboard${params}`, { token });
+}
+
+// ============================================
+// CHANGE FEED
+// ============================================
+
+export interface ChangeEvent {
+  seq: number;
+  table: string;
+  op: "insert" | "update" | "delete";
+  id: string;
+  matter_id: string | null;
+  at: string;
+}
+
+export interface ChangeFeedHandlers {
+  onChanges: (changes: ChangeEvent[]) => void;
+  // Cursor could not be resumed: refetch lists, then keep following
+  onReset?: () => void;
+}
+
+/**
+ * Follow the organisation's change feed. EventSource cannot send the bearer
+ * token, so the stream is read with fetch. Reconnects resume from the last
+ * cursor. Returns a function that stops the subscription.
+ */
+export function subscribeChanges(
+  token: string,
+  handlers: ChangeFeedHandlers,
+  options: { tables?: string[]; matterId?: string } = {}
+): () => void {
+  const controller = new AbortController();
+  let cursor: string | null = null;
+
+  const params = new URLSearchParams();
+  if (options.tables?.length) params.set("tables", options.tables.join(","));
+  if (options.matterId) params.set("matter_id", options.matterId);
+  const query = params.toString();
+
+  const dispatch = (block: string) => {
+    let event = "message";
+    let data = "";
+    for (const line of block.split("\n")) {
+      if (line.startsWith("id: ")) cursor = line.slice(4);
+      else if (line.startsWith("event: ")) event = line.slice(7);
+      else if (line.startsWith("data: ")) data += line.slice(6);
+    }
+    if (event === "changes") handlers.onChanges(JSON.parse(data).changes);
+    else if (event === "reset") handlers.onReset?.();
+  };
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const response = await fetch(`${API_BASE_URL}/api/v1/changes${query ? `?${query}` : ""}`, {
+          headers: {
+            Authorization: `Bearer ${token}`,
+            ...(cursor && { "Last-Event-ID": cursor }),
+          },
+          signal: controller.signal,
+        });
+        if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = "";
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          let boundary;
+          while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+            dispatch(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+}
+
 // ============================================
 // LLM ORCHESTRATOR
 // ============================================
@@ -0,0 +1,98 @@
+"""
+Overhead microbenchmark for the shared MetricsMiddleware.
+
+Drives ASGI calls directly (no network, no test client) through:
+  - bare:    a minimal endpoint that sets the matched route and responds
+  - metrics: the same endpoint wrapped in MetricsMiddleware
+  - health:  the full summit_api app serving GET /health, for scale
+
+The difference between bare and metrics is the per-request cost of
+recording the request counter, latency histogram and in-flight gauge.
+
+Usage: python scripts/bench_metrics_middleware.py [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "summit_api"))
+# summit_common, for runs without pip install -e backend
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from app.main import app
+from summit_common.service import MetricsMiddleware, metrics_registry
+
+
+class _Route:
+    path = "/api/v1/matters/{matter_id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_scope(path: str) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [], "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+
+
+async def time_us(asgi_app, path: str, count: int, rounds: int) -> float:
+    for _ in range(min(count, 1000)):  # warm up label children and route caches
+        await asgi_app(make_scope(path), receive, send)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(count):
+            await asgi_app(make_scope(path), receive, send)
+        samples.append((time.perf_counter() - start) / count * 1e6)
+    return statistics.median(samples)
+
+
+async def run(count: int, rounds: int):
+    path = "/api/v1/matters/00000000-0000-0000-0000-000000000001"
+    bare = await time_us(endpoint, path, count, rounds)
+    wrapped = await time_us(MetricsMiddleware(endpoint), path, count, rounds)
+    health = await time_us(app, "/health", max(count // 10, 100), rounds)
+
+    overhead = wrapped - bare
+    print(f"{'path':<10}  {'us/request':>11}")
+    print(f"{'bare':<10}  {bare:>11.2f}")
+    print(f"{'metrics':<10}  {wrapped:>11.2f}")
+    print(f"{'health':<10}  {health:>11.2f}")
+    print(f"middleware overhead: {overhead:.2f} us/request ({overhead / health * 100:.1f}% of a full /health request)")
+
+    samples = metrics_registry.get_sample_value(
+        "summit_http_requests_total",
+        {"method": "GET", "route": _Route.path, "status": "200"}
+    )
+    assert samples and samples >= count * rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Serialization microbenchmark for summit_api list responses.
+
+Times 1k and 10k MatterSummary-shaped rows through:
+  - fastapi:   FastAPI's response_model path (validate, then jsonable_encoder + json.dumps)
+  - validated: TypeAdapter validate + dump_json (the previous cached-response path)
+  - trusted:   project_rows + encode_json (the fast path, orjson if installed)
+
+Usage: python scripts/bench_serialization.py [--rounds 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "summit_api"))
+# summit_common, for runs without pip install -e backend
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from fastapi.encoders import jsonable_encoder
+
+from app.main import MatterSummary, _type_adapter, encode_json, project_rows, orjson
+
+
+def make_rows(count: int) -> List[dict]:
+    """Rows shaped like fetch_matter_summaries output, including extra columns."""
+    rng = random.Random(count)
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "org_id": "11111111-1111-1111-1111-111111111111",
+            "code": f"M-{i:05d}",
+            "name": f"Matter {i} v Respondent Holdings Pty Ltd",
+            "matter_type": rng.choice(["litigation", "advisory", "transactional"]),
+            "status": rng.choice(["active", "pending", "closed"]),
+            "jurisdiction": rng.choice(["NSW", "VIC", "QLD", "FED"]),
+            "compliance_state": "green",
+            "risk_score": round(rng.random(), 3),
+            "client_name": f"Client {i % 97}",
+            "description": "Lorem ipsum " * 8,
+            "created_at": "2025-01-01T00:00:00+00:00",
+            "updated_at": "2025-06-01T12:34:56+00:00",
+        }
+        for i in range(count)
+    ]
+
+
+def fastapi_path(rows):
+    adapter = _type_adapter(List[MatterSummary])
+    return json.dumps(jsonable_encoder(adapter.validate_python(rows))).encode()
+
+
+def validated_path(rows):
+    adapter = _type_adapter(List[MatterSummary])
+    return adapter.dump_json(adapter.validate_python(rows))
+
+
+def trusted_path(rows):
+    return encode_json(project_rows(rows, MatterSummary))
+
+
+def time_ms(fn, rows, rounds: int) -> float:
+    fn(rows)  # warm up adapters and caches
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(rows)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json'}")
+    print(f"{'rows':>6}  {'fastapi ms':>11}  {'validated ms':>13}  {'trusted ms':>11}  {'speedup':>8}")
+    for count in (1_000, 10_000):
+        rows = make_rows(count)
+        assert json.loads(trusted_path(rows)) == json.loads(validated_path(rows))
+
+        baseline = time_ms(fastapi_path, rows, args.rounds)
+        validated = time_ms(validated_path, rows, args.rounds)
+        trusted = time_ms(trusted_path, rows, args.rounds)
+        print(f"{count:>6}  {baseline:>11.2f}  {validated:>13.2f}  {trusted:>11.2f}  {baseline / trusted:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Recall and latency benchmark for the orchestrator's local IVF vector index.
+
+Builds a synthetic matter of clustered unit vectors (default 1M chunks),
+indexes it with MatterVectorIndex, and compares top-k results for held-out
+queries against an exact scan:
+  - exact: brute-force cosine over every row, which is what the
+           match_vectors RPC computes without an ANN index
+  - ivf:   MatterVectorIndex.search at each --nprobe
+
+Recall@k is the share of the exact top k that the index also returns.
+
+Usage: python scripts/bench_vector_index.py [--rows 1000000] [--dims 256]
+       [--queries 200] [--top-k 10] [--nprobe 4,8,16,32]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = tempfile.mkdtemp(prefix="summit_vector_bench_")
+os.environ["VECTOR_INDEX_DIR"] = BENCH_DIR
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "summit_llm_orchestrator"))
+# summit_common, for runs without pip install -e backend
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from app.main import MatterVectorIndex, normalize_rows
+
+
+def synthetic_corpus(rows: int, dims: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around random topic centres, like chunks of related documents."""
+    rng = np.random.default_rng(seed)
+    centres = normalize_rows(rng.normal(size=(clusters, dims)))
+    vectors = np.empty((rows, dims), dtype=np.float32)
+    for start in range(0, rows, 100_000):
+        count = min(100_000, rows - start)
+        topic = rng.integers(0, clusters, count)
+        noise = rng.normal(scale=0.6 / np.sqrt(dims), size=(count, dims)).astype(np.float32)
+        vectors[start:start + count] = normalize_rows(centres[topic] + noise)
+    return vectors
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, top_k: int) -> np.ndarray:
+    scores = vectors @ query
+    best = np.argpartition(-scores, top_k)[:top_k]
+    return best[np.argsort(-scores[best])]
+
+
+def run(args):
+    print(f"building {args.rows:,} x {args.dims} corpus in {BENCH_DIR}")
+    vectors = synthetic_corpus(args.rows + args.queries, args.dims, args.clusters)
+    queries, vectors = vectors[:args.queries], vectors[args.queries:]
+
+    index = MatterVectorIndex(os.path.join(BENCH_DIR, "bench"))
+    start = time.perf_counter()
+    index.replace([{"chunk_id": i, "source_id": "bench", "content": ""} for i in range(args.rows)], vectors)
+    build_seconds = time.perf_counter() - start
+    len(index)  # load the committed index, as a serving worker would
+    print(f"index build: {build_seconds:.1f}s, {0 if index.centroids is None else len(index.centroids)} lists")
+
+    truth, exact_ms = [], []
+    for query in queries:
+        start = time.perf_counter()
+        truth.append(set(exact_top_k(vectors, query, args.top_k).tolist()))
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+    print(f"{'backend':<12}  {'recall@' + str(args.top_k):>10}  {'p50 ms':>8}  {'p95 ms':>8}")
+    print(f"{'exact':<12}  {1.0:>10.3f}  {statistics.median(exact_ms):>8.2f}  {np.percentile(exact_ms, 95):>8.2f}")
+    for nprobe in args.nprobe:
+        found, latencies = 0, []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            hits = index.search(query, args.top_k, -1.0, nprobe=nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += len(expected & {row["chunk_id"] for row, _ in hits})
+        recall = found / (args.top_k * len(queries))
+        print(f"{'ivf/' + str(nprobe):<12}  {recall:>10.3f}  {statistics.median(latencies):>8.2f}  {np.percentile(latencies, 95):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=lambda value: [int(n) for n in value.split(",")], default=[4, 8, 16, 32])
+    try:
+        run(parser.parse_args())
+    finally:
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+-- Hybrid retrieval (summit_llm_orchestrator, DEFAULT_RETRIEVAL_MODE=hybrid).
+--
+-- The full-text stage reads source_id and source_name from source_chunk and
+-- filters with to_tsvector(LEXICAL_SEARCH_CONFIG, content); the index below
+-- is built for the default 'english' config and must be rebuilt if that
+-- setting changes. Until this has run, hybrid requests fall back to vector
+-- results and report lexical_error in their retrieval stats.
+
+alter table source_chunk add column if not exists source_id uuid;
+alter table source_chunk add column if not exists source_name text;
+
+-- Chunks written by the frontend upload route carry document_id only
+update source_chunk c
+set source_id = c.document_id,
+    source_name = d.file_name
+from source_document d
+where d.id = c.document_id
+  and c.source_id is null;
+
+create index if not exists source_chunk_matter_id_idx on source_chunk (matter_id);
+create index if not exists source_chunk_content_fts_idx
+    on source_chunk using gin (to_tsvector('english', content));
@@ -0,0 +1,29 @@
+-- Chunk ingestion (summit_llm_orchestrator /ingest and /index/rebuild).
+--
+-- Needs 20261019000100_source_chunk_search.sql for source_id/source_name.
+-- Ingestion upserts chunks on (source_id, chunk_index) and compares
+-- content_hash to skip unchanged text; jobs are checkpointed and leased
+-- through ingest_jobs (INGEST_JOB_TABLE).
+
+alter table source_chunk add column if not exists content_hash text;
+alter table source_chunk add column if not exists token_count integer;
+
+-- The upsert's on_conflict target; chunks without a source_id never conflict
+create unique index if not exists source_chunk_source_id_chunk_index_key
+    on source_chunk (source_id, chunk_index);
+
+create table if not exists ingest_jobs (
+    job_id text primary key,
+    org_id uuid not null,
+    matter_id uuid not null,
+    status text not null,
+    state jsonb not null,
+    lease_owner text,
+    lease_expires_at timestamptz not null,
+    updated_at timestamptz not null default now()
+);
+
+-- The sweep for unfinished jobs whose lease has lapsed
+create index if not exists ingest_jobs_unfinished_lease_idx
+    on ingest_jobs (lease_expires_at)
+    where status in ('queued', 'running');